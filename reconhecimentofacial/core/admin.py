@@ -1,6 +1,16 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.core.exceptions import PermissionDenied
 from django.utils.html import format_html
-from .models import PropriedadeRural, PerfilUsuario
+from .arquivamento import restaurar
+from .operacoes import executar_em_massa
+from .models import Agrotoxico, PropriedadeRural, PropriedadeRuralArquivada, PerfilUsuario
+
+
+@admin.register(Agrotoxico)
+class AgrotoxicoAdmin(admin.ModelAdmin):
+    list_display = ('nome', 'nome_normalizado')
+    search_fields = ('nome', 'nome_normalizado')
+    readonly_fields = ('nome_normalizado',)
 
 
 @admin.register(PropriedadeRural)
@@ -27,23 +37,76 @@ class PropriedadeRuralAdmin(admin.ModelAdmin):
         }),
     )
     
+    actions = ('desativar_selecionadas', 'mudar_para_nivel_1', 'mudar_para_nivel_2', 'mudar_para_nivel_3')
+    
+    def _executar_em_massa(self, request, queryset, operacao, valor=None):
+        try:
+            alteradas = executar_em_massa(request.user, queryset, operacao, valor)
+        except PermissionDenied as e:
+            self.message_user(request, str(e), messages.ERROR)
+            return
+        self.message_user(request, f'{alteradas} propriedade(s) alterada(s).', messages.SUCCESS)
+    
+    @admin.action(description='Desativar selecionadas', permissions=['change'])
+    def desativar_selecionadas(self, request, queryset):
+        self._executar_em_massa(request, queryset, 'desativar')
+    
+    @admin.action(description='Mudar para Nível 1 - Baixo Impacto', permissions=['change'])
+    def mudar_para_nivel_1(self, request, queryset):
+        self._executar_em_massa(request, queryset, 'nivel', 1)
+    
+    @admin.action(description='Mudar para Nível 2 - Médio Impacto', permissions=['change'])
+    def mudar_para_nivel_2(self, request, queryset):
+        self._executar_em_massa(request, queryset, 'nivel', 2)
+    
+    @admin.action(description='Mudar para Nível 3 - Alto Impacto', permissions=['change'])
+    def mudar_para_nivel_3(self, request, queryset):
+        self._executar_em_massa(request, queryset, 'nivel', 3)
+    
     def save_model(self, request, obj, form, change):
         if not change:  # Se está criando um novo objeto
             obj.usuario_cadastro = request.user
         super().save_model(request, obj, form, change)
 
 
+@admin.register(PropriedadeRuralArquivada)
+class PropriedadeRuralArquivadaAdmin(admin.ModelAdmin):
+    list_display = ('id', 'nome_propriedade', 'proprietario', 'estado', 'nivel_impacto', 'data_atualizacao', 'data_arquivamento')
+    list_filter = ('nivel_impacto', 'estado', 'data_arquivamento')
+    search_fields = ('nome_propriedade', 'proprietario', 'cidade', 'cpf_cnpj')
+    list_select_related = ('usuario_cadastro',)
+    ordering = ('-data_arquivamento',)
+    actions = ('restaurar_propriedades', 'restaurar_e_reativar')
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    @admin.action(description='Restaurar selecionadas (continuam inativas)', permissions=['delete'])
+    def restaurar_propriedades(self, request, queryset):
+        restauradas = restaurar(list(queryset.values_list('pk', flat=True)))
+        self.message_user(request, f'{restauradas} propriedade(s) restaurada(s).', messages.SUCCESS)
+    
+    @admin.action(description='Restaurar e reativar selecionadas', permissions=['delete'])
+    def restaurar_e_reativar(self, request, queryset):
+        restauradas = restaurar(list(queryset.values_list('pk', flat=True)), reativar=True)
+        self.message_user(request, f'{restauradas} propriedade(s) restaurada(s) e reativada(s).', messages.SUCCESS)
+
+
 @admin.register(PerfilUsuario)
 class PerfilUsuarioAdmin(admin.ModelAdmin):
     list_display = ('get_nome_completo', 'get_username', 'get_email', 'telefone', 'foto_thumbnail', 'data_cadastro')
     list_filter = ('data_cadastro',)
-    search_fields = ('user__username', 'user__email', 'user__first_name', 'user__last_name', 'telefone')
+    search_fields = ('usuario__username', 'usuario__email', 'usuario__first_name', 'usuario__last_name', 'telefone')
     readonly_fields = ('foto_thumbnail', 'data_cadastro')
+    list_select_related = ('usuario',)
     ordering = ('-data_cadastro',)
     
     fieldsets = (
         ('Informações do Usuário', {
-            'fields': ('user', 'telefone', 'data_nascimento', 'bio')
+            'fields': ('usuario', 'telefone', 'data_nascimento', 'bio')
         }),
         ('Foto', {
             'fields': ('foto', 'foto_thumbnail')
@@ -55,20 +118,20 @@ class PerfilUsuarioAdmin(admin.ModelAdmin):
     )
     
     def get_nome_completo(self, obj):
-        return f"{obj.user.first_name} {obj.user.last_name}".strip() or obj.user.username
+        return f"{obj.usuario.first_name} {obj.usuario.last_name}".strip() or obj.usuario.username
     get_nome_completo.short_description = 'Nome'
     
     def get_username(self, obj):
-        return obj.user.username
+        return obj.usuario.username
     get_username.short_description = 'Username'
     
     def get_email(self, obj):
-        return obj.user.email
+        return obj.usuario.email
     get_email.short_description = 'Email'
     
     def foto_thumbnail(self, obj):
         if obj.foto:
-            return format_html('<img src="{}" width="80" height="80" style="border-radius: 50%; object-fit: cover;" />', obj.foto.url)
+            return format_html('<img src="{}" width="80" height="80" style="border-radius: 50%; object-fit: cover;" />', obj.url_miniatura('p.jpeg') or obj.foto.url)
         return format_html('<div style="width: 80px; height: 80px; border-radius: 50%; background: #ccc; display: flex; align-items: center; justify-content: center; color: white; font-weight: bold;">Sem Foto</div>')
     foto_thumbnail.short_description = 'Foto'
 
@@ -0,0 +1,93 @@
+"""
+Consultas analíticas de propriedades rurais sobre os agregados
+(AgregadoPropriedade), sem varrer a tabela de propriedades.
+
+As permissões são aplicadas no próprio balde: cada linha agregada tem um
+único nível de impacto, então basta filtrar pelos níveis visíveis.
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import connection, connections
+from django.db.models import Sum
+
+from .models import AgregadoPropriedade, PropriedadeRural
+
+# Nome público da dimensão -> campo em AgregadoPropriedade
+DIMENSOES = {
+    'periodo': 'data',
+    'estado': 'estado',
+    'agrotoxico': 'agrotoxico_utilizado',
+    'nivel': 'nivel_impacto',
+}
+
+PERIODOS = {
+    'dia': AgregadoPropriedade.PERIODO_DIA,
+    'mes': AgregadoPropriedade.PERIODO_MES,
+}
+
+
+def consultar(niveis, agrupar=('estado',), periodo='mes', inicio=None, fim=None,
+              estado=None, agrotoxico=None, nivel=None):
+    """
+    Total de propriedades ativas e soma das áreas agrupados pelas dimensões
+    informadas (periodo, estado, agrotoxico e/ou nivel), restritos aos níveis
+    visíveis. inicio/fim são datas (inclusive) sobre o início do balde.
+    """
+    agregados = AgregadoPropriedade.objects.filter(periodo=PERIODOS[periodo], nivel_impacto__in=niveis)
+    if inicio:
+        agregados = agregados.filter(data__gte=inicio)
+    if fim:
+        agregados = agregados.filter(data__lte=fim)
+    if estado:
+        agregados = agregados.filter(estado=estado)
+    if agrotoxico:
+        agregados = agregados.filter(agrotoxico_utilizado=agrotoxico)
+    if nivel:
+        agregados = agregados.filter(nivel_impacto=nivel)
+
+    campos = [DIMENSOES[dimensao] for dimensao in agrupar]
+    linhas = (
+        agregados.values(*campos)
+        .annotate(total=Sum('total'), area_total=Sum('area_total'))
+        .filter(total__gt=0)
+        .order_by(*campos)
+    )
+    return [
+        {
+            **{dimensao: linha[DIMENSOES[dimensao]] for dimensao in agrupar},
+            'total': linha['total'],
+            'area_total': linha['area_total'],
+        }
+        for linha in linhas
+    ]
+
+
+def _reconstruir_estado(estado):
+    try:
+        return estado, AgregadoPropriedade.recalcular(estado)
+    finally:
+        # Cada thread abre a sua conexão; fecha ao terminar a partição
+        connections.close_all()
+
+
+def recalcular_agregados(workers=None, estados=None):
+    """
+    Reconstrói os agregados em paralelo, uma partição (estado) por tarefa.
+    Retorna {estado: linhas geradas}. No SQLite, que serializa escritas,
+    o padrão é uma partição por vez.
+    """
+    if estados is None:
+        estados = set(PropriedadeRural.objects.values_list('estado', flat=True).distinct())
+        estados |= set(AgregadoPropriedade.objects.values_list('estado', flat=True).distinct())
+    estados = sorted(estados)
+
+    if workers is None:
+        workers = 1 if connection.vendor == 'sqlite' else min(4, os.cpu_count() or 1)
+
+    if workers <= 1:
+        return {estado: AgregadoPropriedade.recalcular(estado) for estado in estados}
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return dict(executor.map(_reconstruir_estado, estados))
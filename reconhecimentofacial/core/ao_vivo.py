@@ -0,0 +1,307 @@
+"""
+Reconhecimento facial ao vivo por WebSocket (ws://<host>/ws/reconhecimento/).
+
+A página de login facial envia quadros JPEG pequenos (mensagens binárias) e
+recebe, para cada quadro processado, um JSON com o estado:
+
+- 'qualidade' / 'sem_rosto': o quadro foi recusado pelas verificações baratas
+  (brilho e nitidez em numpy) ou nenhum rosto foi encontrado;
+- 'acompanhando': há um rosto, mas ainda não está parado e nítido;
+- 'reconhecido': o rosto foi identificado; 'url' conclui o login (token de
+  uso único, ver gerar_token);
+- 'falha': fim sem reconhecimento (tentativas ou tempo esgotados).
+
+Entre quadros a caixa do rosto é rastreada: a detecção (HOG) roda só em volta
+da caixa anterior e volta ao quadro inteiro, depois do pré-filtro de cascata
+(provavel_rosto), quando o rosto se perde ou a cada REDETECTAR_A_CADA
+quadros. A codificação, a parte cara, só é feita quando o rosto fica na
+mesma posição por QUADROS_ESTAVEIS quadros e está nítido, e a conexão
+termina na primeira identificação confiável. Quadros que chegam enquanto
+outro é processado são descartados (vale o mais recente).
+
+A sessão do Django não passa pelo WebSocket: o login é concluído por uma
+requisição HTTP comum (login_facial_confirmar) com o token recebido.
+"""
+
+import asyncio
+import io
+import json
+import logging
+from urllib.parse import urlencode, urlsplit
+
+import numpy as np
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import signing
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .galeria import carregar_galeria
+from .imagens import FotoInvalida, carregar_rgb
+from .reconhecimento import (
+    codificar_rostos, expandir, identificar, localizar_rostos, preparar_para_codificacao, provavel_rosto,
+)
+
+logger = logging.getLogger(__name__)
+
+CAMINHO = '/ws/reconhecimento/'
+
+# Quadros maiores são ignorados (a página envia JPEGs de 320x240)
+TAMANHO_MAXIMO_QUADRO = 512 * 1024
+
+# Verificações baratas, nos mesmos limites de detectar_qualidade_imagem
+BRILHO_MINIMO = 40
+BRILHO_MAXIMO = 220
+NITIDEZ_MINIMA = 30
+NITIDEZ_ROSTO_MINIMA = 60
+
+# Rastreamento da caixa do rosto
+MARGEM_RASTREIO = 0.5
+MARGEM_CODIFICACAO = 0.25
+SOBREPOSICAO_MINIMA = 0.7
+QUADROS_ESTAVEIS = 3
+REDETECTAR_A_CADA = 15
+
+FINAIS = ('reconhecido', 'falha')
+
+SAL_TOKEN = 'core.ao_vivo.login'
+VALIDADE_TOKEN = 30
+
+
+def tons_de_cinza(image_np):
+    return image_np @ np.array([0.299, 0.587, 0.114], dtype=np.float32)
+
+
+def nitidez(cinza):
+    """Variância do laplaciano (o cv2.Laplacian das verificações), em numpy"""
+    laplaciano = (
+        cinza[:-2, 1:-1] + cinza[2:, 1:-1] + cinza[1:-1, :-2] + cinza[1:-1, 2:]
+        - 4 * cinza[1:-1, 1:-1]
+    )
+    return float(laplaciano.var()) if laplaciano.size else 0.0
+
+
+def sobreposicao(a, b):
+    """Interseção sobre união de duas caixas (top, right, bottom, left)"""
+    altura = min(a[2], b[2]) - max(a[0], b[0])
+    largura = min(a[1], b[1]) - max(a[3], b[3])
+    if altura <= 0 or largura <= 0:
+        return 0.0
+    intersecao = altura * largura
+    area_a = (a[2] - a[0]) * (a[1] - a[3])
+    area_b = (b[2] - b[0]) * (b[1] - b[3])
+    return intersecao / (area_a + area_b - intersecao)
+
+
+class SessaoAoVivo:
+    """Estado de uma conexão: rastreamento, estabilidade e tentativas"""
+
+    def __init__(self):
+        self.quadros = 0
+        self.descartados = 0
+        self.codificacoes = 0
+        self.caixa = None
+        self.estaveis = 0
+        self.ultima_deteccao_completa = None
+
+    def localizar(self, image_np):
+        return localizar_rostos(image_np)
+
+    def codificar(self, image_np, caixa):
+        """Codifica o rosto pré-processando só a região em volta dele"""
+        top, right, bottom, left = expandir(caixa, MARGEM_CODIFICACAO, image_np.shape)
+        recorte = preparar_para_codificacao(np.ascontiguousarray(image_np[top:bottom, left:right]))
+        local = (caixa[0] - top, caixa[1] - left, caixa[2] - top, caixa[3] - left)
+        return codificar_rostos(recorte, [local])[0]
+
+    def rastrear(self, image_np):
+        """Rostos do quadro, procurando primeiro em volta da caixa anterior"""
+        if self.caixa is not None and self.quadros - self.ultima_deteccao_completa < REDETECTAR_A_CADA:
+            top, right, bottom, left = expandir(self.caixa, MARGEM_RASTREIO, image_np.shape)
+            locais = self.localizar(np.ascontiguousarray(image_np[top:bottom, left:right]))
+            if len(locais) == 1:
+                t, r, b, l = locais[0]
+                return [(t + top, r + left, b + top, l + left)]
+        self.ultima_deteccao_completa = self.quadros
+        if settings.PREFILTRO_ROSTO and not provavel_rosto(image_np):
+            return []
+        return self.localizar(image_np)
+
+    def perder(self, estado, mensagem):
+        self.caixa = None
+        self.estaveis = 0
+        return {'estado': estado, 'mensagem': mensagem}
+
+    def processar(self, dados):
+        """Verifica e rastreia um quadro; devolve o retorno para o cliente"""
+        self.quadros += 1
+        try:
+            image_np, escala = carregar_rgb(io.BytesIO(dados), settings.AO_VIVO_LADO_MAXIMO)
+        except FotoInvalida as e:
+            return self.perder('qualidade', str(e))
+
+        cinza = tons_de_cinza(image_np)
+        brilho = float(cinza.mean())
+        if brilho < BRILHO_MINIMO:
+            return self.perder('qualidade', 'Ambiente muito escuro - aumente a iluminação')
+        if brilho > BRILHO_MAXIMO:
+            return self.perder('qualidade', 'Ambiente muito claro - reduza a luz')
+        if nitidez(cinza) < NITIDEZ_MINIMA:
+            return self.perder('qualidade', 'Imagem desfocada - segure a câmera com firmeza')
+
+        locais = self.rastrear(image_np)
+        if not locais:
+            return self.perder('sem_rosto', 'Posicione seu rosto na câmera')
+        if len(locais) > 1:
+            return self.perder('sem_rosto', 'Apenas uma pessoa deve aparecer')
+
+        caixa = tuple(locais[0])
+        estavel = self.caixa is not None and sobreposicao(caixa, self.caixa) >= SOBREPOSICAO_MINIMA
+        self.estaveis = self.estaveis + 1 if estavel else 1
+        self.caixa = caixa
+        resposta = {
+            'estado': 'acompanhando',
+            'caixa': [round(valor * escala) for valor in caixa],
+            'mensagem': 'Mantenha o rosto parado...',
+        }
+
+        top, right, bottom, left = caixa
+        if nitidez(cinza[top:bottom, left:right]) < NITIDEZ_ROSTO_MINIMA:
+            self.estaveis = 0
+            resposta['mensagem'] = 'Rosto desfocado - fique parado por um instante'
+            return resposta
+        if self.estaveis < QUADROS_ESTAVEIS:
+            return resposta
+
+        # Rosto parado e nítido: só agora a codificação
+        self.estaveis = 0
+        self.codificacoes += 1
+        resposta['codificacao'] = self.codificar(image_np, caixa)
+        return resposta
+
+    def comparar(self, codificacao, galeria):
+        if not len(galeria):
+            return {'estado': 'falha', 'mensagem': 'Nenhum usuário cadastrado com foto de perfil.'}
+        [(usuario_id, distancia)] = identificar(galeria, codificacao, settings.AO_VIVO_DISTANCIA_MAXIMA)
+        if usuario_id is not None:
+            return {'estado': 'reconhecido', 'usuario_id': usuario_id, 'confianca': f'{(1 - distancia) * 100:.1f}%'}
+        if self.codificacoes >= settings.AO_VIVO_TENTATIVAS:
+            return {'estado': 'falha', 'mensagem': 'Rosto não reconhecido. Tente novamente ou use login com senha.'}
+        return {'estado': 'acompanhando', 'mensagem': 'Rosto não reconhecido, tentando novamente...'}
+
+
+def gerar_token(usuario):
+    """
+    Token assinado e de uso único para concluir o login por HTTP. Leva o
+    last_login do usuário: usar o token o atualiza no banco, o que vale para
+    todos os workers, mesmo sem um cache compartilhado.
+    """
+    ultimo = usuario.last_login and usuario.last_login.isoformat()
+    return signing.dumps({'usuario': usuario.pk, 'login': ultimo}, salt=SAL_TOKEN)
+
+
+def usuario_do_token(token):
+    """Usuário do token, se válido, dentro da validade e ainda não usado"""
+    try:
+        dados = signing.loads(token, salt=SAL_TOKEN, max_age=VALIDADE_TOKEN)
+    except signing.BadSignature:
+        return None
+    ultimo = dados['login'] and parse_datetime(dados['login'])
+    # Só uma requisição consegue trocar o last_login do token
+    usado = User.objects.filter(pk=dados['usuario'], is_active=True, last_login=ultimo).update(
+        last_login=timezone.now()
+    )
+    if not usado:
+        return None
+    return User.objects.get(pk=dados['usuario'])
+
+
+def origem_permitida(scope):
+    """Navegadores enviam Origin: só a própria página pode abrir o WebSocket"""
+    cabecalhos = dict(scope.get('headers', []))
+    origem = cabecalhos.get(b'origin')
+    if origem is None:
+        return True
+    return urlsplit(origem.decode('latin-1')).netloc == cabecalhos.get(b'host', b'').decode('latin-1')
+
+
+def concluir(resposta):
+    usuario = User.objects.filter(pk=resposta.pop('usuario_id'), is_active=True).first()
+    if usuario is None:
+        return {'estado': 'falha', 'mensagem': 'Rosto não reconhecido. Tente novamente ou use login com senha.'}
+    resposta['mensagem'] = f'Bem-vindo(a), {usuario.get_full_name() or usuario.username}!'
+    resposta['url'] = f'{reverse("login_facial_confirmar")}?{urlencode({"token": gerar_token(usuario)})}'
+    return resposta
+
+
+async def processar_quadro(sessao, dados):
+    resposta = await sync_to_async(sessao.processar, thread_sensitive=False)(dados)
+    codificacao = resposta.pop('codificacao', None)
+    if codificacao is None:
+        return resposta
+    galeria = await sync_to_async(carregar_galeria)()
+    resposta.update(sessao.comparar(codificacao, galeria))
+    if resposta['estado'] == 'reconhecido':
+        resposta = await sync_to_async(concluir)(resposta)
+    return resposta
+
+
+async def reconhecimento_websocket(scope, receive, send):
+    """Aplicação ASGI das conexões WebSocket (ver asgi.py)"""
+    if (await receive())['type'] != 'websocket.connect':
+        return
+    if scope['path'] != CAMINHO or not origem_permitida(scope):
+        # Fechar antes de aceitar responde 403 ao handshake
+        await send({'type': 'websocket.close', 'code': 1008})
+        return
+    await send({'type': 'websocket.accept'})
+
+    sessao = SessaoAoVivo()
+    pendente = []
+    chegou = asyncio.Event()
+    desconectado = asyncio.Event()
+
+    async def ler():
+        while True:
+            mensagem = await receive()
+            if mensagem['type'] == 'websocket.disconnect':
+                break
+            dados = mensagem.get('bytes')
+            if dados and len(dados) <= TAMANHO_MAXIMO_QUADRO:
+                # Só o quadro mais recente é processado
+                sessao.descartados += len(pendente)
+                pendente[:] = [dados]
+                chegou.set()
+        desconectado.set()
+        chegou.set()
+
+    leitor = asyncio.create_task(ler())
+    resposta = {'estado': 'desconectado'}
+    try:
+        async with asyncio.timeout(settings.AO_VIVO_DURACAO_MAXIMA):
+            while resposta['estado'] not in FINAIS:
+                await chegou.wait()
+                chegou.clear()
+                if desconectado.is_set():
+                    break
+                dados = pendente.pop()
+                resposta = await processar_quadro(sessao, dados)
+                await send({'type': 'websocket.send', 'text': json.dumps(resposta)})
+    except TimeoutError:
+        resposta = {'estado': 'falha', 'mensagem': 'Tempo esgotado. Tente novamente.'}
+        await send({'type': 'websocket.send', 'text': json.dumps(resposta)})
+    except Exception:
+        logger.exception('Erro no reconhecimento ao vivo')
+        resposta = {'estado': 'falha', 'mensagem': 'Reconhecimento ao vivo indisponível.'}
+        await send({'type': 'websocket.send', 'text': json.dumps(resposta)})
+    finally:
+        leitor.cancel()
+
+    logger.info(
+        'Reconhecimento ao vivo: %d quadro(s), %d descartado(s), %d codificação(ões), %s',
+        sessao.quadros, sessao.descartados, sessao.codificacoes, resposta['estado'],
+    )
+    if not desconectado.is_set():
+        await send({'type': 'websocket.close', 'code': 1000})
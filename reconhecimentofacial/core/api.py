@@ -0,0 +1,307 @@
+"""
+API REST de propriedades rurais para os clientes de campo (e identificação
+de rostos para portarias e totens).
+
+- Respeita os níveis de obter_niveis_visualizacao
+- ?fields=a,b,c devolve só os campos pedidos e carrega só eles do banco
+- Paginação por cursor (estável mesmo com inserções durante a navegação)
+- ETag/Last-Modified a partir de data_atualizacao, com 304 Not Modified
+- Operações em massa (POST) validadas pelos níveis de obter_niveis_criacao
+"""
+
+import hashlib
+import io
+from datetime import datetime, time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.exceptions import PermissionDenied as DjangoPermissionDenied, ValidationError as DjangoValidationError
+from django.db.models import Count, Max, Q
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.http import http_date
+from rest_framework.exceptions import NotFound, PermissionDenied, ValidationError
+from rest_framework.generics import GenericAPIView
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from . import analytics
+from .decorators import orcamento_consultas
+from .galeria import carregar_galeria
+from .imagens import FotoInvalida, carregar_rgb, decodificar_base64
+from .models import Agrotoxico, PropriedadeRural
+from .operacoes import OPERACOES, executar_em_massa
+from .reconhecimento import identificar, localizar_e_codificar
+from .serializers import FiltroPropriedadesSerializer, PropriedadeRuralSerializer
+from .views import filtrar_propriedades, obter_niveis_visualizacao, pode_criar_usuarios
+
+
+class PaginacaoPropriedades(CursorPagination):
+    ordering = ('-data_cadastro', '-id')
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+
+def _etag(*partes):
+    return '"%s"' % hashlib.md5(repr(partes).encode('utf-8')).hexdigest()
+
+
+def _finalizar(response, etag, ultima_modificacao):
+    """Cabeçalhos de validação e cache privado (a resposta depende do usuário)"""
+    response['ETag'] = etag
+    if ultima_modificacao:
+        response['Last-Modified'] = http_date(ultima_modificacao.timestamp())
+    patch_vary_headers(response, ('Cookie', 'Authorization'))
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+class PropriedadeAPIBase(GenericAPIView):
+    serializer_class = PropriedadeRuralSerializer
+
+    def get_campos(self):
+        return PropriedadeRuralSerializer.campos_validos(self.request.query_params.get('fields'))
+
+    def get_serializer(self, *args, **kwargs):
+        kwargs['campos'] = self.get_campos()
+        return super().get_serializer(*args, **kwargs)
+
+    def get_queryset(self):
+        niveis = obter_niveis_visualizacao(self.request.user)
+        return PropriedadeRural.objects.filter(ativo=True, nivel_impacto__in=niveis)
+
+    def moldar(self, queryset, extras=()):
+        """Aplica only()/select_related() conforme os campos pedidos"""
+        campos = PropriedadeRuralSerializer.campos_modelo(self.get_campos()) | {'id', *extras}
+        if any(campo.startswith('usuario_cadastro__') for campo in campos):
+            queryset = queryset.select_related('usuario_cadastro')
+        return queryset.only(*campos)
+
+
+@orcamento_consultas(4)
+class PropriedadeListaAPI(PropriedadeAPIBase):
+    """
+    GET /api/v1/propriedades/?nivel=&estado=&agrotoxico=&search=&atualizado_desde=&fields=&cursor=
+    """
+
+    pagination_class = PaginacaoPropriedades
+
+    def _instante(self, valor):
+        """atualizado_desde: data e hora ISO 8601 ou só a data (desde o início do dia)"""
+        try:
+            instante = parse_datetime(valor)
+            if instante is None:
+                data = parse_date(valor)
+                instante = data and datetime.combine(data, time.min)
+        except ValueError:
+            instante = None
+        if instante is None:
+            raise ValidationError({'atualizado_desde': 'Use AAAA-MM-DD ou AAAA-MM-DDTHH:MM[:SS][±HH:MM].'})
+        if timezone.is_naive(instante):
+            instante = timezone.make_aware(instante)
+        return instante
+
+    def filter_queryset(self, queryset):
+        parametros = self.request.query_params
+        if parametros.get('nivel'):
+            if parametros['nivel'] not in ('1', '2', '3'):
+                raise ValidationError({'nivel': 'Use 1, 2 ou 3.'})
+            queryset = queryset.filter(nivel_impacto=parametros['nivel'])
+        if parametros.get('estado'):
+            queryset = queryset.filter(estado=parametros['estado'].upper())
+        if parametros.get('agrotoxico'):
+            queryset = queryset.filter(agrotoxico__nome_normalizado=Agrotoxico.normalizar(parametros['agrotoxico']))
+        if parametros.get('atualizado_desde'):
+            queryset = queryset.filter(data_atualizacao__gte=self._instante(parametros['atualizado_desde']))
+        if parametros.get('search'):
+            search = parametros['search']
+            queryset = queryset.filter(
+                Q(nome_propriedade__icontains=search) |
+                Q(proprietario__icontains=search) |
+                Q(cidade__icontains=search)
+            )
+        return queryset
+
+    def get(self, request):
+        queryset = self.filter_queryset(self.get_queryset())
+
+        # Validadores em uma única consulta leve antes de montar a página
+        resumo = queryset.order_by().aggregate(ultima=Max('data_atualizacao'), total=Count('id'))
+        etag = _etag(
+            request.user.pk, obter_niveis_visualizacao(request.user),
+            sorted(request.query_params.items()), resumo['ultima'], resumo['total'],
+        )
+        nao_modificado = get_conditional_response(request, etag=etag, last_modified=resumo['ultima'] and int(resumo['ultima'].timestamp()))
+        if nao_modificado is not None:
+            return _finalizar(nao_modificado, etag, resumo['ultima'])
+
+        queryset = self.moldar(queryset, extras=('data_cadastro',))
+        pagina = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(pagina, many=True)
+        response = self.get_paginated_response(serializer.data)
+        return _finalizar(response, etag, resumo['ultima'])
+
+
+@orcamento_consultas(4)
+class PropriedadeDetalheAPI(PropriedadeAPIBase):
+    """GET /api/v1/propriedades/<pk>/?fields="""
+
+    def get(self, request, pk):
+        ultima = self.get_queryset().filter(pk=pk).values_list('data_atualizacao', flat=True).first()
+        if ultima is None:
+            raise NotFound('Propriedade não encontrada.')
+
+        etag = _etag(request.user.pk, pk, ultima, self.get_campos())
+        nao_modificado = get_conditional_response(request, etag=etag, last_modified=int(ultima.timestamp()))
+        if nao_modificado is not None:
+            return _finalizar(nao_modificado, etag, ultima)
+
+        propriedade = self.moldar(self.get_queryset().filter(pk=pk)).first()
+        if propriedade is None:
+            raise NotFound('Propriedade não encontrada.')
+        response = Response(self.get_serializer(propriedade).data)
+        return _finalizar(response, etag, ultima)
+
+
+@orcamento_consultas(3)
+class AnalisePropriedadesAPI(APIView):
+    """
+    GET /api/v1/analytics/propriedades/?agrupar=estado,periodo&periodo=mes&inicio=2025-01&fim=2025-06
+        &estado=&agrotoxico=&nivel=
+
+    Totais e áreas somadas a partir dos agregados pré-calculados.
+    """
+
+    def _data(self, nome):
+        valor = self.request.query_params.get(nome)
+        if not valor:
+            return None
+        # Aceita AAAA-MM (início do mês) além de AAAA-MM-DD
+        try:
+            data = parse_date(valor if len(valor) > 7 else f'{valor}-01')
+        except ValueError:
+            # Bem formada, mas inexistente (ex.: 2025-13)
+            data = None
+        if data is None:
+            raise ValidationError({nome: 'Use AAAA-MM-DD ou AAAA-MM.'})
+        return data
+
+    def get(self, request):
+        parametros = request.query_params
+        agrupar = [d.strip() for d in parametros.get('agrupar', 'estado').split(',') if d.strip()]
+        if not agrupar or any(d not in analytics.DIMENSOES for d in agrupar):
+            raise ValidationError({'agrupar': f'Use uma ou mais de: {", ".join(analytics.DIMENSOES)}.'})
+        periodo = parametros.get('periodo', 'mes')
+        if periodo not in analytics.PERIODOS:
+            raise ValidationError({'periodo': 'Use dia ou mes.'})
+        nivel = parametros.get('nivel')
+        if nivel and nivel not in ('1', '2', '3'):
+            raise ValidationError({'nivel': 'Use 1, 2 ou 3.'})
+
+        resultados = analytics.consultar(
+            obter_niveis_visualizacao(request.user),
+            agrupar=agrupar,
+            periodo=periodo,
+            inicio=self._data('inicio'),
+            fim=self._data('fim'),
+            estado=parametros.get('estado', '').upper() or None,
+            agrotoxico=parametros.get('agrotoxico') or None,
+            nivel=nivel and int(nivel),
+        )
+        return Response({'periodo': periodo, 'agrupar': agrupar, 'resultados': resultados})
+
+
+@orcamento_consultas(26)
+class PropriedadesEmMassaAPI(APIView):
+    """
+    POST /api/v1/propriedades/em-massa/
+
+    {"operacao": "nivel" | "desativar" | "reatribuir", "valor": ...,
+     "ids": [1, 2, 3]}  ou  {"filtro": {"nivel": 1, "estado": "SP", "agrotoxico": 4, "search": "..."}}
+
+    Aplica a operação a todas as propriedades selecionadas e informa quantas foram alteradas.
+    """
+
+    def post(self, request):
+        dados = request.data
+        operacao = dados.get('operacao')
+        if operacao not in OPERACOES:
+            raise ValidationError({'operacao': f'Use uma de: {", ".join(OPERACOES)}.'})
+
+        # Só é possível selecionar o que o usuário enxerga
+        niveis = obter_niveis_visualizacao(request.user)
+        if dados.get('ids'):
+            ids = dados['ids']
+            if not isinstance(ids, list) or not all(isinstance(pk, int) for pk in ids):
+                raise ValidationError({'ids': 'Informe uma lista de ids.'})
+            propriedades = PropriedadeRural.objects.filter(pk__in=ids, nivel_impacto__in=niveis)
+        elif dados.get('filtro'):
+            filtro = FiltroPropriedadesSerializer(data=dados['filtro'])
+            if not filtro.is_valid():
+                raise ValidationError({'filtro': filtro.errors})
+            filtro = filtro.validated_data
+            propriedades = filtrar_propriedades(
+                niveis,
+                nivel_filtro=filtro.get('nivel'),
+                search=filtro['search'],
+                agrotoxico=filtro.get('agrotoxico'),
+                estado=filtro.get('estado'),
+            )
+        else:
+            raise ValidationError('Informe "ids" ou "filtro" para selecionar as propriedades.')
+
+        try:
+            alteradas = executar_em_massa(request.user, propriedades, operacao, dados.get('valor'))
+        except DjangoPermissionDenied as e:
+            raise PermissionDenied(str(e))
+        except DjangoValidationError as e:
+            raise ValidationError({'valor': e.messages})
+        return Response({'operacao': operacao, 'alteradas': alteradas})
+
+
+@orcamento_consultas(5)
+class IdentificacaoRostosAPI(APIView):
+    """
+    POST /api/v1/reconhecimento/identificar/  {"foto_base64": "data:image/jpeg;base64,..."}
+
+    Identifica todos os rostos do quadro, sem iniciar sessão (portarias e
+    totens com câmera fixa). Os rostos são codificados em uma única chamada de
+    face_encodings e comparados com a galeria em uma multiplicação de matrizes.
+    Devolve nomes de outros usuários: só para quem pode criar usuários.
+    """
+
+    def post(self, request):
+        if not pode_criar_usuarios(request.user):
+            raise PermissionDenied('Você não tem permissão para identificar rostos.')
+        foto_data = request.data.get('foto_base64')
+        if not foto_data:
+            raise ValidationError({'foto_base64': 'Nenhuma imagem fornecida.'})
+        try:
+            image_np, escala = carregar_rgb(
+                io.BytesIO(decodificar_base64(foto_data)), settings.IDENTIFICACAO_LADO_MAXIMO
+            )
+        except FotoInvalida as e:
+            raise ValidationError({'foto_base64': str(e)})
+
+        caixas, codificacoes = localizar_e_codificar(image_np)
+        resultados = identificar(carregar_galeria(request), codificacoes, settings.IDENTIFICACAO_TOLERANCIA)
+        usuarios = User.objects.in_bulk({usuario_id for usuario_id, _ in resultados if usuario_id})
+
+        rostos = []
+        # Da esquerda para a direita no quadro
+        for caixa, (usuario_id, distancia) in sorted(zip(caixas, resultados), key=lambda par: par[0][3]):
+            usuario = usuarios.get(usuario_id)
+            rostos.append({
+                'caixa': [round(valor * escala) for valor in caixa],
+                'usuario': usuario and {
+                    'id': usuario.pk,
+                    'username': usuario.username,
+                    'nome': usuario.get_full_name() or usuario.username,
+                },
+                'distancia': None if distancia is None else round(distancia, 4),
+                'confianca': None if distancia is None else round((1 - distancia) * 100, 1),
+            })
+        return Response({'rostos': rostos})
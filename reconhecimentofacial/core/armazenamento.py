@@ -0,0 +1,81 @@
+"""
+Armazenamento das fotos de perfil endereçado pelo conteúdo.
+
+Cada foto é gravada com o SHA-256 do conteúdo como nome, em subpastas de
+dois níveis (fotos_usuarios/ab/cd/abcd....jpg): nenhuma pasta acumula
+centenas de milhares de arquivos, envios idênticos viram um único arquivo e
+o mesmo envio repetido não gera sufixos aleatórios.
+
+Como vários perfis podem apontar para o mesmo arquivo, ele só é apagado
+quando o último perfil deixa de usá-lo (liberar_foto em models.py, chamado
+após o commit). O comando limpar_fotos remove o que sobrar órfão.
+"""
+
+import hashlib
+import os
+import posixpath
+import time
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+# Arquivos reaproveitados (ou gravados) há menos que isso não são apagados:
+# um envio idêntico ainda não confirmado pode estar apontando para eles
+CARENCIA_SEGUNDOS = 60
+
+NIVEIS = 2
+
+
+def hash_conteudo(content):
+    sha256 = hashlib.sha256()
+    content.seek(0)
+    for pedaco in content.chunks():
+        sha256.update(pedaco)
+    content.seek(0)
+    return sha256.hexdigest()
+
+
+@deconstructible(path='core.armazenamento.ArmazenamentoPorConteudo')
+class ArmazenamentoPorConteudo(FileSystemStorage):
+    def __init__(self, **kwargs):
+        # Sobrescrever um arquivo endereçado pelo conteúdo grava os mesmos bytes
+        kwargs.setdefault('allow_overwrite', True)
+        super().__init__(**kwargs)
+
+    def nome_por_conteudo(self, name, content):
+        """fotos_usuarios/joao_foto.jpg -> fotos_usuarios/ab/cd/abcd....jpg"""
+        pasta = posixpath.dirname(name)
+        extensao = posixpath.splitext(name)[1].lower()
+        digest = hash_conteudo(content)
+        fragmentos = [digest[2 * i:2 * i + 2] for i in range(NIVEIS)]
+        return posixpath.join(pasta, *fragmentos, digest + extensao)
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        nome = self.nome_por_conteudo(name, content)
+        if self.exists(nome):
+            # Mesmo conteúdo já gravado: reaproveita e renova a carência
+            os.utime(self.path(nome))
+            return nome
+        return super().save(nome, content, max_length)
+
+    def recente(self, name):
+        """Gravado ou reaproveitado dentro da carência"""
+        return time.time() - os.path.getmtime(self.path(name)) < CARENCIA_SEGUNDOS
+
+    def percorrer(self, pasta):
+        """Nomes de todos os arquivos abaixo da pasta"""
+        if not self.exists(pasta):
+            return
+        subpastas, arquivos = self.listdir(pasta)
+        for arquivo in arquivos:
+            yield posixpath.join(pasta, arquivo)
+        for subpasta in subpastas:
+            yield from self.percorrer(posixpath.join(pasta, subpasta))
+
+
+armazenamento_fotos = ArmazenamentoPorConteudo()
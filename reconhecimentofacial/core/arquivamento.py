@@ -0,0 +1,84 @@
+"""
+Arquivamento de propriedades desativadas.
+
+propriedade_delete apenas marca ativo=False; estas rotinas movem os registros
+inativos antigos para PropriedadeRuralArquivada em lotes transacionais,
+mantendo a tabela principal (e seus índices) só com o que é consultado, e
+permitem restaurá-los com o mesmo id.
+"""
+
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .cache import invalidar_propriedades
+from .carga import excluir_lote
+from .models import (
+    CAMPOS_MONITORADOS_PROPRIEDADE, PropriedadeRural, PropriedadeRuralArquivada, mover_propriedades,
+)
+
+
+def _campos():
+    return [campo.attname for campo in PropriedadeRural._meta.concrete_fields]
+
+
+def candidatas(dias):
+    """Propriedades inativas cuja última atualização (a desativação) tem mais de dias"""
+    limite = timezone.now() - timedelta(days=dias)
+    return PropriedadeRural.todos.filter(ativo=False, data_atualizacao__lt=limite)
+
+
+def arquivar_lote(ids):
+    """Move para o arquivo as propriedades inativas com os ids informados. Retorna quantas"""
+    campos = _campos()
+    with transaction.atomic():
+        linhas = [
+            dict(zip(campos, linha))
+            for linha in PropriedadeRural.todos.select_for_update()
+            .filter(pk__in=ids, ativo=False)
+            .values_list(*campos)
+        ]
+        if not linhas:
+            return 0
+
+        PropriedadeRuralArquivada.objects.bulk_create([PropriedadeRuralArquivada(**linha) for linha in linhas])
+
+        # Sem sinais por linha: não há FKs apontando para PropriedadeRural e as
+        # estatísticas são ajustadas de uma vez abaixo
+        excluir_lote([linha['id'] for linha in linhas])
+        mover_propriedades([[linha[campo] for campo in CAMPOS_MONITORADOS_PROPRIEDADE] for linha in linhas])
+
+        transaction.on_commit(invalidar_propriedades)
+    return len(linhas)
+
+
+def arquivar_inativas(dias, lote=1000):
+    """Arquiva todas as candidatas, um lote por transação. Gera a quantidade de cada lote"""
+    while True:
+        ids = list(candidatas(dias).order_by('pk').values_list('pk', flat=True)[:lote])
+        if not ids:
+            return
+        yield arquivar_lote(ids)
+
+
+def restaurar(ids, reativar=False):
+    """
+    Devolve à tabela principal as propriedades arquivadas (com o id original).
+    O save dispara os sinais, então estatísticas e agregados ficam corretos.
+    Retorna quantas foram restauradas.
+    """
+    campos = _campos()
+    restauradas = 0
+    with transaction.atomic():
+        for arquivada in PropriedadeRuralArquivada.objects.select_for_update().filter(pk__in=ids):
+            propriedade = PropriedadeRural(**{campo: getattr(arquivada, campo) for campo in campos})
+            if reativar:
+                propriedade.ativo = True
+            propriedade.save(force_insert=True)
+
+            # auto_now_add sobrescreve a data de cadastro na inserção
+            PropriedadeRural.todos.filter(pk=propriedade.pk).update(data_cadastro=arquivada.data_cadastro)
+            arquivada.delete()
+            restauradas += 1
+    return restauradas
@@ -0,0 +1,52 @@
+"""
+Backend de autenticação com o usuário (e o perfil) em cache.
+
+A cada requisição autenticada o AuthenticationMiddleware chama get_user(),
+que no ModelBackend consulta auth_user, e as páginas ainda carregam o
+perfil para a navegação. Aqui os dois vêm juntos do cache em uma única
+leitura. Os sinais de models.py apagam a entrada quando o usuário ou o
+perfil são salvos ou excluídos (troca de senha, de perfil, is_active...).
+
+A invalidação só alcança todos os workers com um cache compartilhado
+(settings.CACHE_COMPARTILHADO); sem ele, get_user() consulta o banco como o
+ModelBackend. O ModelBackend continua em AUTHENTICATION_BACKENDS para as
+sessões abertas antes deste backend.
+"""
+
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.models import User
+from django.core.cache import cache
+
+from .cache import cache_compartilhado
+
+CAMINHO = 'core.autenticacao.BackendUsuarioEmCache'
+
+
+def _chave(usuario_id):
+    return f'usuario:{usuario_id}'
+
+
+def invalidar_usuario(usuario_id):
+    """Remove do cache o usuário e o perfil guardados por get_user()"""
+    cache.delete(_chave(usuario_id))
+
+
+def invalidar_usuarios(usuario_ids):
+    """invalidar_usuario para vários usuários, em uma única operação no cache"""
+    cache.delete_many([_chave(usuario_id) for usuario_id in usuario_ids])
+
+
+class BackendUsuarioEmCache(ModelBackend):
+    def get_user(self, user_id):
+        if not cache_compartilhado():
+            # Um worker não veria a invalidação feita por outro
+            return super().get_user(user_id)
+        chave = _chave(user_id)
+        usuario = cache.get(chave)
+        if usuario is None:
+            usuario = User._default_manager.select_related('perfil').filter(pk=user_id).first()
+            if usuario is None:
+                return None
+            cache.set(chave, usuario, getattr(settings, 'USUARIO_CACHE_TIMEOUT', 300))
+        return usuario if self.user_can_authenticate(usuario) else None
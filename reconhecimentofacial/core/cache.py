@@ -0,0 +1,76 @@
+"""
+Cache das consultas e fragmentos de propriedades rurais.
+
+O resultado das páginas de propriedades depende apenas do conjunto de níveis
+que o usuário pode visualizar ([1], [1, 2] ou [1, 2, 3]), então as chaves são
+montadas a partir desse conjunto. Todas as chaves carregam uma versão global
+que é incrementada a cada cadastro, edição ou exclusão de propriedade: as
+entradas antigas deixam de ser lidas e expiram sozinhas, de modo que a
+invalidação custa uma única operação no cache.
+
+A versão só chega a todos os workers com um cache compartilhado
+(settings.CACHE_COMPARTILHADO); sem ele as páginas são sempre calculadas.
+"""
+
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+CHAVE_VERSAO = 'propriedades:versao'
+
+TIMEOUT = getattr(settings, 'CACHE_TIMEOUT_PROPRIEDADES', 300)
+
+
+def cache_compartilhado():
+    """
+    O cache padrão é o mesmo para todos os workers (settings.CACHE_COMPARTILHADO).
+    Sem isso, o que depende de uma invalidação chegar a todos os processos não
+    pode ficar só no cache.
+    """
+    return getattr(settings, 'CACHE_COMPARTILHADO', False)
+
+
+def versao_propriedades():
+    """Versão atual dos dados de propriedades"""
+    versao = cache.get(CHAVE_VERSAO)
+    if versao is None:
+        # Começa a partir do relógio para não reaproveitar versões antigas
+        # caso a chave seja descartada pelo backend
+        cache.add(CHAVE_VERSAO, time.time_ns(), None)
+        versao = cache.get(CHAVE_VERSAO)
+    return versao
+
+
+def invalidar_propriedades():
+    """Incrementa a versão, tornando obsoletas todas as entradas de propriedades"""
+    try:
+        cache.incr(CHAVE_VERSAO)
+    except ValueError:
+        cache.add(CHAVE_VERSAO, time.time_ns(), None)
+
+
+def timeout_fragmentos():
+    """Tempo de vida do {% cache %} dos templates (0 desliga sem um cache compartilhado)"""
+    return TIMEOUT if cache_compartilhado() else 0
+
+
+def chave_cache(nome, niveis, *partes):
+    """Monta a chave versionada de um fragmento para o conjunto de níveis informado"""
+    niveis_chave = '-'.join(str(nivel) for nivel in sorted(niveis))
+    resumo = hashlib.md5(repr(partes).encode('utf-8')).hexdigest()
+    return f'propriedades:{versao_propriedades()}:{nome}:{niveis_chave}:{resumo}'
+
+
+def obter_ou_calcular(nome, niveis, partes, calcular):
+    """Retorna o valor em cache ou executa calcular() e guarda o resultado"""
+    if not cache_compartilhado():
+        # A invalidação só chegaria ao worker que fez a gravação
+        return calcular()
+    chave = chave_cache(nome, niveis, *partes)
+    valor = cache.get(chave)
+    if valor is None:
+        valor = calcular()
+        cache.set(chave, valor, TIMEOUT)
+    return valor
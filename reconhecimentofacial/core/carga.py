@@ -0,0 +1,275 @@
+"""
+Rotinas de carga em massa de propriedades rurais.
+
+Usadas pelos comandos de importação e de geração de dados: leitura em fluxo
+de CSV/GeoJSON, validação com as regras do modelo e gravação em lotes com
+bulk_create (ou COPY no PostgreSQL), sem passar pelos sinais de save.
+Quem usa estas rotinas deve chamar concluir_carga() ao final para
+reconstruir as estatísticas e os agregados e invalidar o cache.
+"""
+
+import csv
+import io
+import json
+import re
+
+from django.db import connections
+from django.utils import timezone
+
+from .analytics import recalcular_agregados
+from .cache import invalidar_propriedades
+from .models import Agrotoxico, EstatisticaPropriedade, PropriedadeRural
+
+CAMPOS_IMPORTACAO = [
+    'nome_propriedade', 'proprietario', 'cpf_cnpj', 'endereco', 'cidade', 'estado',
+    'area_hectares', 'agrotoxico_utilizado', 'nivel_impacto', 'descricao_impacto',
+    'data_identificacao', 'latitude', 'longitude',
+]
+
+TAMANHO_BLOCO_LEITURA = 1 << 16
+
+# Ids por DELETE (abaixo do limite de parâmetros do SQLite)
+TAMANHO_LOTE_EXCLUSAO = 500
+
+
+# Leitura em fluxo
+
+def ler_csv(arquivo):
+    """Gera (número da linha, dados) para cada linha do CSV"""
+    leitor = csv.DictReader(arquivo)
+    for dados in leitor:
+        yield leitor.line_num, dados
+
+
+def _iterar_objetos_json(arquivo):
+    """
+    Gera os objetos do array "features" de um FeatureCollection sem carregar o
+    arquivo inteiro: lê blocos e decodifica uma feature de cada vez.
+    """
+    decodificador = json.JSONDecoder()
+    buffer = ''
+
+    while True:
+        bloco = arquivo.read(TAMANHO_BLOCO_LEITURA)
+        if not bloco:
+            raise ValueError('GeoJSON sem a lista "features"')
+        buffer += bloco
+        inicio = re.search(r'"features"\s*:\s*\[', buffer)
+        if inicio:
+            buffer = buffer[inicio.end():]
+            break
+        # Mantém o final do buffer caso a chave tenha sido cortada entre blocos
+        buffer = buffer[-32:]
+
+    while True:
+        buffer = buffer.lstrip(' \t\r\n,')
+        if buffer.startswith(']'):
+            return
+        try:
+            objeto, fim = decodificador.raw_decode(buffer)
+        except json.JSONDecodeError:
+            bloco = arquivo.read(TAMANHO_BLOCO_LEITURA)
+            if not bloco:
+                raise ValueError('GeoJSON incompleto')
+            buffer += bloco
+            continue
+        yield objeto
+        buffer = buffer[fim:]
+
+
+def _feature_para_dados(feature):
+    dados = dict(feature.get('properties') or {})
+    geometria = feature.get('geometry') or {}
+    if geometria.get('type') == 'Point':
+        longitude, latitude = geometria['coordinates'][:2]
+        dados.setdefault('latitude', latitude)
+        dados.setdefault('longitude', longitude)
+    return dados
+
+
+def ler_geojson(arquivo):
+    """Gera (número da feature, dados) de um FeatureCollection GeoJSON"""
+    for numero, feature in enumerate(_iterar_objetos_json(arquivo), start=1):
+        yield numero, _feature_para_dados(feature)
+
+
+def ler_geojson_linhas(arquivo):
+    """Gera (número da linha, dados) de um GeoJSON Text Sequence / NDJSON (uma feature por linha)"""
+    for numero, linha in enumerate(arquivo, start=1):
+        linha = linha.strip().lstrip('\x1e')
+        if linha:
+            yield numero, _feature_para_dados(json.loads(linha))
+
+
+LEITORES = {
+    'csv': ler_csv,
+    'geojson': ler_geojson,
+    'ndjson': ler_geojson_linhas,
+}
+
+
+def detectar_formato(caminho):
+    caminho = str(caminho).lower()
+    if caminho.endswith('.csv'):
+        return 'csv'
+    if caminho.endswith(('.ndjson', '.geojsonl', '.geojsons', '.jsonl')):
+        return 'ndjson'
+    return 'geojson'
+
+
+# Validação
+
+def validar_propriedade(dados, usuario=None):
+    """
+    Monta uma PropriedadeRural a partir de um dicionário e valida com as regras
+    do modelo (tipos, tamanhos, choices e validators). Levanta ValidationError.
+    """
+    valores = {}
+    for campo in CAMPOS_IMPORTACAO:
+        valor = dados.get(campo)
+        if isinstance(valor, str):
+            valor = valor.strip()
+        if valor in ('', None):
+            continue
+        valores[campo] = valor
+
+    propriedade = PropriedadeRural(usuario_cadastro=usuario, **valores)
+    propriedade.full_clean(exclude=['usuario_cadastro'], validate_unique=False, validate_constraints=False)
+    return propriedade
+
+
+# Gravação
+
+def suporta_copy(using='default'):
+    return connections[using].vendor == 'postgresql'
+
+
+def copiar_linhas(linhas, colunas, using='default'):
+    """
+    Grava tuplas (na ordem de colunas, usando attname) com COPY ... FROM STDIN.
+    Exclusivo do PostgreSQL; os valores já devem estar no formato do banco.
+    """
+    conexao = connections[using]
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    for linha in linhas:
+        escritor.writerow(['\\N' if valor is None else valor for valor in linha])
+    buffer.seek(0)
+
+    campos = [PropriedadeRural._meta.get_field(coluna) for coluna in colunas]
+    tabela = conexao.ops.quote_name(PropriedadeRural._meta.db_table)
+    nomes = ', '.join(conexao.ops.quote_name(campo.column) for campo in campos)
+    with conexao.cursor() as cursor:
+        cursor.cursor.copy_expert(f"COPY {tabela} ({nomes}) FROM STDIN WITH (FORMAT csv, NULL '\\N')", buffer)
+
+
+def _colunas_insercao():
+    return [campo.attname for campo in PropriedadeRural._meta.concrete_fields if not campo.primary_key]
+
+
+def vincular_agrotoxicos(propriedades):
+    """Preenche o agrotóxico do catálogo de um lote (uma consulta para o lote inteiro)"""
+    ids = Agrotoxico.mapear(propriedade.agrotoxico_utilizado for propriedade in propriedades)
+    for propriedade in propriedades:
+        propriedade.agrotoxico_id = ids.get(Agrotoxico.normalizar(propriedade.agrotoxico_utilizado or ''))
+
+
+def inserir_lote(propriedades, usar_copy=False, using='default'):
+    """Insere as propriedades de uma vez (COPY no PostgreSQL, bulk_create nos demais)"""
+    vincular_agrotoxicos(propriedades)
+    if not usar_copy:
+        PropriedadeRural.objects.using(using).bulk_create(propriedades)
+        return len(propriedades)
+
+    conexao = connections[using]
+    colunas = _colunas_insercao()
+    campos = [PropriedadeRural._meta.get_field(coluna) for coluna in colunas]
+    agora = timezone.now()
+    linhas = []
+    for propriedade in propriedades:
+        propriedade.data_cadastro = propriedade.data_cadastro or agora
+        propriedade.data_atualizacao = agora
+        linhas.append([
+            campo.get_db_prep_save(getattr(propriedade, campo.attname), conexao) for campo in campos
+        ])
+    copiar_linhas(linhas, colunas, using)
+    return len(propriedades)
+
+
+def atualizar_lote(propriedades, campos, using='default'):
+    """
+    UPDATE por chave primária com executemany. Equivale a bulk_update, que
+    monta um CASE por campo com uma cláusula por linha e fica lento em lotes
+    grandes.
+    """
+    conexao = connections[using]
+    campos = [PropriedadeRural._meta.get_field(campo) for campo in campos]
+    tabela = conexao.ops.quote_name(PropriedadeRural._meta.db_table)
+    atribuicoes = ', '.join(f'{conexao.ops.quote_name(campo.column)} = %s' for campo in campos)
+    pk = conexao.ops.quote_name(PropriedadeRural._meta.pk.column)
+    parametros = [
+        [campo.get_db_prep_save(getattr(propriedade, campo.attname), conexao) for campo in campos] + [propriedade.pk]
+        for propriedade in propriedades
+    ]
+    with conexao.cursor() as cursor:
+        cursor.executemany(f'UPDATE {tabela} SET {atribuicoes} WHERE {pk} = %s', parametros)
+
+
+def upsert_lote(propriedades, using='default'):
+    """
+    Atualiza as propriedades cujo cpf_cnpj já existe e insere as demais.
+    Dentro do lote, a última ocorrência de um cpf_cnpj prevalece.
+    Retorna (inseridas, atualizadas).
+    """
+    por_documento = {propriedade.cpf_cnpj: propriedade for propriedade in propriedades}
+    existentes = dict(
+        PropriedadeRural.todos.using(using)
+        .filter(cpf_cnpj__in=por_documento.keys())
+        .values_list('cpf_cnpj', 'pk')
+    )
+
+    vincular_agrotoxicos(por_documento.values())
+    agora = timezone.now()
+    novas, atualizadas = [], []
+    for documento, propriedade in por_documento.items():
+        if documento in existentes:
+            propriedade.pk = existentes[documento]
+            propriedade.data_atualizacao = agora
+            atualizadas.append(propriedade)
+        else:
+            novas.append(propriedade)
+
+    if novas:
+        PropriedadeRural.objects.using(using).bulk_create(novas)
+    if atualizadas:
+        campos = CAMPOS_IMPORTACAO + ['agrotoxico', 'data_atualizacao']
+        if any(propriedade.usuario_cadastro_id for propriedade in atualizadas):
+            campos.append('usuario_cadastro')
+        atualizar_lote(atualizadas, campos, using)
+    return len(novas), len(atualizadas)
+
+
+def excluir_lote(ids, modelo=PropriedadeRural, using='default'):
+    """
+    DELETE por chave primária em SQL, sem carregar as linhas nem disparar os
+    sinais de post_delete (o Collector buscaria cada linha por causa deles).
+    Quem chama ajusta as estatísticas e remove antes o que depende das
+    linhas. Retorna quantas linhas foram removidas.
+    """
+    conexao = connections[using]
+    tabela = conexao.ops.quote_name(modelo._meta.db_table)
+    pk = conexao.ops.quote_name(modelo._meta.pk.column)
+    removidas = 0
+    with conexao.cursor() as cursor:
+        for inicio in range(0, len(ids), TAMANHO_LOTE_EXCLUSAO):
+            parte = ids[inicio:inicio + TAMANHO_LOTE_EXCLUSAO]
+            cursor.execute(f'DELETE FROM {tabela} WHERE {pk} IN ({", ".join(["%s"] * len(parte))})', parte)
+            removidas += cursor.rowcount
+    return removidas
+
+
+def concluir_carga():
+    """Reconstrói estatísticas e agregados e invalida o cache após uma carga que não disparou sinais"""
+    EstatisticaPropriedade.recalcular()
+    recalcular_agregados()
+    invalidar_propriedades()
@@ -0,0 +1,6 @@
+from .permissoes import ANONIMO
+
+
+def permissoes(request):
+    """Expõe o contexto de permissões da requisição aos templates"""
+    return {'permissoes': getattr(request, 'permissoes', ANONIMO)}
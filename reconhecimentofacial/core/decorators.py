@@ -0,0 +1,76 @@
+"""
+Decoradores de views.
+
+@orcamento_consultas(n) registra em view.orcamento_consultas o máximo de
+consultas que a view pode fazer por requisição (o teste em core/tests.py
+verifica todas as rotas de core.urls contra esse valor). Com DEBUG ativo,
+requisições que estouram o orçamento geram um aviso no log.
+
+@leitura_em_replica marca views de consulta cujas leituras podem ir para
+uma réplica do banco (ver core/replicas.py).
+"""
+
+import logging
+from contextlib import contextmanager
+from functools import wraps
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+
+@contextmanager
+def _monitorar(nome, maximo):
+    if not settings.DEBUG:
+        yield
+        return
+
+    consultas = []
+
+    def contar(execute, sql, params, many, context):
+        consultas.append(sql)
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(contar):
+        yield
+    if len(consultas) > maximo:
+        logger.warning(
+            '%s fez %d consultas (orçamento: %d). Última: %s',
+            nome, len(consultas), maximo, consultas[-1],
+        )
+
+
+def orcamento_consultas(maximo):
+    """
+    Define o orçamento de consultas de uma view (função ou classe de
+    view/APIView; nas classes o dispatch é monitorado).
+    """
+    def decorador(view):
+        if isinstance(view, type):
+            dispatch = view.dispatch
+
+            @wraps(dispatch)
+            def dispatch_monitorado(self, request, *args, **kwargs):
+                with _monitorar(view.__name__, maximo):
+                    return dispatch(self, request, *args, **kwargs)
+
+            view.dispatch = dispatch_monitorado
+            view.orcamento_consultas = maximo
+            return view
+
+        @wraps(view)
+        def monitorada(request, *args, **kwargs):
+            with _monitorar(view.__name__, maximo):
+                return view(request, *args, **kwargs)
+
+        monitorada.orcamento_consultas = maximo
+        return monitorada
+
+    return decorador
+
+
+def leitura_em_replica(view):
+    """Leituras da view (em GET/HEAD) podem ser servidas por uma réplica"""
+    view.leitura_em_replica = True
+    return view
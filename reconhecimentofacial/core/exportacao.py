@@ -0,0 +1,118 @@
+"""
+Exportação em fluxo de propriedades rurais (CSV, GeoJSON e NDJSON).
+
+Os geradores percorrem o queryset com iterator(chunk_size) sobre
+values_list(), então a memória usada não depende do número de linhas:
+cada bloco lido do banco é convertido e entregue antes do próximo.
+"""
+
+import csv
+import io
+import json
+import zlib
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+CAMPOS_EXPORTACAO = [
+    'id', 'nome_propriedade', 'proprietario', 'cpf_cnpj', 'endereco', 'cidade', 'estado',
+    'area_hectares', 'agrotoxico_utilizado', 'nivel_impacto', 'data_identificacao',
+    'latitude', 'longitude',
+]
+
+TAMANHO_CHUNK = 2000
+
+# Agrupa linhas em blocos deste tamanho antes de entregar ao servidor
+TAMANHO_BLOCO_SAIDA = 64 * 1024
+
+
+def _linhas(queryset, chunk_size):
+    return queryset.order_by('pk').values_list(*CAMPOS_EXPORTACAO).iterator(chunk_size=chunk_size)
+
+
+def _agrupar(partes):
+    """Junta pequenas strings em blocos de ~64 KB (menos escritas no socket/arquivo)"""
+    bloco, tamanho = [], 0
+    for parte in partes:
+        bloco.append(parte)
+        tamanho += len(parte)
+        if tamanho >= TAMANHO_BLOCO_SAIDA:
+            yield ''.join(bloco)
+            bloco, tamanho = [], 0
+    if bloco:
+        yield ''.join(bloco)
+
+
+def gerar_csv(queryset, chunk_size=TAMANHO_CHUNK):
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+
+    def partes():
+        escritor.writerow(CAMPOS_EXPORTACAO)
+        for linha in _linhas(queryset, chunk_size):
+            escritor.writerow(linha)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        yield buffer.getvalue()
+
+    return _agrupar(partes())
+
+
+def gerar_ndjson(queryset, chunk_size=TAMANHO_CHUNK):
+    codificador = DjangoJSONEncoder(ensure_ascii=False)
+    return _agrupar(
+        codificador.encode(dict(zip(CAMPOS_EXPORTACAO, linha))) + '\n'
+        for linha in _linhas(queryset, chunk_size)
+    )
+
+
+def _feature(linha, codificador):
+    propriedades = dict(zip(CAMPOS_EXPORTACAO, linha))
+    latitude = propriedades.pop('latitude')
+    longitude = propriedades.pop('longitude')
+    geometria = None
+    if latitude is not None and longitude is not None:
+        geometria = {'type': 'Point', 'coordinates': [float(longitude), float(latitude)]}
+    return codificador.encode({
+        'type': 'Feature',
+        'id': propriedades['id'],
+        'geometry': geometria,
+        'properties': propriedades,
+    })
+
+
+def gerar_geojson(queryset, chunk_size=TAMANHO_CHUNK):
+    codificador = DjangoJSONEncoder(ensure_ascii=False)
+
+    def partes():
+        yield '{"type": "FeatureCollection", "features": ['
+        separador = '\n'
+        for linha in _linhas(queryset, chunk_size):
+            yield separador + _feature(linha, codificador)
+            separador = ',\n'
+        yield '\n]}\n'
+
+    return _agrupar(partes())
+
+
+# formato: (gerador, content type, extensão)
+FORMATOS = {
+    'csv': (gerar_csv, 'text/csv; charset=utf-8', 'csv'),
+    'geojson': (gerar_geojson, 'application/geo+json', 'geojson'),
+    'ndjson': (gerar_ndjson, 'application/x-ndjson', 'ndjson'),
+}
+
+
+def codificar(blocos):
+    for bloco in blocos:
+        yield bloco.encode('utf-8')
+
+
+def comprimir_gzip(blocos):
+    """Comprime em fluxo (formato gzip) uma sequência de blocos de texto"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for bloco in blocos:
+        dados = compressor.compress(bloco.encode('utf-8'))
+        if dados:
+            yield dados
+    yield compressor.flush()
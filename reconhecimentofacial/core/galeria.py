@@ -0,0 +1,314 @@
+"""
+Galeria de rostos cadastrados para o reconhecimento.
+
+A codificação de cada foto de perfil (128 dimensões do dlib) é calculada uma
+vez, no envio da foto ou, para fotos anteriores à galeria, na primeira carga
+(ou pelo comando codificar_galeria), e fica em PerfilUsuario.codificacao_facial.
+Cada processo mantém a matriz N x 128 em memória enquanto a versão da galeria
+não muda (no cache, ou no banco sem um cache compartilhado); comparar um ou vários rostos com todos os cadastrados é
+uma única multiplicação de matrizes.
+
+Com os comparadores 'float16' e 'int8' (MOTOR_COMPARADOR), a memória guarda
+só uma cópia compacta da matriz (2 ou 1 byte por dimensão, contra 8) usada
+na primeira varredura; os candidatos mais próximos são reordenados pela
+distância exata, em float32, lida de um arquivo em GALERIA_DIRETORIO.
+"""
+
+import hashlib
+import logging
+import os
+import time
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from .cache import cache_compartilhado
+from .imagens import FotoInvalida, carregar_rgb
+from .replicas import em_replica
+
+logger = logging.getLogger(__name__)
+
+CHAVE_VERSAO = 'galeria:versao'
+
+# Foto já analisada em que nenhum rosto foi encontrado
+SEM_ROSTO = b''
+
+DIMENSOES = 128
+
+# (versão, Galeria) carregada neste processo
+_carregada = None
+
+
+def versao_galeria():
+    """
+    Versão atual da galeria (como em versao_propriedades). Sem um cache
+    compartilhado a invalidação de um processo não chegaria aos outros: a
+    versão vem então do banco, da última atualização e do total de perfis.
+    """
+    if not cache_compartilhado():
+        return versao_do_banco()
+    versao = cache.get(CHAVE_VERSAO)
+    if versao is None:
+        cache.add(CHAVE_VERSAO, time.time_ns(), None)
+        versao = cache.get(CHAVE_VERSAO)
+    return versao
+
+
+def versao_do_banco():
+    """Microssegundos da última atualização de perfil e o total de perfis, em um inteiro"""
+    from .models import PerfilUsuario
+
+    resumo = PerfilUsuario.objects.aggregate(ultima=Max('data_atualizacao'), total=Count('id'))
+    ultima = resumo['ultima']
+    micros = int(ultima.timestamp()) * 1_000_000 + ultima.microsecond if ultima else 0
+    # Exclusões não mudam a última atualização, mas mudam o total
+    return micros * 1000 + resumo['total'] % 1000
+
+
+def invalidar_galeria():
+    """Faz os processos recarregarem a galeria na próxima comparação"""
+    try:
+        cache.incr(CHAVE_VERSAO)
+    except ValueError:
+        cache.add(CHAVE_VERSAO, time.time_ns(), None)
+
+
+def para_bytes(codificacao):
+    return np.asarray(codificacao, dtype='<f8').tobytes()
+
+
+def de_bytes(dados):
+    return np.frombuffer(dados, dtype='<f8')
+
+
+class Galeria:
+    def __init__(self, usuario_ids, matriz):
+        self.usuario_ids = np.asarray(usuario_ids, dtype=np.int64)
+        self.matriz = np.asarray(matriz, dtype=np.float64).reshape(-1, DIMENSOES)
+        self._normas = np.einsum('ij,ij->i', self.matriz, self.matriz)
+
+    def __len__(self):
+        return len(self.usuario_ids)
+
+    def distancias(self, codificacoes):
+        """
+        Distâncias euclidianas (k x N) entre k rostos e a galeria:
+        |a - b|² = |a|² + |b|² - 2 a·b, com o produto a·b para todos os pares
+        em uma multiplicação de matrizes.
+        """
+        consultas = np.atleast_2d(np.asarray(codificacoes, dtype=np.float64))
+        quadrados = (
+            np.einsum('ij,ij->i', consultas, consultas)[:, None]
+            + self._normas[None, :]
+            - 2.0 * (consultas @ self.matriz.T)
+        )
+        return np.sqrt(np.maximum(quadrados, 0.0))
+
+    @property
+    def nbytes(self):
+        """Memória ocupada pelas matrizes da galeria"""
+        return self.usuario_ids.nbytes + self.matriz.nbytes + self._normas.nbytes
+
+    def resultados(self, indices, menores, tolerancia):
+        return [
+            (int(self.usuario_ids[indice]) if distancia < tolerancia else None, float(distancia))
+            for indice, distancia in zip(indices, menores)
+        ]
+
+    def identificar(self, codificacoes, tolerancia):
+        """
+        Para cada rosto, (usuario_id, distância) do cadastrado mais próximo;
+        usuario_id é None se a distância não ficar abaixo da tolerância.
+        """
+        consultas = np.atleast_2d(codificacoes)
+        if not len(self) or not len(consultas):
+            return [(None, None)] * len(consultas)
+        distancias = self.distancias(consultas)
+        indices = distancias.argmin(axis=1)
+        return self.resultados(indices, distancias[np.arange(len(indices)), indices], tolerancia)
+
+
+class GaleriaQuantizada(Galeria):
+    """
+    Galeria com as codificações em float16 ou int8 na memória e em float32
+    no disco (arquivo mapeado com np.memmap).
+
+    No int8 cada dimensão tem sua escala: x ≈ centro + escala * código, com
+    o código em -128..127 cobrindo o intervalo da dimensão na galeria. A
+    distância aproximada sai de |q - x|² = |q - centro|² + |escala * código|²
+    - 2 ((q - centro) * escala)·código, com o último termo em uma
+    multiplicação de matrizes por bloco de linhas; os `candidatos` mais
+    próximos de cada rosto são então comparados com as codificações exatas.
+    """
+
+    # Linhas convertidas para float32 de cada vez (2 MB, cabe no cache do processador)
+    BLOCO = 4096
+
+    def __init__(self, usuario_ids, matriz, tipo, arquivo, candidatos=16):
+        if tipo not in ('float16', 'int8'):
+            raise ValueError(f'Representação desconhecida: {tipo}')
+        matriz = np.asarray(matriz, dtype=np.float32).reshape(-1, DIMENSOES)
+        self.usuario_ids = np.asarray(usuario_ids, dtype=np.int64)
+        self.tipo = tipo
+        self.candidatos = candidatos
+        self.exatas = gravar_exatas(matriz, arquivo)
+
+        if tipo == 'float16':
+            self.centro = np.zeros(DIMENSOES, dtype=np.float32)
+            self.escala = np.ones(DIMENSOES, dtype=np.float32)
+            self.codigos = matriz.astype(np.float16)
+        else:
+            minimo = matriz.min(axis=0) if len(matriz) else np.zeros(DIMENSOES, dtype=np.float32)
+            maximo = matriz.max(axis=0) if len(matriz) else minimo
+            self.escala = np.maximum((maximo - minimo) / 255, np.finfo(np.float32).tiny).astype(np.float32)
+            self.centro = (minimo + 128 * self.escala).astype(np.float32)
+            self.codigos = np.clip(np.rint((matriz - self.centro) / self.escala), -128, 127).astype(np.int8)
+        self._normas = np.concatenate(
+            [np.einsum('ij,ij->i', bloco, bloco) for bloco in self.blocos(self.escala)]
+        ) if len(self) else np.empty(0, dtype=np.float32)
+
+    @property
+    def nbytes(self):
+        return self.usuario_ids.nbytes + self.codigos.nbytes + self._normas.nbytes
+
+    def blocos(self, escala=None):
+        """Códigos em float32, um bloco de linhas por vez (sempre no mesmo buffer)"""
+        buffer = np.empty((min(self.BLOCO, len(self)), DIMENSOES), dtype=np.float32)
+        for inicio in range(0, len(self), self.BLOCO):
+            bloco = buffer[:len(self.codigos[inicio:inicio + self.BLOCO])]
+            np.copyto(bloco, self.codigos[inicio:inicio + self.BLOCO])
+            yield bloco if escala is None else bloco * escala
+
+    def distancias_aproximadas(self, consultas):
+        """Quadrados das distâncias (k x N) às codificações quantizadas"""
+        deslocadas = np.atleast_2d(consultas).astype(np.float32) - self.centro
+        pesos = (deslocadas * self.escala).T
+        produtos = np.concatenate([bloco @ pesos for bloco in self.blocos()]).T
+        return np.einsum('ij,ij->i', deslocadas, deslocadas)[:, None] + self._normas[None, :] - 2 * produtos
+
+    def distancias(self, codificacoes):
+        return np.sqrt(np.maximum(self.distancias_aproximadas(codificacoes), 0.0))
+
+    def identificar(self, codificacoes, tolerancia):
+        consultas = np.atleast_2d(codificacoes)
+        if not len(self) or not len(consultas):
+            return [(None, None)] * len(consultas)
+        aproximadas = self.distancias_aproximadas(consultas)
+        k = min(self.candidatos, len(self))
+        candidatos = np.sort(np.argpartition(aproximadas, k - 1, axis=1)[:, :k], axis=1)
+
+        # Reordenação exata: só as k linhas de cada rosto saem do disco
+        exatas = np.asarray(self.exatas[candidatos.ravel()]).reshape(len(consultas), k, DIMENSOES)
+        distancias = np.linalg.norm(exatas - consultas[:, None, :].astype(np.float32), axis=2)
+        melhores = distancias.argmin(axis=1)
+        linhas = np.arange(len(consultas))
+        return self.resultados(candidatos[linhas, melhores], distancias[linhas, melhores], tolerancia)
+
+
+def gravar_exatas(matriz, arquivo):
+    """
+    Grava (se ainda não existir) e mapeia as codificações exatas em float32.
+    O arquivo é escrito com outro nome e renomeado, para que outro processo
+    nunca mapeie um arquivo pela metade.
+    """
+    if not len(matriz):
+        return matriz
+    if not os.path.exists(arquivo):
+        os.makedirs(os.path.dirname(arquivo), exist_ok=True)
+        temporario = f'{arquivo}.{os.getpid()}'
+        matriz.astype('<f4').tofile(temporario)
+        os.replace(temporario, arquivo)
+    return np.memmap(arquivo, dtype='<f4', mode='r', shape=matriz.shape)
+
+
+def arquivo_exatas(usuario_ids, versao, diretorio=None):
+    """
+    Arquivo das codificações exatas de uma versão da galeria. Os usuários
+    entram no nome: processos que carregaram as mesmas linhas compartilham o
+    arquivo. Os de versões anteriores são apagados (quem ainda os mapeia
+    continua lendo até recarregar).
+    """
+    diretorio = diretorio or settings.GALERIA_DIRETORIO
+    digest = hashlib.sha1(np.asarray(usuario_ids, dtype='<i8').tobytes()).hexdigest()[:16]
+    if os.path.isdir(diretorio):
+        for nome in os.listdir(diretorio):
+            partes = nome.split('-')
+            if partes[0] == 'galeria' and len(partes) == 3 and partes[1].isdigit() and int(partes[1]) < versao:
+                try:
+                    os.remove(os.path.join(diretorio, nome))
+                except OSError:
+                    pass
+    return os.path.join(diretorio, f'galeria-{versao}-{digest}.f32')
+
+
+def codificar_perfil(perfil):
+    """
+    Calcula e grava a codificação (e a caixa do rosto, se faltar) de um
+    perfil com foto. Retorna a codificação, ou None se não houver rosto.
+    """
+    from .models import PerfilUsuario
+    from .reconhecimento import codificar_foto_perfil
+
+    campos = {'codificacao_facial': SEM_ROSTO}
+    codificacao = None
+    try:
+        image_np, escala = carregar_rgb(perfil.foto.path, settings.RECONHECIMENTO_LADO_MAXIMO)
+        # Fotos antigas com mais de um rosto usam o primeiro, como o login fazia
+        caixa, codificacao = codificar_foto_perfil(image_np, exigir_unico=False)
+        campos['codificacao_facial'] = para_bytes(codificacao)
+        if not perfil.caixa_rosto:
+            campos['caixa_rosto'] = [round(valor * escala) for valor in caixa]
+    except (FotoInvalida, OSError) as e:
+        logger.warning('Foto de perfil %s sem rosto utilizável: %s', perfil.pk, e)
+    # update() não dispara os sinais (a foto não mudou) nem o auto_now, que
+    # muda a versão da galeria lida do banco
+    PerfilUsuario.objects.filter(pk=perfil.pk).update(data_atualizacao=timezone.now(), **campos)
+    return codificacao
+
+
+def pendentes():
+    """Perfis com foto e sem codificação"""
+    from .models import PerfilUsuario
+
+    return (
+        PerfilUsuario.objects.filter(codificacao_facial__isnull=True)
+        .exclude(foto__isnull=True).exclude(foto='')
+        .only('usuario', 'foto', 'caixa_rosto')
+    )
+
+
+def carregar_galeria(request=None):
+    """Galeria atual, recarregada do banco quando a versão muda"""
+    from . import motores
+    from .models import PerfilUsuario
+
+    global _carregada
+    # Só leitura: pode vir de uma réplica (a versão do banco também, para
+    # corresponder às linhas carregadas)
+    with em_replica(request):
+        # Trocar o comparador pode trocar a representação da galeria
+        versao = (versao_galeria(), settings.MOTOR_COMPARADOR)
+        if _carregada is not None and _carregada[0] == versao:
+            return _carregada[1]
+
+        linhas = list(
+            PerfilUsuario.objects.exclude(codificacao_facial__isnull=True)
+            .values_list('usuario_id', 'codificacao_facial')
+        )
+        faltando = list(pendentes())
+
+    usuario_ids = [usuario_id for usuario_id, dados in linhas if dados]
+    codificacoes = [de_bytes(dados) for _, dados in linhas if dados]
+    for perfil in faltando:
+        codificacao = codificar_perfil(perfil)
+        if codificacao is not None:
+            usuario_ids.append(perfil.usuario_id)
+            codificacoes.append(codificacao)
+
+    matriz = np.vstack(codificacoes) if codificacoes else np.empty((0, DIMENSOES))
+    galeria = motores.comparador().indexar(usuario_ids, matriz, versao[0])
+    _carregada = (versao, galeria)
+    return galeria
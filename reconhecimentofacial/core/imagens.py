@@ -0,0 +1,232 @@
+"""
+Fotos de perfil: normalização no envio e derivadas (miniaturas).
+
+No envio (normalizar_foto) a imagem é decodificada uma vez, girada conforme
+o EXIF, reduzida a settings.FOTO_LADO_MAXIMO e regravada em JPEG sem
+metadados, então o custo de cada leitura posterior (reconhecimento,
+miniaturas, admin) fica limitado.
+
+Para o reconhecimento (carregar_rgb) os JPEGs são decodificados já na
+escala de trabalho: o draft() do Pillow faz o decodificador aplicar a
+redução de 1/2, 1/4 ou 1/8 na própria DCT, sem montar a imagem inteira.
+
+As páginas exibem a foto em 56 a 120 px, mas a foto original tem a resolução
+da webcam. Para cada foto são gravadas, ao lado da original, versões
+quadradas de 80 e 200 px em WebP e JPEG e, quando a caixa do rosto é
+conhecida (PerfilUsuario.caixa_rosto), um recorte de 200 px centrado no
+rosto. Os nomes ficam em PerfilUsuario.miniaturas ({'m.webp': nome, ...}) e
+o template tag {% foto_perfil %} escolhe a derivada (com a original como
+alternativa enquanto ela não existe).
+"""
+
+import base64
+import binascii
+import io
+import logging
+import os
+import posixpath
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+import numpy as np
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# Imagens com mais pixels que isso nem são decodificadas
+PIXELS_MAXIMOS = 40_000_000
+
+
+class FotoInvalida(ValueError):
+    """Foto recusada no envio; sugestoes orienta uma nova captura"""
+
+    def __init__(self, mensagem, sugestoes=()):
+        super().__init__(mensagem)
+        self.sugestoes = list(sugestoes)
+
+
+def decodificar_base64(foto_data):
+    """Conteúdo do campo foto_base64 (com ou sem o prefixo data:image) -> bytes"""
+    if foto_data.startswith('data:image'):
+        foto_data = foto_data.split(',', 1)[1]
+    try:
+        return base64.b64decode(foto_data)
+    except (binascii.Error, ValueError):
+        raise FotoInvalida('A foto enviada não é uma imagem válida.')
+
+
+class LeituraMonitorada:
+    """
+    Arquivo que registra se o decodificador pediu dados depois do fim.
+
+    O face_recognition liga ImageFile.LOAD_TRUNCATED_IMAGES ao ser importado,
+    para o processo inteiro, e o Pillow passa a completar arquivos truncados
+    em silêncio. Trocar a flag a cada imagem disputaria com outras threads;
+    em vez disso, cada leitura confere o próprio arquivo com truncada().
+    """
+
+    def __init__(self, arquivo):
+        self._arquivo = arquivo
+        self.faltaram_dados = False
+
+    def read(self, tamanho=-1):
+        dados = self._arquivo.read(tamanho)
+        if not dados and tamanho:
+            self.faltaram_dados = True
+        return dados
+
+    def __getattr__(self, nome):
+        return getattr(self._arquivo, nome)
+
+    def truncada(self):
+        """Levanta OSError (como o Pillow com a flag desligada) se faltaram dados"""
+        if self.faltaram_dados:
+            raise OSError('image file is truncated')
+
+
+def normalizar_foto(dados):
+    """Bytes enviados -> imagem RGB orientada e com no máximo FOTO_LADO_MAXIMO de lado"""
+    lado = getattr(settings, 'FOTO_LADO_MAXIMO', 1024)
+    leitura = LeituraMonitorada(io.BytesIO(dados))
+    try:
+        original = Image.open(leitura)
+    except (OSError, Image.DecompressionBombError):
+        raise FotoInvalida('A foto enviada não é uma imagem válida.')
+    with original:
+        if original.width * original.height > PIXELS_MAXIMOS:
+            raise FotoInvalida('A foto enviada é grande demais.', ['Envie uma foto com resolução menor'])
+        original.draft('RGB', (lado, lado))
+        try:
+            imagem = ImageOps.exif_transpose(original).convert('RGB')
+            leitura.truncada()
+        except (OSError, SyntaxError, ValueError):
+            # Arquivo truncado ou corrompido
+            raise FotoInvalida('A foto enviada não é uma imagem válida.')
+    imagem.thumbnail((lado, lado), Image.LANCZOS)
+    return imagem
+
+
+def carregar_rgb(origem, lado_maximo=None):
+    """
+    Caminho ou arquivo da imagem -> (array RGB uint8, escala), com no máximo
+    lado_maximo de lado. O array usa o buffer exportado pelo Pillow (somente
+    leitura, sem a cópia extra do np.array); escala converte coordenadas do
+    array para as da imagem original.
+    """
+    try:
+        with ExitStack() as pilha:
+            if isinstance(origem, (str, os.PathLike)):
+                origem = pilha.enter_context(open(origem, 'rb'))
+            leitura = LeituraMonitorada(origem)
+            imagem = pilha.enter_context(Image.open(leitura))
+            lado_original = max(imagem.size)
+            if lado_maximo:
+                imagem.draft('RGB', (lado_maximo, lado_maximo))
+            ImageOps.exif_transpose(imagem, in_place=True)
+            if imagem.mode != 'RGB':
+                imagem = imagem.convert('RGB')
+            if lado_maximo:
+                imagem.thumbnail((lado_maximo, lado_maximo), Image.BILINEAR)
+            array = np.asarray(imagem)
+            leitura.truncada()
+            return array, lado_original / max(imagem.size)
+    except (OSError, SyntaxError, ValueError, Image.DecompressionBombError):
+        raise FotoInvalida('Não foi possível ler a imagem.')
+
+
+def codificar_jpeg(imagem):
+    """Imagem -> JPEG sem metadados (EXIF, ICC) na qualidade de FOTO_QUALIDADE_JPEG"""
+    buffer = io.BytesIO()
+    imagem.save(buffer, 'JPEG', quality=getattr(settings, 'FOTO_QUALIDADE_JPEG', 85), optimize=True)
+    return buffer.getvalue()
+
+
+# Nome da derivada -> lado em pixels
+DERIVADAS = {
+    'p': 80,
+    'm': 200,
+    'rosto': 200,
+}
+
+FORMATOS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+CHAVES = [f'{nome}.{extensao}' for nome in DERIVADAS for extensao in FORMATOS]
+
+# Folga ao redor da caixa do rosto, em proporção do lado da caixa
+MARGEM_ROSTO = 0.4
+
+# As derivadas são geradas a partir de uma cópia reduzida a este lado máximo
+LADO_TRABALHO = 800
+
+
+def _recorte_rosto(imagem, caixa, escala):
+    """Quadrado centrado na caixa (topo, direita, base, esquerda) do face_recognition"""
+    topo, direita, base, esquerda = (valor * escala for valor in caixa)
+    lado = max(direita - esquerda, base - topo) * (1 + 2 * MARGEM_ROSTO)
+    lado = min(lado, imagem.width, imagem.height)
+    x = min(max((esquerda + direita - lado) / 2, 0), imagem.width - lado)
+    y = min(max((topo + base - lado) / 2, 0), imagem.height - lado)
+    return imagem.crop((round(x), round(y), round(x + lado), round(y + lado)))
+
+
+def gerar_derivadas(arquivo, caixa=None):
+    """Arquivo da foto -> {'m.webp': bytes, ...}"""
+    with Image.open(arquivo) as original:
+        imagem = ImageOps.exif_transpose(original).convert('RGB')
+    largura = imagem.width
+    imagem.thumbnail((LADO_TRABALHO, LADO_TRABALHO), Image.LANCZOS, reducing_gap=3.0)
+    escala = imagem.width / largura
+
+    derivadas = {}
+    for nome, lado in DERIVADAS.items():
+        if nome == 'rosto':
+            if not caixa:
+                continue
+            recorte = _recorte_rosto(imagem, caixa, escala).resize((lado, lado), Image.LANCZOS)
+        else:
+            recorte = ImageOps.fit(imagem, (lado, lado), Image.LANCZOS)
+        for extensao, (formato, opcoes) in FORMATOS.items():
+            buffer = io.BytesIO()
+            recorte.save(buffer, formato, **opcoes)
+            derivadas[f'{nome}.{extensao}'] = buffer.getvalue()
+    return derivadas
+
+
+def nome_derivada(nome_foto, chave):
+    """fotos_usuarios/joao_foto.jpg + 'm.webp' -> fotos_usuarios/derivadas/joao_foto_m.webp"""
+    pasta, arquivo = posixpath.split(nome_foto)
+    raiz = posixpath.splitext(arquivo)[0]
+    nome, extensao = chave.split('.')
+    return posixpath.join(pasta, 'derivadas', f'{raiz}_{nome}.{extensao}')
+
+
+def remover_derivadas(nome_foto, storage=default_storage):
+    for chave in CHAVES:
+        storage.delete(nome_derivada(nome_foto, chave))
+
+
+def salvar_derivadas(nome_foto, caixa=None, storage=default_storage):
+    """
+    Gera e grava as derivadas da foto. Retorna o novo valor de
+    PerfilUsuario.miniaturas ({} se a foto não puder ser lida).
+    """
+    if not nome_foto:
+        return {}
+    try:
+        with storage.open(nome_foto) as arquivo:
+            derivadas = gerar_derivadas(arquivo, caixa)
+    except (OSError, ValueError) as e:
+        logger.warning('Não foi possível gerar as miniaturas de %s: %s', nome_foto, e)
+        return {}
+
+    miniaturas = {}
+    for chave, conteudo in derivadas.items():
+        nome = nome_derivada(nome_foto, chave)
+        storage.delete(nome)
+        miniaturas[chave] = storage.save(nome, ContentFile(conteudo))
+    return miniaturas
@@ -0,0 +1,76 @@
+"""
+Comando Django para mover propriedades desativadas há mais de N dias para o
+arquivo (PropriedadeRuralArquivada), em lotes. Pode ser agendado (cron).
+
+Uso: python manage.py arquivar_propriedades --dias 180
+     python manage.py arquivar_propriedades --simular
+     python manage.py arquivar_propriedades --restaurar 15 42 --reativar
+"""
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.arquivamento import arquivar_inativas, candidatas, restaurar
+
+
+class Command(BaseCommand):
+    help = 'Arquiva propriedades inativas antigas fora da tabela principal (ou restaura arquivadas)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dias',
+            type=int,
+            default=180,
+            help='Arquiva propriedades desativadas há mais de N dias (padrão: 180)',
+        )
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=1000,
+            help='Propriedades movidas por transação (padrão: 1000)',
+        )
+        parser.add_argument(
+            '--simular',
+            action='store_true',
+            help='Apenas informa quantas propriedades seriam arquivadas',
+        )
+        parser.add_argument(
+            '--restaurar',
+            type=int,
+            nargs='+',
+            metavar='ID',
+            help='Restaura as propriedades arquivadas com estes ids',
+        )
+        parser.add_argument(
+            '--reativar',
+            action='store_true',
+            help='Com --restaurar, também marca as propriedades como ativas',
+        )
+
+    def handle(self, *args, **options):
+        if options['restaurar']:
+            restauradas = restaurar(options['restaurar'], reativar=options['reativar'])
+            self.stdout.write(self.style.SUCCESS(f'♻️  {restauradas} propriedade(s) restaurada(s)'))
+            faltantes = len(set(options['restaurar'])) - restauradas
+            if faltantes:
+                self.stdout.write(self.style.WARNING(f'⚠️  {faltantes} id(s) não encontrados no arquivo'))
+            return
+
+        if options['dias'] < 0 or options['lote'] < 1:
+            raise CommandError('--dias não pode ser negativo e --lote deve ser maior que zero')
+
+        if options['simular']:
+            total = candidatas(options['dias']).count()
+            self.stdout.write(f'🔎 {total} propriedade(s) inativas há mais de {options["dias"]} dias seriam arquivadas')
+            return
+
+        inicio = time.perf_counter()
+        arquivadas = 0
+        for quantidade in arquivar_inativas(options['dias'], options['lote']):
+            arquivadas += quantidade
+            self.stdout.write(f'  ✓ {arquivadas} arquivadas')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'📦 {arquivadas} propriedade(s) arquivada(s) em {time.perf_counter() - inicio:.1f}s'
+        ))
@@ -0,0 +1,143 @@
+"""
+Comando Django para medir o pré-filtro de cascata (provavel_rosto) em um
+conjunto local de imagens: uma pasta com quadros que têm rosto e outra com
+quadros sem rosto (câmera vazia, pessoa fora do quadro...).
+
+Para cada combinação de cascata, lado da cópia reduzida e vizinhos mínimos,
+informa a taxa de falsa recusa (quadros com rosto barrados, que viram
+"Nenhum rosto detectado" no login), a fração dos quadros sem rosto barrados
+(o que deixa de ir para o dlib) e o tempo por quadro. Com o face_recognition
+instalado, a falsa recusa também é medida contra o próprio dlib (quadros em
+que o pré-processamento + detector do login acha um rosto) e é informado
+quanto esse caminho, evitado nos quadros barrados, custa por quadro.
+
+Uso: python manage.py avaliar_prefiltro --com-rosto testes/com_rosto --sem-rosto testes/sem_rosto
+     python manage.py avaliar_prefiltro --com-rosto testes/com_rosto --lados 120 160 200 --vizinhos 0 1 \
+         --cascatas haarcascade_frontalface_default.xml haarcascade_frontalface_alt2.xml
+"""
+
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.imagens import FotoInvalida, carregar_rgb
+from core.reconhecimento import carregar_cascata, localizar_rostos, preparar_para_codificacao, provavel_rosto
+
+EXTENSOES = ('.jpg', '.jpeg', '.png', '.webp', '.bmp')
+
+
+def percentual(parte, total):
+    return f'{parte}/{total} ({parte / total * 100:.1f}%)' if total else '-'
+
+
+class Command(BaseCommand):
+    help = 'Mede falsa recusa, quadros sem rosto barrados e tempo do pré-filtro de cascata'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--com-rosto', help='Pasta com imagens que têm um rosto')
+        parser.add_argument('--sem-rosto', help='Pasta com imagens sem rosto')
+        parser.add_argument(
+            '--cascatas',
+            nargs='+',
+            default=None,
+            help='Cascatas avaliadas (padrão: PREFILTRO_CASCATA)',
+        )
+        parser.add_argument(
+            '--lados',
+            type=int,
+            nargs='+',
+            default=None,
+            help='Lados máximos da cópia reduzida (padrão: PREFILTRO_LADO)',
+        )
+        parser.add_argument(
+            '--vizinhos',
+            type=int,
+            nargs='+',
+            default=None,
+            help='Vizinhos mínimos da cascata (padrão: PREFILTRO_VIZINHOS)',
+        )
+
+    def carregar(self, pasta):
+        if not pasta:
+            return []
+        if not os.path.isdir(pasta):
+            raise CommandError(f'Pasta não encontrada: {pasta}')
+        imagens = []
+        for raiz, _, arquivos in os.walk(pasta):
+            for arquivo in sorted(arquivos):
+                if not arquivo.lower().endswith(EXTENSOES):
+                    continue
+                caminho = os.path.join(raiz, arquivo)
+                try:
+                    # Mesma decodificação do login
+                    imagens.append(carregar_rgb(caminho, settings.RECONHECIMENTO_LADO_MAXIMO)[0])
+                except FotoInvalida:
+                    self.stdout.write(self.style.WARNING(f'⚠️  {caminho}: imagem ilegível'))
+        return imagens
+
+    def referencia_dlib(self, imagens, sem_rosto):
+        """
+        Para cada imagem, se o caminho do login (pré-processamento +
+        MOTOR_DETECTOR) acha um rosto; None sem o face_recognition
+        """
+        detectaveis = []
+        inicio = time.perf_counter()
+        try:
+            for imagem in imagens:
+                detectaveis.append(bool(localizar_rostos(preparar_para_codificacao(imagem))))
+        except ImportError:
+            return None
+        ms = (time.perf_counter() - inicio) * 1000 / len(imagens)
+        self.stdout.write(
+            f'⏱️  Pré-processamento + detecção ({settings.MOTOR_DETECTOR}): {ms:.1f} ms por quadro; '
+            f'rosto encontrado em {percentual(sum(detectaveis), len(imagens))} '
+            f'(nos sem rosto: {sum(detectaveis[len(imagens) - sem_rosto:])})'
+        )
+        return detectaveis
+
+    def handle(self, *args, **options):
+        if not options['com_rosto'] and not options['sem_rosto']:
+            raise CommandError('Informe --com-rosto e/ou --sem-rosto')
+        lados = options['lados'] or [settings.PREFILTRO_LADO]
+        cascatas = options['cascatas'] or [settings.PREFILTRO_CASCATA]
+        vizinhos_avaliados = options['vizinhos'] or [settings.PREFILTRO_VIZINHOS]
+        if min(lados) < 1 or min(vizinhos_avaliados) < 0:
+            raise CommandError('--lados deve ser maior que zero e --vizinhos não pode ser negativo')
+        try:
+            for cascata in cascatas:
+                carregar_cascata(cascata)
+        except ImportError:
+            raise CommandError('OpenCV (opencv-python) não está instalado')
+
+        com_rosto = self.carregar(options['com_rosto'])
+        sem_rosto = self.carregar(options['sem_rosto'])
+        imagens = com_rosto + sem_rosto
+        if not imagens:
+            raise CommandError('Nenhuma imagem encontrada')
+        self.stdout.write(f'\n🧪 {len(com_rosto)} imagem(ns) com rosto, {len(sem_rosto)} sem rosto')
+        detectaveis = self.referencia_dlib(imagens, len(sem_rosto))
+
+        self.stdout.write(
+            f'\n{"cascata":<38} {"lado":>5} {"viz.":>4} {"falsa recusa":>17} {"f. recusa (dlib)":>17} '
+            f'{"sem rosto barrados":>19} {"ms/quadro":>10}'
+        )
+        for cascata in cascatas:
+            for lado in lados:
+                for vizinhos in vizinhos_avaliados:
+                    inicio = time.perf_counter()
+                    recusados = [not provavel_rosto(imagem, lado, vizinhos, cascata) for imagem in imagens]
+                    ms = (time.perf_counter() - inicio) * 1000 / len(imagens)
+
+                    falsa_recusa = percentual(sum(recusados[:len(com_rosto)]), len(com_rosto))
+                    barrados = percentual(sum(recusados[len(com_rosto):]), len(sem_rosto))
+                    contra_dlib = '-'
+                    if detectaveis is not None:
+                        contra_dlib = percentual(
+                            sum(r for r, d in zip(recusados, detectaveis) if d), sum(detectaveis)
+                        )
+                    self.stdout.write(
+                        f'{os.path.basename(cascata):<38} {lado:>5} {vizinhos:>4} {falsa_recusa:>17} '
+                        f'{contra_dlib:>17} {barrados:>19} {ms:>10.2f}'
+                    )
@@ -0,0 +1,108 @@
+"""
+Comando Django para comparar a decodificação completa das imagens (o
+Image.open().convert('RGB') + np.array() que o reconhecimento fazia) com a
+decodificação reduzida de carregar_rgb (draft do JPEG + buffer do Pillow).
+
+Sem --imagem, usa uma foto sintética de 12 MP (como a de um celular). A
+memória é o pico medido pelo tracemalloc somado ao buffer de pixels do
+Pillow, que é alocado fora do Python e não aparece no tracemalloc.
+
+Uso: python manage.py benchmark_decodificacao
+     python manage.py benchmark_decodificacao --imagem media/fotos_usuarios/ab/cd/abcd.jpg --lado 800
+"""
+
+import io
+import time
+import tracemalloc
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from PIL import Image
+
+from core.imagens import carregar_rgb
+
+
+def decodificar_completa(dados, lado):
+    with Image.open(io.BytesIO(dados)) as imagem:
+        rgb = imagem.convert('RGB')
+        return np.array(rgb), rgb.width * rgb.height * 3
+
+
+def decodificar_reduzida(dados, lado):
+    array, _ = carregar_rgb(io.BytesIO(dados), lado)
+    return array, array.nbytes
+
+
+METODOS = [
+    ('completa (convert + np.array)', decodificar_completa),
+    ('reduzida (draft + np.asarray)', decodificar_reduzida),
+]
+
+
+def foto_sintetica():
+    """JPEG de 4000x3000 com textura (compressão parecida com a de uma foto)"""
+    base = Image.effect_mandelbrot((4000, 3000), (-2.2, -1.2, 1.0, 1.2), 80)
+    ruido = Image.effect_noise((4000, 3000), 24)
+    imagem = Image.merge('RGB', (base, ruido, Image.linear_gradient('L').resize((4000, 3000))))
+    buffer = io.BytesIO()
+    imagem.save(buffer, 'JPEG', quality=90)
+    return buffer.getvalue()
+
+
+class Command(BaseCommand):
+    help = 'Mede tempo e memória da decodificação completa e da reduzida (draft) das imagens'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--imagem',
+            nargs='+',
+            help='Arquivos medidos (padrão: uma foto sintética de 12 MP)',
+        )
+        parser.add_argument(
+            '--lado',
+            type=int,
+            default=None,
+            help='Lado máximo da decodificação reduzida (padrão: RECONHECIMENTO_LADO_MAXIMO)',
+        )
+        parser.add_argument(
+            '--repeticoes',
+            type=int,
+            default=10,
+            help='Decodificações medidas por imagem e método (padrão: 10)',
+        )
+
+    def handle(self, *args, **options):
+        if options['repeticoes'] < 1:
+            raise CommandError('--repeticoes deve ser maior que zero')
+        lado = options['lado'] or settings.RECONHECIMENTO_LADO_MAXIMO
+
+        if options['imagem']:
+            imagens = []
+            for caminho in options['imagem']:
+                try:
+                    with open(caminho, 'rb') as arquivo:
+                        imagens.append((caminho, arquivo.read()))
+                except OSError as e:
+                    raise CommandError(f'Não foi possível ler {caminho}: {e}')
+        else:
+            imagens = [('foto sintética 4000x3000', foto_sintetica())]
+
+        for nome, dados in imagens:
+            self.stdout.write(f'\n📷 {nome} ({len(dados) / 1024:.0f} KB), lado de trabalho {lado}px')
+            self.stdout.write(f'{"método":<32} {"resolução":>11} {"ms":>8} {"pico MB":>8}')
+            for metodo, decodificar in METODOS:
+                array, _ = decodificar(dados, lado)  # aquecimento
+                inicio = time.perf_counter()
+                for _ in range(options['repeticoes']):
+                    decodificar(dados, lado)
+                ms = (time.perf_counter() - inicio) * 1000 / options['repeticoes']
+
+                tracemalloc.start()
+                array, buffer_pillow = decodificar(dados, lado)
+                pico = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+
+                resolucao = f'{array.shape[1]}x{array.shape[0]}'
+                memoria = (pico + buffer_pillow) / 1024 / 1024
+                self.stdout.write(f'{metodo:<32} {resolucao:>11} {ms:>8.1f} {memoria:>8.1f}')
@@ -0,0 +1,250 @@
+"""
+Comando Django para comparar os motores do reconhecimento (core/motores.py)
+no mesmo conjunto local de imagens, decodificadas e pré-processadas como no
+login.
+
+- Detectores: tempo por quadro (média e p95), quadros por segundo, imagens
+  com rosto e concordância com o detector de referência (mesma quantidade de
+  rostos, cada um sobreposto a um da referência).
+- Codificadores: tempo por imagem, nos rostos achados pela referência, e
+  concordância das decisões "mesma pessoa" (distância < --tolerancia) entre
+  todos os pares de rostos com as do codificador de referência.
+- Comparadores: memória da galeria, tempo por consulta e recall@1 (o mais
+  próximo encontrado é o mesmo da comparação exata em float64), em uma
+  galeria com os rostos reais mais --galeria-sintetica codificações
+  sorteadas com a média e o desvio de cada dimensão dos reais; as consultas
+  são linhas da galeria com um pequeno ruído.
+
+A referência dos detectores e codificadores é o motor configurado
+(MOTOR_DETECTOR e MOTOR_CODIFICADOR).
+
+Uso: python manage.py benchmark_motores --imagens testes/rostos
+     python manage.py benchmark_motores --imagens testes/rostos --detectores hog haar --codificadores dlib
+     python manage.py benchmark_motores --imagens testes/rostos --detectores hog --codificadores dlib \
+         --galeria-sintetica 1000000
+"""
+
+import os
+import tempfile
+import time
+
+import numpy as np
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+
+from core import motores
+from core.ao_vivo import sobreposicao
+from core.galeria import Galeria
+from core.imagens import FotoInvalida, carregar_rgb
+from core.reconhecimento import preparar_para_codificacao
+
+EXTENSOES = ('.jpg', '.jpeg', '.png', '.webp', '.bmp')
+
+# Detectores diferentes põem margens diferentes em volta do rosto
+SOBREPOSICAO_MINIMA = 0.3
+# Consultas dos comparadores e desvio do ruído somado a elas, por dimensão
+CONSULTAS = 200
+RUIDO_CONSULTA = 0.01
+
+
+def percentual(parte, total):
+    return f'{parte / total * 100:.1f}%' if total else '-'
+
+
+def medir(funcao, entradas, repeticoes):
+    """Resultados da primeira rodada e tempos (ms) de cada entrada, pelo menor entre as repetições"""
+    funcao(entradas[0])  # aquecimento (carga dos modelos)
+    resultados, tempos = [], []
+    for entrada in entradas:
+        menor = None
+        for _ in range(repeticoes):
+            inicio = time.perf_counter()
+            resultado = funcao(entrada)
+            ms = (time.perf_counter() - inicio) * 1000
+            menor = ms if menor is None else min(menor, ms)
+        resultados.append(resultado)
+        tempos.append(menor)
+    return resultados, np.array(tempos)
+
+
+def mesmos_rostos(caixas, referencia):
+    if len(caixas) != len(referencia):
+        return False
+    return all(max((sobreposicao(caixa, outra) for outra in caixas), default=0) >= SOBREPOSICAO_MINIMA
+               for caixa in referencia)
+
+
+def decisoes(codificacoes, tolerancia):
+    """Decisão 'mesma pessoa' de cada par (i < j) de rostos"""
+    galeria = Galeria(np.arange(len(codificacoes)), codificacoes)
+    distancias = galeria.distancias(codificacoes)
+    return distancias[np.triu_indices(len(codificacoes), 1)] < tolerancia
+
+
+class Command(BaseCommand):
+    help = 'Compara latência, vazão e concordância dos motores de detecção, codificação e comparação'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--imagens', required=True, help='Pasta com as imagens avaliadas')
+        parser.add_argument(
+            '--detectores',
+            nargs='+',
+            default=None,
+            help='Detectores avaliados (padrão: todos os registrados; o cnn é lento sem GPU)',
+        )
+        parser.add_argument(
+            '--codificadores',
+            nargs='+',
+            default=None,
+            help='Codificadores avaliados (padrão: todos os registrados)',
+        )
+        parser.add_argument(
+            '--comparadores',
+            nargs='+',
+            default=None,
+            help='Comparadores avaliados (padrão: todos os registrados)',
+        )
+        parser.add_argument(
+            '--repeticoes',
+            type=int,
+            default=1,
+            help='Medições por imagem; vale a menor (padrão: 1)',
+        )
+        parser.add_argument(
+            '--tolerancia',
+            type=float,
+            default=0.6,
+            help='Distância abaixo da qual dois rostos são a mesma pessoa (padrão: 0.6)',
+        )
+        parser.add_argument(
+            '--galeria-sintetica',
+            type=int,
+            default=10000,
+            help='Codificações sorteadas somadas à galeria dos comparadores (padrão: 10000)',
+        )
+
+    def carregar(self, pasta):
+        if not os.path.isdir(pasta):
+            raise CommandError(f'Pasta não encontrada: {pasta}')
+        imagens = []
+        for raiz, _, arquivos in os.walk(pasta):
+            for arquivo in sorted(arquivos):
+                if not arquivo.lower().endswith(EXTENSOES):
+                    continue
+                caminho = os.path.join(raiz, arquivo)
+                try:
+                    # Mesma decodificação e pré-processamento do login
+                    imagem = carregar_rgb(caminho, settings.RECONHECIMENTO_LADO_MAXIMO)[0]
+                except FotoInvalida:
+                    self.stdout.write(self.style.WARNING(f'⚠️  {caminho}: imagem ilegível'))
+                    continue
+                imagens.append(preparar_para_codificacao(imagem))
+        return imagens
+
+    def motor(self, tipo, nome):
+        try:
+            return motores.motor(tipo, nome)
+        except ImproperlyConfigured as e:
+            raise CommandError(str(e))
+
+    def cabecalho(self, titulo, *colunas):
+        self.stdout.write(f'\n{titulo}')
+        self.stdout.write(f'{"motor":<24} ' + ' '.join(f'{coluna:>14}' for coluna in colunas))
+
+    def linha(self, nome, *valores):
+        self.stdout.write(f'{nome:<24} ' + ' '.join(f'{valor:>14}' for valor in valores))
+
+    def handle(self, *args, **options):
+        if options['repeticoes'] < 1 or options['galeria_sintetica'] < 0:
+            raise CommandError('--repeticoes deve ser maior que zero e --galeria-sintetica não pode ser negativa')
+        detectores = options['detectores'] or list(motores.DETECTORES)
+        codificadores = options['codificadores'] or list(motores.CODIFICADORES)
+        comparadores = options['comparadores'] or list(motores.COMPARADORES)
+        repeticoes = options['repeticoes']
+
+        imagens = self.carregar(options['imagens'])
+        if not imagens:
+            raise CommandError('Nenhuma imagem encontrada')
+        self.stdout.write(
+            f'\n🧪 {len(imagens)} imagem(ns); referência: {settings.MOTOR_DETECTOR}, {settings.MOTOR_CODIFICADOR}'
+        )
+
+        try:
+            referencia, _ = medir(self.motor('detector', None).localizar, imagens, 1)
+        except ImportError as e:
+            raise CommandError(f'Detector de referência indisponível: {e}')
+
+        self.cabecalho('🔎 Detectores', 'ms (média)', 'ms (p95)', 'quadros/s', 'com rosto', 'concordância')
+        for nome in detectores:
+            try:
+                caixas, tempos = medir(self.motor('detector', nome).localizar, imagens, repeticoes)
+            except ImportError as e:
+                self.stdout.write(self.style.WARNING(f'⚠️  {nome}: indisponível ({e})'))
+                continue
+            com_rosto = sum(bool(c) for c in caixas)
+            iguais = sum(mesmos_rostos(c, r) for c, r in zip(caixas, referencia))
+            self.linha(
+                nome, f'{tempos.mean():.1f}', f'{np.percentile(tempos, 95):.1f}', f'{1000 / tempos.mean():.1f}',
+                percentual(com_rosto, len(imagens)), percentual(iguais, len(imagens)),
+            )
+
+        # Codificadores e comparadores trabalham nos rostos achados pela referência
+        entradas = [(imagem, caixas) for imagem, caixas in zip(imagens, referencia) if caixas]
+        total_rostos = sum(len(caixas) for _, caixas in entradas)
+        if total_rostos < 2:
+            self.stdout.write(self.style.WARNING('\n⚠️  Menos de dois rostos encontrados: codificadores e comparadores não avaliados'))
+            return
+
+        tolerancia = options['tolerancia']
+        codificar_referencia = self.motor('codificador', None).codificar
+        codificacoes, _ = medir(lambda entrada: codificar_referencia(*entrada), entradas, 1)
+        codificacoes = np.vstack(codificacoes)
+        decisoes_referencia = decisoes(codificacoes, tolerancia)
+
+        self.cabecalho(f'🧬 Codificadores ({total_rostos} rostos)', 'ms (média)', 'ms (p95)', 'rostos/s', 'concordância')
+        for nome in codificadores:
+            codificar = self.motor('codificador', nome).codificar
+            try:
+                resultados, tempos = medir(lambda entrada: codificar(*entrada), entradas, repeticoes)
+            except ImportError as e:
+                self.stdout.write(self.style.WARNING(f'⚠️  {nome}: indisponível ({e})'))
+                continue
+            iguais = decisoes(np.vstack(resultados), tolerancia) == decisoes_referencia
+            self.linha(
+                nome, f'{tempos.mean():.1f}', f'{np.percentile(tempos, 95):.1f}',
+                f'{total_rostos * 1000 / tempos.sum():.1f}', percentual(iguais.sum(), len(iguais)),
+            )
+
+        # Galeria: rostos reais + codificações sorteadas com a mesma distribuição
+        aleatorio = np.random.default_rng(0)
+        sinteticas = aleatorio.normal(
+            codificacoes.mean(axis=0), codificacoes.std(axis=0), (options['galeria_sintetica'], codificacoes.shape[1])
+        )
+        matriz = np.vstack([codificacoes, sinteticas])
+        del sinteticas
+        usuario_ids = np.arange(len(matriz))
+        amostra = aleatorio.choice(len(matriz), min(CONSULTAS, len(matriz)), replace=False)
+        consultas = list(matriz[amostra] + aleatorio.normal(0, RUIDO_CONSULTA, (len(amostra), matriz.shape[1])))
+        # Mais próximo de cada consulta em precisão total, sem tolerância
+        exata = Galeria(usuario_ids, matriz)
+        esperados = [exata.identificar(consulta, np.inf)[0][0] for consulta in consultas]
+        del exata
+
+        self.cabecalho(
+            f'📚 Comparadores (galeria de {len(matriz)}, {len(consultas)} consultas)',
+            'MB', 'ms (média)', 'ms (p95)', 'consultas/s', 'recall@1',
+        )
+        with tempfile.TemporaryDirectory() as diretorio:
+            for nome in comparadores:
+                comparador = self.motor('comparador', nome)
+                galeria = comparador.indexar(usuario_ids, matriz, 0, diretorio)
+                resultados, tempos = medir(
+                    lambda consulta: comparador.identificar(galeria, consulta, np.inf)[0][0], consultas, repeticoes
+                )
+                acertos = sum(r == e for r, e in zip(resultados, esperados))
+                self.linha(
+                    nome, f'{galeria.nbytes / 1024 / 1024:.1f}', f'{tempos.mean():.2f}',
+                    f'{np.percentile(tempos, 95):.2f}', f'{1000 / tempos.mean():.0f}',
+                    percentual(acertos, len(consultas)),
+                )
@@ -0,0 +1,119 @@
+"""
+Comando Django para comparar as consultas ao banco por requisição autenticada
+com cada combinação de armazenamento de sessão e backend de autenticação.
+
+Cria um usuário temporário dentro de uma transação que é desfeita ao final e
+usa caches em memória próprios, sem tocar nos dados nem nos caches reais.
+
+Uso: python manage.py benchmark_sessoes
+     python manage.py benchmark_sessoes --requisicoes 50 --url /propriedades/
+"""
+
+import re
+import time
+from collections import Counter
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.autenticacao import CAMINHO as BACKEND_EM_CACHE
+
+MODEL_BACKEND = 'django.contrib.auth.backends.ModelBackend'
+
+CONFIGURACOES = [
+    ('db + ModelBackend', 'django.contrib.sessions.backends.db', MODEL_BACKEND),
+    ('db + usuário em cache', 'django.contrib.sessions.backends.db', BACKEND_EM_CACHE),
+    ('cached_db + usuário em cache', 'django.contrib.sessions.backends.cached_db', BACKEND_EM_CACHE),
+    ('cookies + usuário em cache', 'django.contrib.sessions.backends.signed_cookies', BACKEND_EM_CACHE),
+]
+
+CACHES_ISOLADOS = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'benchmark'},
+    'local': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'benchmark-local'},
+}
+
+TABELAS = {
+    'django_session': 'sessão',
+    'auth_user': 'usuário',
+    'core_perfilusuario': 'perfil',
+}
+
+TABELA_SQL = re.compile(r'(?:FROM|UPDATE|INTO)\s+"?(\w+)"?', re.IGNORECASE)
+
+
+class Desfazer(Exception):
+    pass
+
+
+def _classificar(sql):
+    tabela = TABELA_SQL.search(sql)
+    return TABELAS.get(tabela.group(1) if tabela else '', 'página')
+
+
+class Command(BaseCommand):
+    help = 'Mede as consultas por requisição com cada backend de sessão/autenticação'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requisicoes',
+            type=int,
+            default=20,
+            help='Requisições medidas por configuração (padrão: 20)',
+        )
+        parser.add_argument(
+            '--url',
+            help='Página requisitada (padrão: o dashboard)',
+        )
+
+    def handle(self, *args, **options):
+        if options['requisicoes'] < 1:
+            raise CommandError('--requisicoes deve ser maior que zero')
+
+        url = options['url'] or reverse('index')
+        resultados = []
+        try:
+            with transaction.atomic():
+                usuario = User.objects.create_user('benchmark_sessoes', password=None)
+                for nome, engine, backend in CONFIGURACOES:
+                    resultados.append((nome, *self.medir(usuario, engine, backend, url, options['requisicoes'])))
+                raise Desfazer
+        except Desfazer:
+            pass
+
+        self.stdout.write(f'📊 {options["requisicoes"]} requisições a {url} (média por requisição)\n')
+        colunas = ['sessão', 'usuário', 'perfil', 'página']
+        self.stdout.write(f'{"configuração":<30} {"total":>6} ' + ' '.join(f'{c:>8}' for c in colunas) + f' {"ms":>7}')
+        for nome, contagens, total, ms in resultados:
+            self.stdout.write(
+                f'{nome:<30} {total:>6.1f} ' + ' '.join(f'{contagens[c]:>8.1f}' for c in colunas) + f' {ms:>7.2f}'
+            )
+
+    def medir(self, usuario, engine, backend, url, requisicoes):
+        configuracao = override_settings(
+            SESSION_ENGINE=engine,
+            AUTHENTICATION_BACKENDS=[backend],
+            CACHES=CACHES_ISOLADOS,
+            ALLOWED_HOSTS=['testserver'],
+        )
+        with configuracao:
+            client = Client()
+            client.force_login(usuario, backend=backend)
+            # A primeira requisição aquece os caches e grava as permissões na sessão
+            response = client.get(url)
+            if response.status_code >= 400:
+                raise CommandError(f'{url} respondeu {response.status_code}')
+
+            contagens = Counter()
+            inicio = time.perf_counter()
+            for _ in range(requisicoes):
+                with CaptureQueriesContext(connection) as consultas:
+                    client.get(url)
+                contagens.update(_classificar(consulta['sql']) for consulta in consultas)
+            ms = (time.perf_counter() - inicio) * 1000 / requisicoes
+
+        media = Counter({chave: total / requisicoes for chave, total in contagens.items()})
+        return media, sum(media.values()), ms
@@ -0,0 +1,47 @@
+"""
+Comando Django para calcular a codificação facial das fotos de perfil que
+ainda não a têm (fotos enviadas antes da galeria ou trocadas pelo admin),
+para que a primeira carga da galeria não precise fazer isso durante um login.
+
+Com --todas, recalcula também as que já existem: necessário ao trocar o
+MOTOR_CODIFICADOR, já que codificações de motores diferentes não se comparam.
+
+Uso: python manage.py codificar_galeria
+     python manage.py codificar_galeria --todas
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.galeria import codificar_perfil, invalidar_galeria, pendentes
+from core.models import PerfilUsuario
+
+
+class Command(BaseCommand):
+    help = 'Calcula as codificações faciais que faltam na galeria de reconhecimento'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--todas',
+            action='store_true',
+            help='Recalcula todas as codificações (após trocar o MOTOR_CODIFICADOR)',
+        )
+
+    def handle(self, *args, **options):
+        if options['todas']:
+            PerfilUsuario.objects.exclude(codificacao_facial__isnull=True).update(codificacao_facial=None)
+        perfis = list(pendentes())
+        if not perfis:
+            self.stdout.write(self.style.SUCCESS('✅ Todas as fotos já estão na galeria'))
+            return
+
+        self.stdout.write(f'🧬 Codificando {len(perfis)} foto(s)...')
+        inicio = time.perf_counter()
+        sem_rosto = sum(codificar_perfil(perfil) is None for perfil in perfis)
+        invalidar_galeria()
+
+        duracao = time.perf_counter() - inicio
+        self.stdout.write(self.style.SUCCESS(f'✅ {len(perfis) - sem_rosto} foto(s) codificada(s) em {duracao:.1f}s'))
+        if sem_rosto:
+            self.stdout.write(self.style.WARNING(f'⚠️  {sem_rosto} foto(s) sem rosto detectado'))
@@ -0,0 +1,55 @@
+"""
+Comando Django para exportar propriedades rurais em fluxo (CSV, GeoJSON ou
+NDJSON), com os mesmos filtros de nível e busca da listagem.
+
+Uso: python manage.py exportar_propriedades --formato geojson --saida propriedades.geojson
+     python manage.py exportar_propriedades --usuario diretor --search Fazenda --gzip --saida p.csv.gz
+"""
+
+import sys
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from core.exportacao import FORMATOS, TAMANHO_CHUNK, codificar, comprimir_gzip
+from core.views import filtrar_propriedades, obter_niveis_visualizacao
+
+
+class Command(BaseCommand):
+    help = 'Exporta propriedades rurais em CSV, GeoJSON ou NDJSON com memória constante'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--formato', choices=sorted(FORMATOS), default='csv', help='Formato de saída (padrão: csv)')
+        parser.add_argument('--saida', help='Arquivo de saída (padrão: saída padrão)')
+        parser.add_argument('--nivel', type=int, choices=[1, 2, 3], help='Exporta apenas um nível de impacto')
+        parser.add_argument('--search', default='', help='Busca por nome, proprietário ou cidade')
+        parser.add_argument(
+            '--usuario',
+            help='Aplica os níveis que este usuário pode visualizar (padrão: todos os níveis)',
+        )
+        parser.add_argument('--gzip', action='store_true', help='Comprime a saída com gzip')
+        parser.add_argument('--chunk', type=int, default=TAMANHO_CHUNK, help=f'Linhas lidas do banco por vez (padrão: {TAMANHO_CHUNK})')
+
+    def handle(self, *args, **options):
+        niveis = [1, 2, 3]
+        if options['usuario']:
+            usuario = User.objects.filter(username=options['usuario']).first()
+            if not usuario:
+                raise CommandError(f'Usuário não encontrado: {options["usuario"]}')
+            niveis = obter_niveis_visualizacao(usuario)
+
+        propriedades = filtrar_propriedades(niveis, options['nivel'], options['search'])
+        gerador = FORMATOS[options['formato']][0]
+        blocos = gerador(propriedades, chunk_size=options['chunk'])
+        conteudo = comprimir_gzip(blocos) if options['gzip'] else codificar(blocos)
+
+        saida = open(options['saida'], 'wb') if options['saida'] else sys.stdout.buffer
+        try:
+            for bloco in conteudo:
+                saida.write(bloco)
+        finally:
+            if options['saida']:
+                saida.close()
+
+        if options['saida']:
+            self.stderr.write(self.style.SUCCESS(f'✅ Exportação concluída: {options["saida"]}'))
@@ -0,0 +1,277 @@
+"""
+Comando Django para gerar grandes volumes de dados sintéticos (usuários e
+propriedades rurais) para testes de carga das listagens, buscas e dashboard.
+
+Os atributos são gerados de forma vetorizada com NumPy (estado, coordenadas,
+área, datas e nível) e gravados em lotes com bulk_create, ou COPY no
+PostgreSQL. Com a mesma --seed e o mesmo --lote, o resultado é idêntico.
+
+Uso: python manage.py gerar_dados_carga --quantidade 5000000 --usuarios 100000 --seed 42
+     python manage.py gerar_dados_carga --quantidade 100000 --limpar
+"""
+
+import time
+from datetime import date
+
+import numpy as np
+from django.contrib.admin.models import LogEntry
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from core.autenticacao import invalidar_usuarios
+from core.carga import concluir_carga, copiar_linhas, excluir_lote, suporta_copy
+from core.models import (
+    Agrotoxico, EstatisticaUsuario, FotoCapturada, PerfilUsuario, PropriedadeRural, PropriedadeRuralArquivada,
+)
+from .popular_propriedades import AGROTOXICOS, ESTADOS
+
+PREFIXO_USUARIO = 'carga_'
+
+# (cidade de referência, latitude, longitude, dispersão em graus, peso relativo)
+# O peso aproxima a participação de cada estado na área agrícola do país
+GEOGRAFIA_ESTADOS = {
+    'MT': ('Cuiabá', -12.64, -55.42, 2.8, 17),
+    'MG': ('Belo Horizonte', -18.10, -44.38, 2.2, 12),
+    'RS': ('Porto Alegre', -29.75, -53.20, 1.6, 10),
+    'PR': ('Curitiba', -24.89, -51.55, 1.3, 10),
+    'SP': ('Ribeirão Preto', -22.19, -48.79, 1.4, 10),
+    'GO': ('Goiânia', -15.98, -49.86, 1.7, 9),
+    'MS': ('Campo Grande', -20.51, -54.54, 1.9, 8),
+    'BA': ('Barreiras', -12.58, -41.70, 2.5, 8),
+    'PA': ('Paragominas', -3.79, -52.48, 3.0, 5),
+    'SC': ('Chapecó', -27.24, -50.22, 0.9, 4),
+    'TO': ('Palmas', -10.17, -48.30, 1.8, 4),
+    'RJ': ('Campos dos Goytacazes', -22.25, -42.66, 0.6, 2),
+    'AM': ('Manaus', -3.47, -62.22, 3.5, 1),
+}
+
+PREFIXOS_PROPRIEDADE = ['Fazenda', 'Sítio', 'Chácara', 'Rancho', 'Estância']
+NOMES_PROPRIEDADE = [
+    'Santa Maria', 'Boa Vista', 'São José', 'Primavera', 'Paraíso', 'Esperança',
+    'Monte Verde', 'Bela Vista', 'Campo Limpo', 'Água Clara', 'Três Irmãos',
+    'Serra Azul', 'Vale Verde', 'Ribeirão', 'Palmeiras', 'Horizonte', 'Alvorada',
+    'Rio Claro', 'Ventania', 'Girassol',
+]
+PRENOMES = [
+    'João', 'Maria', 'Carlos', 'Ana', 'Pedro', 'Juliana', 'Roberto', 'Fernanda',
+    'Marcos', 'Patrícia', 'José', 'Carla', 'Antonio', 'Lucia', 'Paulo', 'Sandra',
+]
+SOBRENOMES = [
+    'Silva', 'Santos', 'Oliveira', 'Costa', 'Almeida', 'Ferreira', 'Souza', 'Lima',
+    'Pereira', 'Rodrigues', 'Martins', 'Mendes', 'Barbosa', 'Cardoso', 'Ribeiro',
+]
+DESCRICOES = {
+    1: 'Contaminação leve detectada em análises pontuais do lençol freático. Necessário monitoramento.',
+    2: 'Contaminação moderada dos recursos hídricos com afetação de córregos próximos.',
+    3: 'Contaminação severa com comprometimento de rios principais da região.',
+}
+
+# Média e desvio (escala log) da área em hectares por nível
+AREA_LOG_POR_NIVEL = np.array([[np.log(50), 0.6], [np.log(250), 0.5], [np.log(1000), 0.5]])
+
+TIPOS_PERFIL = ['COMUM', 'DIRETOR', 'MINISTRO']
+PROPORCAO_PERFIS = [0.85, 0.12, 0.03]
+
+COLUNAS_COPY = [
+    'nome_propriedade', 'proprietario', 'cpf_cnpj', 'endereco', 'cidade', 'estado',
+    'area_hectares', 'agrotoxico_utilizado', 'agrotoxico_id', 'nivel_impacto', 'descricao_impacto',
+    'data_identificacao', 'latitude', 'longitude', 'usuario_cadastro_id',
+    'data_cadastro', 'data_atualizacao', 'ativo',
+]
+
+
+def _proporcao(texto):
+    valores = np.array([float(parte) for parte in texto.split(',')])
+    if len(valores) != 3 or (valores < 0).any() or valores.sum() <= 0:
+        raise CommandError('--proporcao-niveis deve ter três valores não negativos, ex.: 0.6,0.3,0.1')
+    return valores / valores.sum()
+
+
+class Command(BaseCommand):
+    help = 'Gera usuários e propriedades rurais sintéticos em grande volume para testes de carga'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--quantidade', type=int, default=100000, help='Número de propriedades (padrão: 100000)')
+        parser.add_argument('--usuarios', type=int, default=1000, help='Número de usuários (padrão: 1000)')
+        parser.add_argument('--seed', type=int, default=42, help='Semente do gerador aleatório (padrão: 42)')
+        parser.add_argument('--lote', type=int, default=20000, help='Registros gerados e gravados por lote (padrão: 20000)')
+        parser.add_argument(
+            '--proporcao-niveis',
+            type=_proporcao,
+            default=_proporcao('0.6,0.3,0.1'),
+            help='Proporção dos níveis 1, 2 e 3 (padrão: 0.6,0.3,0.1)',
+        )
+        parser.add_argument(
+            '--limpar',
+            action='store_true',
+            help=f'Remove usuários "{PREFIXO_USUARIO}*" e suas propriedades antes de gerar',
+        )
+
+    def handle(self, *args, **options):
+        if options['lote'] < 1 or options['usuarios'] < 1:
+            raise CommandError('--lote e --usuarios devem ser maiores que zero')
+
+        usuarios_carga = User.objects.filter(username__startswith=PREFIXO_USUARIO)
+        if options['limpar']:
+            self._limpar(usuarios_carga)
+        elif usuarios_carga.exists():
+            raise CommandError(f'Já existem usuários "{PREFIXO_USUARIO}*". Use --limpar para gerar novamente.')
+
+        rng = np.random.default_rng(options['seed'])
+        inicio = time.perf_counter()
+
+        ids_usuarios = self._gerar_usuarios(rng, options['usuarios'], options['lote'])
+        self._gerar_propriedades(rng, ids_usuarios, options)
+
+        self.stdout.write('🔄 Reconstruindo estatísticas...')
+        concluir_carga()
+        EstatisticaUsuario.recalcular()
+
+        self.stdout.write('')
+        self.stdout.write(self.style.SUCCESS('=' * 60))
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ {options["usuarios"]} usuários e {options["quantidade"]} propriedades '
+            f'gerados em {time.perf_counter() - inicio:.1f}s'
+        ))
+        self.stdout.write(self.style.SUCCESS('=' * 60))
+
+    def _limpar(self, usuarios_carga):
+        usuarios = list(usuarios_carga.values_list('pk', flat=True))
+        perfis = list(PerfilUsuario.objects.filter(usuario__in=usuarios_carga).values_list('pk', flat=True))
+        ids = list(PropriedadeRural.todos.filter(usuario_cadastro__in=usuarios_carga).values_list('pk', flat=True))
+        # Exclusão direta em SQL, sem sinais nem o Collector (que carregaria cada
+        # perfil e usuário para dispará-los): as estatísticas são recalculadas no final
+        with transaction.atomic():
+            # O que mais depende dos usuários, se houver (sem sinais: exclusão rápida)
+            FotoCapturada.objects.filter(usuario__in=usuarios_carga).delete()
+            LogEntry.objects.filter(user__in=usuarios_carga).delete()
+            User.groups.through.objects.filter(user__in=usuarios_carga).delete()
+            User.user_permissions.through.objects.filter(user__in=usuarios_carga).delete()
+            PropriedadeRuralArquivada.objects.filter(usuario_cadastro__in=usuarios_carga).update(usuario_cadastro=None)
+            removidas = excluir_lote(ids)
+            excluir_lote(perfis, PerfilUsuario)
+            excluir_lote(usuarios, User)
+        invalidar_usuarios(usuarios)
+        self.stdout.write(self.style.WARNING(
+            f'🗑️  {removidas} propriedades e {len(usuarios)} usuários de carga anteriores removidos'
+        ))
+
+    def _gerar_usuarios(self, rng, quantidade, tamanho_lote):
+        self.stdout.write(self.style.SUCCESS(f'👥 Gerando {quantidade} usuários...'))
+        # O hash é calculado uma única vez: todos usam a mesma senha de teste
+        senha = make_password('carga123')
+        tipos = rng.choice(len(TIPOS_PERFIL), size=quantidade, p=PROPORCAO_PERFIS)
+        prenomes = rng.integers(0, len(PRENOMES), size=quantidade)
+        sobrenomes = rng.integers(0, len(SOBRENOMES), size=quantidade)
+
+        ids = []
+        for inicio in range(0, quantidade, tamanho_lote):
+            fim = min(inicio + tamanho_lote, quantidade)
+            with transaction.atomic():
+                usuarios = User.objects.bulk_create([
+                    User(
+                        username=f'{PREFIXO_USUARIO}{indice:07d}',
+                        email=f'{PREFIXO_USUARIO}{indice:07d}@example.com',
+                        first_name=PRENOMES[prenomes[indice]],
+                        last_name=SOBRENOMES[sobrenomes[indice]],
+                        password=senha,
+                    )
+                    for indice in range(inicio, fim)
+                ])
+                # bulk_create não dispara o sinal que cria o perfil
+                PerfilUsuario.objects.bulk_create([
+                    PerfilUsuario(usuario_id=usuario.pk, tipo_perfil=TIPOS_PERFIL[tipos[indice]])
+                    for indice, usuario in zip(range(inicio, fim), usuarios)
+                ])
+            ids.extend(usuario.pk for usuario in usuarios)
+        return np.array(ids)
+
+    def _gerar_propriedades(self, rng, ids_usuarios, options):
+        quantidade = options['quantidade']
+        usar_copy = suporta_copy()
+        self.stdout.write(self.style.SUCCESS(
+            f'🌱 Gerando {quantidade} propriedades ({"COPY" if usar_copy else "bulk_create"})...'
+        ))
+
+        ufs = list(GEOGRAFIA_ESTADOS)
+        geografia = np.array([dados[1:] for dados in GEOGRAFIA_ESTADOS.values()], dtype=float)
+        pesos_estados = geografia[:, 3] / geografia[:, 3].sum()
+        cidades = [dados[0] for dados in GEOGRAFIA_ESTADOS.values()]
+        sem_geografia = set(ESTADOS) - set(GEOGRAFIA_ESTADOS)
+        if sem_geografia:
+            raise CommandError(f'Estados sem dados geográficos: {", ".join(sorted(sem_geografia))}')
+
+        catalogo = Agrotoxico.mapear(AGROTOXICOS)
+        ids_agrotoxicos = [catalogo[Agrotoxico.normalizar(nome)] for nome in AGROTOXICOS]
+
+        hoje = np.datetime64(date.today(), 'D')
+        agora = timezone.now()
+        inicio = time.perf_counter()
+        geradas = 0
+
+        while geradas < quantidade:
+            n = min(options['lote'], quantidade - geradas)
+
+            estados = rng.choice(len(ufs), size=n, p=pesos_estados)
+            latitudes = np.clip(geografia[estados, 0] + rng.normal(0, 1, n) * geografia[estados, 2], -33.75, 5.27)
+            longitudes = np.clip(geografia[estados, 1] + rng.normal(0, 1, n) * geografia[estados, 2], -73.99, -34.79)
+            niveis = rng.choice(3, size=n, p=options['proporcao_niveis']) + 1
+            areas = np.clip(
+                np.exp(rng.normal(AREA_LOG_POR_NIVEL[niveis - 1, 0], AREA_LOG_POR_NIVEL[niveis - 1, 1])),
+                0.01, 99_999_999.99,
+            )
+            datas = (hoje - rng.integers(0, 730, size=n)).astype(str)
+            agrotoxicos = rng.integers(0, len(AGROTOXICOS), size=n)
+            prefixos = rng.integers(0, len(PREFIXOS_PROPRIEDADE), size=n)
+            nomes = rng.integers(0, len(NOMES_PROPRIEDADE), size=n)
+            prenomes = rng.integers(0, len(PRENOMES), size=n)
+            sobrenomes = rng.integers(0, len(SOBRENOMES), size=n)
+            documentos = rng.integers(10**10, 10**11, size=n)
+            rodovias = rng.integers(100, 1000, size=n)
+            usuarios = rng.choice(ids_usuarios, size=n)
+
+            # Converte para listas Python: indexar arrays NumPy elemento a elemento é lento
+            estados, niveis, datas, agrotoxicos = estados.tolist(), niveis.tolist(), datas.tolist(), agrotoxicos.tolist()
+            prefixos, nomes, prenomes, sobrenomes = prefixos.tolist(), nomes.tolist(), prenomes.tolist(), sobrenomes.tolist()
+            documentos, rodovias, usuarios = documentos.tolist(), rodovias.tolist(), usuarios.tolist()
+            areas, latitudes, longitudes = areas.tolist(), latitudes.tolist(), longitudes.tolist()
+
+            linhas = [
+                (
+                    f'{PREFIXOS_PROPRIEDADE[prefixos[i]]} {NOMES_PROPRIEDADE[nomes[i]]}',
+                    f'{PRENOMES[prenomes[i]]} {SOBRENOMES[sobrenomes[i]]}',
+                    f'{documentos[i] // 10**8:03d}.{documentos[i] // 10**5 % 1000:03d}.'
+                    f'{documentos[i] // 100 % 1000:03d}-{documentos[i] % 100:02d}',
+                    f'Rodovia BR-{rodovias[i]}',
+                    cidades[estados[i]],
+                    ufs[estados[i]],
+                    f'{areas[i]:.2f}',
+                    AGROTOXICOS[agrotoxicos[i]],
+                    ids_agrotoxicos[agrotoxicos[i]],
+                    niveis[i],
+                    DESCRICOES[niveis[i]],
+                    datas[i],
+                    f'{latitudes[i]:.6f}',
+                    f'{longitudes[i]:.6f}',
+                    usuarios[i],
+                )
+                for i in range(n)
+            ]
+
+            with transaction.atomic():
+                if usar_copy:
+                    copiar_linhas(
+                        (linha + (agora.isoformat(), agora.isoformat(), 'true') for linha in linhas),
+                        COLUNAS_COPY,
+                    )
+                else:
+                    PropriedadeRural.objects.bulk_create([
+                        PropriedadeRural(**dict(zip(COLUNAS_COPY, linha))) for linha in linhas
+                    ])
+
+            geradas += n
+            taxa = geradas / max(time.perf_counter() - inicio, 1e-6)
+            self.stdout.write(f'  ✓ {geradas}/{quantidade} propriedades ({taxa:,.0f} linhas/s)')
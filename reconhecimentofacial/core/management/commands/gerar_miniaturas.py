@@ -0,0 +1,87 @@
+"""
+Comando Django para gerar as miniaturas (derivadas) das fotos de perfil já
+enviadas: fotos anteriores ao pipeline de miniaturas e perfis cuja caixa do
+rosto foi registrada depois (sem o recorte 'rosto'). As imagens são geradas
+em paralelo, uma vez por arquivo (perfis com a mesma foto compartilham o
+arquivo); as atualizações no banco ficam na thread principal.
+
+Uso: python manage.py gerar_miniaturas
+     python manage.py gerar_miniaturas --workers 8 --todas
+"""
+
+import os
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.imagens import salvar_derivadas
+from core.models import PerfilUsuario
+
+
+def _pendente(perfil):
+    miniaturas = perfil.miniaturas or {}
+    return not miniaturas or (perfil.caixa_rosto and 'rosto.jpeg' not in miniaturas)
+
+
+class Command(BaseCommand):
+    help = 'Gera as miniaturas das fotos de perfil que ainda não as têm'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Fotos processadas em paralelo (padrão: número de CPUs)',
+        )
+        parser.add_argument(
+            '--todas',
+            action='store_true',
+            help='Gera novamente as miniaturas de todas as fotos',
+        )
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1:
+            raise CommandError('--workers deve ser maior que zero')
+
+        perfis = (
+            PerfilUsuario.objects.exclude(foto__isnull=True).exclude(foto='')
+            .only('foto', 'caixa_rosto', 'miniaturas').order_by('pk')
+        )
+        # Uma tarefa por arquivo: os nomes das derivadas dependem só da foto, e
+        # duas tarefas com o mesmo arquivo gravariam as mesmas derivadas. A caixa
+        # do rosto foi calculada da mesma imagem; vale a primeira registrada
+        fotos = defaultdict(lambda: [None, []])
+        for perfil in perfis:
+            if options['todas'] or _pendente(perfil):
+                foto = fotos[perfil.foto.name]
+                foto[0] = foto[0] or perfil.caixa_rosto or None
+                foto[1].append(perfil.pk)
+        if not fotos:
+            self.stdout.write(self.style.SUCCESS('✅ Todas as fotos já têm miniaturas'))
+            return
+
+        self.stdout.write(f'🖼️  Gerando miniaturas de {len(fotos)} foto(s) com {options["workers"]} worker(s)...')
+        inicio = time.perf_counter()
+        geradas = falhas = 0
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            tarefas = {
+                executor.submit(salvar_derivadas, nome, caixa): (nome, pks)
+                for nome, (caixa, pks) in fotos.items()
+            }
+            for tarefa in as_completed(tarefas):
+                nome, pks = tarefas[tarefa]
+                miniaturas = tarefa.result()
+                # update() evita os sinais de save() (a foto não mudou)
+                PerfilUsuario.objects.filter(pk__in=pks).update(miniaturas=miniaturas)
+                if miniaturas:
+                    geradas += 1
+                else:
+                    falhas += 1
+                    self.stdout.write(self.style.WARNING(f'⚠️  {nome}: foto ilegível ou ausente'))
+
+        duracao = time.perf_counter() - inicio
+        self.stdout.write(self.style.SUCCESS(f'✅ {geradas} foto(s) processada(s) em {duracao:.1f}s'))
+        if falhas:
+            self.stdout.write(self.style.WARNING(f'⚠️  {falhas} foto(s) sem miniaturas'))
@@ -0,0 +1,179 @@
+"""
+Comando Django para importar propriedades rurais em massa a partir de
+arquivos CSV, GeoJSON (FeatureCollection) ou GeoJSON por linha (NDJSON).
+
+O arquivo é lido em fluxo (memória constante), cada linha é validada com as
+regras do modelo e a gravação é feita em lotes transacionais com bulk_create
+(ou COPY no PostgreSQL). Linhas inválidas vão para um relatório de erros e o
+progresso é salvo a cada lote, permitindo retomar uma importação interrompida.
+
+Uso: python manage.py importar_propriedades dados.csv
+     python manage.py importar_propriedades dados.geojson --lote 5000 --upsert
+     python manage.py importar_propriedades dados.csv --retomar --erros erros.csv
+"""
+
+import csv
+import json
+import time
+from pathlib import Path
+
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from core.carga import (
+    LEITORES, concluir_carga, detectar_formato, inserir_lote, suporta_copy,
+    upsert_lote, validar_propriedade,
+)
+
+
+def descartar_erros_apos(caminho_erros, ultima_linha):
+    """Reescreve o relatório de erros só com as linhas até ultima_linha"""
+    if not caminho_erros.exists():
+        return
+    with open(caminho_erros, newline='', encoding='utf-8') as arquivo_erros:
+        linhas = list(csv.reader(arquivo_erros))
+    mantidas = linhas[:1] + [linha for linha in linhas[1:] if linha and int(linha[0]) <= ultima_linha]
+    with open(caminho_erros, 'w', newline='', encoding='utf-8') as arquivo_erros:
+        csv.writer(arquivo_erros).writerows(mantidas)
+
+
+class Command(BaseCommand):
+    help = 'Importa propriedades rurais de CSV/GeoJSON em lotes, com validação, upsert e retomada'
+
+    def add_arguments(self, parser):
+        parser.add_argument('arquivo', help='Arquivo CSV, GeoJSON ou NDJSON')
+        parser.add_argument(
+            '--formato',
+            choices=sorted(LEITORES),
+            help='Formato do arquivo (padrão: detectado pela extensão)',
+        )
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=2000,
+            help='Quantidade de linhas gravadas por transação (padrão: 2000)',
+        )
+        parser.add_argument(
+            '--upsert',
+            action='store_true',
+            help='Atualiza propriedades existentes com o mesmo CPF/CNPJ em vez de duplicá-las',
+        )
+        parser.add_argument(
+            '--usuario',
+            help='Username registrado como responsável pelo cadastro',
+        )
+        parser.add_argument(
+            '--erros',
+            help='Arquivo CSV para o relatório de linhas rejeitadas (padrão: <arquivo>.erros.csv)',
+        )
+        parser.add_argument(
+            '--retomar',
+            action='store_true',
+            help='Continua a partir da última linha confirmada na execução anterior',
+        )
+        parser.add_argument(
+            '--sem-copy',
+            action='store_true',
+            help='Não usa COPY mesmo no PostgreSQL',
+        )
+
+    def handle(self, *args, **options):
+        caminho = Path(options['arquivo'])
+        if not caminho.exists():
+            raise CommandError(f'Arquivo não encontrado: {caminho}')
+        if options['lote'] < 1:
+            raise CommandError('--lote deve ser maior que zero')
+
+        usuario = None
+        if options['usuario']:
+            usuario = User.objects.filter(username=options['usuario']).first()
+            if not usuario:
+                raise CommandError(f'Usuário não encontrado: {options["usuario"]}')
+
+        formato = options['formato'] or detectar_formato(caminho)
+        leitor = LEITORES[formato]
+        usar_copy = suporta_copy() and not options['upsert'] and not options['sem_copy']
+
+        caminho_progresso = caminho.with_name(caminho.name + '.progresso')
+        caminho_erros = Path(options['erros']) if options['erros'] else caminho.with_name(caminho.name + '.erros.csv')
+
+        ultima_linha = 0
+        if options['retomar'] and caminho_progresso.exists():
+            ultima_linha = json.loads(caminho_progresso.read_text())['linha']
+            self.stdout.write(self.style.WARNING(f'⏩ Retomando após a linha {ultima_linha}'))
+
+        modo = 'upsert' if options['upsert'] else ('COPY' if usar_copy else 'bulk_create')
+        self.stdout.write(self.style.SUCCESS(f'📥 Importando {caminho} ({formato}, lotes de {options["lote"]}, {modo})...'))
+
+        totais = {'inseridas': 0, 'atualizadas': 0, 'rejeitadas': 0}
+        inicio = time.perf_counter()
+        lote = []
+
+        def gravar(linha_final):
+            with transaction.atomic():
+                if options['upsert']:
+                    inseridas, atualizadas = upsert_lote(lote)
+                else:
+                    inseridas, atualizadas = inserir_lote(lote, usar_copy=usar_copy), 0
+            totais['inseridas'] += inseridas
+            totais['atualizadas'] += atualizadas
+            lote.clear()
+
+            # Só registra o progresso depois do commit do lote
+            caminho_progresso.write_text(json.dumps({'linha': linha_final}))
+            processadas = totais['inseridas'] + totais['atualizadas']
+            taxa = processadas / max(time.perf_counter() - inicio, 1e-6)
+            self.stdout.write(f'  ✓ linha {linha_final}: {processadas} gravadas ({taxa:,.0f} linhas/s)')
+
+        if ultima_linha:
+            # As linhas após o ponto de retomada serão lidas (e rejeitadas) de novo
+            descartar_erros_apos(caminho_erros, ultima_linha)
+        modo_erros = 'a' if options['retomar'] else 'w'
+        with open(caminho, newline='', encoding='utf-8') as arquivo, \
+                open(caminho_erros, modo_erros, newline='', encoding='utf-8') as arquivo_erros:
+            relatorio = csv.writer(arquivo_erros)
+            if modo_erros == 'w' or arquivo_erros.tell() == 0:
+                relatorio.writerow(['linha', 'erro', 'dados'])
+
+            numero = ultima_linha
+            try:
+                for numero, dados in leitor(arquivo):
+                    if numero <= ultima_linha:
+                        continue
+                    try:
+                        lote.append(validar_propriedade(dados, usuario))
+                    except ValidationError as e:
+                        totais['rejeitadas'] += 1
+                        erro = '; '.join(f'{campo}: {" ".join(msgs)}' for campo, msgs in e.message_dict.items())
+                        relatorio.writerow([numero, erro, json.dumps(dados, ensure_ascii=False, default=str)])
+                        continue
+
+                    if len(lote) >= options['lote']:
+                        gravar(numero)
+            except (ValueError, csv.Error) as e:
+                if lote:
+                    gravar(numero)
+                raise CommandError(f'Erro de leitura após a linha {numero}: {e}')
+
+            if lote:
+                gravar(numero)
+
+        # bulk_create/COPY não disparam sinais: reconstrói estatísticas e cache
+        concluir_carga()
+        caminho_progresso.unlink(missing_ok=True)
+
+        duracao = time.perf_counter() - inicio
+        processadas = totais['inseridas'] + totais['atualizadas']
+        self.stdout.write('')
+        self.stdout.write(self.style.SUCCESS('=' * 60))
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ {totais["inseridas"]} inseridas, {totais["atualizadas"]} atualizadas '
+            f'em {duracao:.1f}s ({processadas / max(duracao, 1e-6):,.0f} linhas/s)'
+        ))
+        self.stdout.write(self.style.SUCCESS('=' * 60))
+        if totais['rejeitadas']:
+            self.stdout.write(self.style.WARNING(
+                f'⚠️  {totais["rejeitadas"]} linhas rejeitadas - veja {caminho_erros}'
+            ))
@@ -0,0 +1,104 @@
+"""
+Comando Django para coletar as fotos de perfil órfãs: arquivos (e miniaturas)
+em fotos_usuarios/ que nenhum perfil referencia, como as fotos trocadas
+antes do armazenamento por conteúdo ou as que ficaram na carência de
+liberar_foto. Pode ser agendado (cron).
+
+Com --migrar, antes da coleta as fotos gravadas com o nome antigo
+(<username>_foto.jpg) passam para o nome pelo conteúdo, unificando as
+duplicadas.
+
+Uso: python manage.py limpar_fotos
+     python manage.py limpar_fotos --simular
+     python manage.py limpar_fotos --migrar --idade 120
+"""
+
+import os
+import posixpath
+import re
+import time
+
+from django.core.files import File
+from django.core.management.base import BaseCommand, CommandError
+
+from core.armazenamento import armazenamento_fotos
+from core.imagens import CHAVES, nome_derivada
+from core.models import PerfilUsuario
+
+NOME_POR_CONTEUDO = re.compile(r'(?:[0-9a-f]{2}/){2}[0-9a-f]{64}\.\w+$')
+
+
+class Command(BaseCommand):
+    help = 'Remove as fotos de perfil que nenhum perfil usa (e migra as de nome antigo)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--idade',
+            type=int,
+            default=60,
+            help='Só remove arquivos sem alteração há mais de N minutos (padrão: 60)',
+        )
+        parser.add_argument(
+            '--simular',
+            action='store_true',
+            help='Apenas informa o que seria migrado e removido',
+        )
+        parser.add_argument(
+            '--migrar',
+            action='store_true',
+            help='Renomeia as fotos de nome antigo para o nome pelo conteúdo',
+        )
+
+    def handle(self, *args, **options):
+        if options['idade'] < 0:
+            raise CommandError('--idade não pode ser negativa')
+
+        if options['migrar']:
+            self.migrar(options['simular'])
+        self.coletar(options['idade'] * 60, options['simular'])
+
+    def migrar(self, simular):
+        antigas = [
+            perfil for perfil in PerfilUsuario.objects.exclude(foto__isnull=True).exclude(foto='').only('foto')
+            if not NOME_POR_CONTEUDO.search(perfil.foto.name)
+        ]
+        migradas = 0
+        for perfil in antigas:
+            nome = perfil.foto.name
+            if not armazenamento_fotos.exists(nome):
+                self.stdout.write(self.style.WARNING(f'⚠️  {nome}: arquivo ausente'))
+                continue
+            if simular:
+                migradas += 1
+                continue
+            with armazenamento_fotos.open(nome) as arquivo:
+                # Os sinais do perfil geram as miniaturas e liberam o nome antigo
+                perfil.foto.save(posixpath.basename(nome), File(arquivo), save=True)
+            migradas += 1
+
+        verbo = 'seriam migrada(s)' if simular else 'migrada(s)'
+        self.stdout.write(self.style.SUCCESS(f'📦 {migradas} foto(s) {verbo} para o nome pelo conteúdo'))
+
+    def coletar(self, idade, simular):
+        pasta = PerfilUsuario._meta.get_field('foto').upload_to.rstrip('/')
+        em_uso = set(
+            PerfilUsuario.objects.exclude(foto__isnull=True).exclude(foto='').values_list('foto', flat=True)
+        )
+        esperados = em_uso | {nome_derivada(nome, chave) for nome in em_uso for chave in CHAVES}
+
+        limite = time.time() - idade
+        removidos = bytes_liberados = 0
+        for nome in armazenamento_fotos.percorrer(pasta):
+            caminho = armazenamento_fotos.path(nome)
+            if nome in esperados or os.path.getmtime(caminho) > limite:
+                continue
+            removidos += 1
+            bytes_liberados += os.path.getsize(caminho)
+            if not simular:
+                armazenamento_fotos.delete(nome)
+
+        verbo = 'seriam removido(s)' if simular else 'removido(s)'
+        self.stdout.write(self.style.SUCCESS(
+            f'🧹 {removidos} arquivo(s) órfão(s) {verbo} ({bytes_liberados / 1024 / 1024:.1f} MB); '
+            f'{len(em_uso)} foto(s) em uso'
+        ))
@@ -13,6 +13,24 @@ import random
 from datetime import datetime, timedelta
 
 
+# Lista de estados brasileiros
+ESTADOS = ['SP', 'MG', 'RJ', 'BA', 'RS', 'PR', 'SC', 'GO', 'MS', 'MT', 'PA', 'AM', 'TO']
+
+# Lista de cidades brasileiras
+CIDADES = [
+    'São Paulo', 'Rio de Janeiro', 'Belo Horizonte', 'Salvador', 'Porto Alegre',
+    'Curitiba', 'Florianópolis', 'Goiânia', 'Campo Grande', 'Cuiabá',
+    'Belém', 'Manaus', 'Palmas', 'Brasília', 'Vitória'
+]
+
+# Lista de agrotóxicos proibidos (exemplos)
+AGROTOXICOS = [
+    'Paraquat', 'Carbofurano', 'Endossulfan', 'Metamidofós', 'Aldicarbe',
+    'Forato', 'Parationa Metílica', 'Monocrotofós', 'Triclorfom', 'DDT',
+    'Aldrin', 'Dieldrin', 'Heptacloro', 'Mirex', 'Clordano'
+]
+
+
 class Command(BaseCommand):
     help = 'Popula o banco de dados com 30 propriedades rurais com diferentes níveis de impacto'
 
@@ -26,8 +44,8 @@ class Command(BaseCommand):
     def handle(self, *args, **options):
         # Se a flag --limpar for passada, remove todas as propriedades
         if options['limpar']:
-            count = PropriedadeRural.objects.all().count()
-            PropriedadeRural.objects.all().delete()
+            count = PropriedadeRural.todos.count()
+            PropriedadeRural.todos.all().delete()
             self.stdout.write(
                 self.style.WARNING(f'🗑️  {count} propriedades removidas do banco de dados')
             )
@@ -40,23 +58,6 @@ class Command(BaseCommand):
             )
             return
 
-        # Lista de estados brasileiros
-        estados = ['SP', 'MG', 'RJ', 'BA', 'RS', 'PR', 'SC', 'GO', 'MS', 'MT', 'PA', 'AM', 'TO']
-        
-        # Lista de cidades brasileiras
-        cidades = [
-            'São Paulo', 'Rio de Janeiro', 'Belo Horizonte', 'Salvador', 'Porto Alegre',
-            'Curitiba', 'Florianópolis', 'Goiânia', 'Campo Grande', 'Cuiabá',
-            'Belém', 'Manaus', 'Palmas', 'Brasília', 'Vitória'
-        ]
-        
-        # Lista de agrotóxicos proibidos (exemplos)
-        agrotoxicos = [
-            'Paraquat', 'Carbofurano', 'Endossulfan', 'Metamidofós', 'Aldicarbe',
-            'Forato', 'Parationa Metílica', 'Monocrotofós', 'Triclorfom', 'DDT',
-            'Aldrin', 'Dieldrin', 'Heptacloro', 'Mirex', 'Clordano'
-        ]
-        
         # Nomes de propriedades
         nomes_fazendas = [
             'Fazenda Santa Maria', 'Sítio Boa Vista', 'Fazenda São José',
@@ -152,10 +153,10 @@ class Command(BaseCommand):
                     proprietario=nomes[idx],
                     cpf_cnpj=cpf_cnpj,
                     endereco=f"Rodovia {random.choice(['BR', 'SP', 'MG'])}-{random.randint(100, 999)}, Km {random.randint(1, 200)}",
-                    cidade=random.choice(cidades),
-                    estado=random.choice(estados),
+                    cidade=random.choice(CIDADES),
+                    estado=random.choice(ESTADOS),
                     area_hectares=area,
-                    agrotoxico_utilizado=random.choice(agrotoxicos),
+                    agrotoxico_utilizado=random.choice(AGROTOXICOS),
                     nivel_impacto=nivel,
                     descricao_impacto=descricao,
                     data_identificacao=data_identificacao,
@@ -0,0 +1,44 @@
+"""
+Comando Django para reconstruir os agregados analíticos de propriedades
+(AgregadoPropriedade), em paralelo com uma partição por estado.
+
+Uso: python manage.py recalcular_agregados
+     python manage.py recalcular_agregados --workers 8
+     python manage.py recalcular_agregados --estado SP --estado MG
+"""
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.analytics import recalcular_agregados
+
+
+class Command(BaseCommand):
+    help = 'Reconstrói os agregados analíticos de propriedades, em paralelo por estado'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            help='Partições reconstruídas ao mesmo tempo (padrão: 1 no SQLite, até 4 nos demais bancos)',
+        )
+        parser.add_argument(
+            '--estado',
+            action='append',
+            help='Reconstrói apenas este estado (pode ser repetido)',
+        )
+
+    def handle(self, *args, **options):
+        if options['workers'] is not None and options['workers'] < 1:
+            raise CommandError('--workers deve ser maior que zero')
+
+        estados = [estado.upper() for estado in options['estado']] if options['estado'] else None
+        inicio = time.perf_counter()
+        resultado = recalcular_agregados(workers=options['workers'], estados=estados)
+
+        for estado, linhas in sorted(resultado.items()):
+            self.stdout.write(f'  ✓ {estado}: {linhas} baldes')
+        self.stdout.write(self.style.SUCCESS(
+            f'🔄 {len(resultado)} estados reconstruídos em {time.perf_counter() - inicio:.1f}s'
+        ))
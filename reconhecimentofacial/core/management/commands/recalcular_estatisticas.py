@@ -0,0 +1,49 @@
+"""
+Comando Django para reconstruir as estatísticas consolidadas do dashboard
+(EstatisticaPropriedade e EstatisticaUsuario) a partir das tabelas de origem.
+
+Uso: python manage.py recalcular_estatisticas
+     python manage.py recalcular_estatisticas --verificar
+"""
+
+from django.core.management.base import BaseCommand
+from core.models import EstatisticaPropriedade, EstatisticaUsuario
+
+
+class Command(BaseCommand):
+    help = 'Reconstrói as estatísticas do dashboard e informa divergências em relação às tabelas de origem'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verificar',
+            action='store_true',
+            help='Apenas compara as estatísticas armazenadas com as reais, sem alterar nada',
+        )
+
+    def handle(self, *args, **options):
+        divergencias = 0
+        for modelo in (EstatisticaPropriedade, EstatisticaUsuario):
+            nome = modelo._meta.verbose_name_plural
+            armazenadas = modelo.armazenadas()
+            reais = modelo.calcular()
+
+            diferencas = {
+                chave: (armazenadas.get(chave, 0), reais.get(chave, 0))
+                for chave in set(armazenadas) | set(reais)
+                if armazenadas.get(chave, 0) != reais.get(chave, 0)
+            }
+            divergencias += len(diferencas)
+
+            if diferencas:
+                self.stdout.write(self.style.WARNING(f'⚠️  {nome}: {len(diferencas)} divergência(s)'))
+                for chave, (armazenado, real) in sorted(diferencas.items(), key=lambda item: str(item[0])):
+                    self.stdout.write(f'  {chave}: armazenado={armazenado} real={real}')
+            else:
+                self.stdout.write(self.style.SUCCESS(f'✓ {nome}: sem divergências'))
+
+            if not options['verificar']:
+                modelo.recalcular()
+                self.stdout.write(self.style.SUCCESS(f'🔄 {nome} reconstruídas ({len(reais)} linhas)'))
+
+        if options['verificar'] and divergencias:
+            self.stdout.write(self.style.WARNING('💡 Execute sem --verificar para reconstruir as estatísticas'))
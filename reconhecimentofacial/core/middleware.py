@@ -0,0 +1,57 @@
+"""
+Middlewares do app core.
+"""
+
+from django.conf import settings
+from django.utils.functional import SimpleLazyObject
+
+from . import replicas
+from .permissoes import permissoes_da_requisicao
+
+
+class PermissoesMiddleware:
+    """
+    Disponibiliza request.permissoes (ContextoPermissoes), resolvido na
+    primeira leitura e reaproveitado pelo resto da requisição. Deve vir
+    depois de SessionMiddleware e AuthenticationMiddleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.permissoes = SimpleLazyObject(lambda: permissoes_da_requisicao(request))
+        return self.get_response(request)
+
+
+class ReplicaMiddleware:
+    """
+    Envia as leituras das views marcadas com @leitura_em_replica para uma
+    réplica (ver core/replicas.py) e, após uma gravação, marca o navegador
+    para ler do principal por REPLICA_ATRASO_MAXIMO segundos.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = replicas.iniciar_requisicao()
+        try:
+            response = self.get_response(request)
+        finally:
+            replicas.encerrar_requisicao(token)
+
+        if request.method not in replicas.METODOS_LEITURA and settings.REPLICAS_LEITURA:
+            response.set_cookie(
+                replicas.COOKIE_PRIMARIO, '1',
+                max_age=settings.REPLICA_ATRASO_MAXIMO, httponly=True, samesite='Lax',
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if (
+            request.method in replicas.METODOS_LEITURA
+            and getattr(view_func, 'leitura_em_replica', False)
+            and not replicas.ler_do_principal(request)
+        ):
+            replicas.usar_replica()
@@ -0,0 +1,64 @@
+# Generated by Django 5.2.7 on 2026-10-19 16:05
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def popular_estatisticas(apps, schema_editor):
+    PropriedadeRural = apps.get_model('core', 'PropriedadeRural')
+    PerfilUsuario = apps.get_model('core', 'PerfilUsuario')
+    EstatisticaPropriedade = apps.get_model('core', 'EstatisticaPropriedade')
+    EstatisticaUsuario = apps.get_model('core', 'EstatisticaUsuario')
+
+    linhas = PropriedadeRural.objects.values('nivel_impacto', 'ativo', 'estado').annotate(total=Count('id')).order_by()
+    EstatisticaPropriedade.objects.bulk_create([EstatisticaPropriedade(**linha) for linha in linhas])
+
+    linhas = PerfilUsuario.objects.values('tipo_perfil').annotate(total=Count('id')).order_by()
+    EstatisticaUsuario.objects.bulk_create([EstatisticaUsuario(**linha) for linha in linhas])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_perfilusuario_tipo_perfil'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EstatisticaPropriedade',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nivel_impacto', models.IntegerField(choices=[(1, 'Nível 1 - Baixo Impacto'), (2, 'Nível 2 - Médio Impacto'), (3, 'Nível 3 - Alto Impacto')], verbose_name='Nível de Impacto Ambiental')),
+                ('ativo', models.BooleanField(verbose_name='Registro Ativo')),
+                ('estado', models.CharField(max_length=2, verbose_name='Estado (UF)')),
+                ('total', models.IntegerField(default=0, verbose_name='Total')),
+            ],
+            options={
+                'verbose_name': 'Estatística de Propriedades',
+                'verbose_name_plural': 'Estatísticas de Propriedades',
+            },
+        ),
+        migrations.CreateModel(
+            name='EstatisticaUsuario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo_perfil', models.CharField(choices=[('COMUM', 'Usuário Comum'), ('DIRETOR', 'Diretor de Divisões'), ('MINISTRO', 'Ministro do Meio Ambiente')], max_length=10, unique=True, verbose_name='Tipo de Perfil')),
+                ('total', models.IntegerField(default=0, verbose_name='Total')),
+            ],
+            options={
+                'verbose_name': 'Estatística de Usuários',
+                'verbose_name_plural': 'Estatísticas de Usuários',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='propriedaderural',
+            index=models.Index(fields=['ativo', 'nivel_impacto', '-data_cadastro'], name='propriedade_dashboard_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='estatisticapropriedade',
+            constraint=models.UniqueConstraint(fields=('nivel_impacto', 'ativo', 'estado'), name='estatistica_propriedade_unica'),
+        ),
+        migrations.RunPython(popular_estatisticas, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 16:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_estatisticas_dashboard'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='propriedaderural',
+            name='cpf_cnpj',
+            field=models.CharField(db_index=True, max_length=18, verbose_name='CPF/CNPJ'),
+        ),
+    ]
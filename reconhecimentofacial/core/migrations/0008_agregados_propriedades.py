@@ -0,0 +1,62 @@
+# Generated by Django 5.2.7 on 2026-10-19 16:24
+
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def popular_agregados(apps, schema_editor):
+    PropriedadeRural = apps.get_model('core', 'PropriedadeRural')
+    AgregadoPropriedade = apps.get_model('core', 'AgregadoPropriedade')
+
+    linhas = PropriedadeRural.objects.filter(ativo=True).values(
+        'estado', 'agrotoxico_utilizado', 'nivel_impacto', 'data_identificacao'
+    ).annotate(total=Count('id'), area=Sum('area_hectares')).order_by()
+
+    baldes = defaultdict(lambda: [0, Decimal(0)])
+    for l in linhas:
+        data = l['data_identificacao']
+        for periodo, inicio in (('D', data), ('M', data.replace(day=1))):
+            balde = baldes[(periodo, inicio, l['estado'], l['agrotoxico_utilizado'], l['nivel_impacto'])]
+            balde[0] += l['total']
+            balde[1] += l['area'] or 0
+
+    AgregadoPropriedade.objects.bulk_create([
+        AgregadoPropriedade(
+            periodo=periodo, data=data, estado=estado, agrotoxico_utilizado=agrotoxico,
+            nivel_impacto=nivel, total=total, area_total=area,
+        )
+        for (periodo, data, estado, agrotoxico, nivel), (total, area) in baldes.items()
+    ], batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_propriedaderural_cpf_cnpj_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AgregadoPropriedade',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('periodo', models.CharField(choices=[('D', 'Dia'), ('M', 'Mês')], max_length=1, verbose_name='Período')),
+                ('data', models.DateField(verbose_name='Início do Período')),
+                ('estado', models.CharField(max_length=2, verbose_name='Estado (UF)')),
+                ('agrotoxico_utilizado', models.CharField(max_length=200, verbose_name='Agrotóxico Proibido Utilizado')),
+                ('nivel_impacto', models.IntegerField(choices=[(1, 'Nível 1 - Baixo Impacto'), (2, 'Nível 2 - Médio Impacto'), (3, 'Nível 3 - Alto Impacto')], verbose_name='Nível de Impacto Ambiental')),
+                ('total', models.IntegerField(default=0, verbose_name='Total')),
+                ('area_total', models.DecimalField(decimal_places=2, default=0, max_digits=16, verbose_name='Área Total (ha)')),
+            ],
+            options={
+                'verbose_name': 'Agregado de Propriedades',
+                'verbose_name_plural': 'Agregados de Propriedades',
+                'indexes': [models.Index(fields=['periodo', 'nivel_impacto', 'data'], name='agregado_periodo_nivel_idx')],
+                'constraints': [models.UniqueConstraint(fields=('periodo', 'data', 'estado', 'agrotoxico_utilizado', 'nivel_impacto'), name='agregado_propriedade_unico')],
+            },
+        ),
+        migrations.RunPython(popular_agregados, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 5.2.7 on 2026-10-19 16:26
+
+import unicodedata
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+# Substâncias usadas por popular_propriedades na criação desta migração
+AGROTOXICOS = [
+    'Paraquat', 'Carbofurano', 'Endossulfan', 'Metamidofós', 'Aldicarbe',
+    'Forato', 'Parationa Metílica', 'Monocrotofós', 'Triclorfom', 'DDT',
+    'Aldrin', 'Dieldrin', 'Heptacloro', 'Mirex', 'Clordano',
+]
+
+
+def normalizar(nome):
+    sem_acentos = unicodedata.normalize('NFKD', nome).encode('ascii', 'ignore').decode('ascii')
+    return ' '.join(sem_acentos.casefold().split())
+
+
+def popular_catalogo(apps, schema_editor):
+    Agrotoxico = apps.get_model('core', 'Agrotoxico')
+    PropriedadeRural = apps.get_model('core', 'PropriedadeRural')
+
+    # normalizado -> (nome exibido, grafias encontradas nas propriedades)
+    catalogo = {normalizar(nome): (nome, set()) for nome in AGROTOXICOS}
+    existentes = PropriedadeRural.objects.values_list('agrotoxico_utilizado', flat=True).distinct()
+    for nome in existentes:
+        if nome and nome.strip():
+            catalogo.setdefault(normalizar(nome), (nome.strip(), set()))[1].add(nome)
+
+    for chave, (nome, grafias) in catalogo.items():
+        agrotoxico = Agrotoxico.objects.create(nome=nome, nome_normalizado=chave)
+        if grafias:
+            PropriedadeRural.objects.filter(agrotoxico_utilizado__in=grafias).update(agrotoxico=agrotoxico)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_agregados_propriedades'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Agrotoxico',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nome', models.CharField(max_length=200, verbose_name='Nome')),
+                ('nome_normalizado', models.CharField(editable=False, max_length=200, unique=True, verbose_name='Nome Normalizado')),
+            ],
+            options={
+                'verbose_name': 'Agrotóxico',
+                'verbose_name_plural': 'Agrotóxicos',
+                'ordering': ['nome'],
+            },
+        ),
+        migrations.AddField(
+            model_name='propriedaderural',
+            name='agrotoxico',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='propriedades', to='core.agrotoxico', verbose_name='Agrotóxico (Catálogo)'),
+        ),
+        migrations.AddIndex(
+            model_name='propriedaderural',
+            index=models.Index(fields=['ativo', 'nivel_impacto', 'agrotoxico', 'estado'], name='propriedade_facetas_idx'),
+        ),
+        migrations.RunPython(popular_catalogo, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 5.2.7 on 2026-10-19 16:29
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_catalogo_agrotoxicos'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PropriedadeRuralArquivada',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False, verbose_name='ID Original')),
+                ('nome_propriedade', models.CharField(max_length=200, verbose_name='Nome da Propriedade')),
+                ('proprietario', models.CharField(max_length=200, verbose_name='Nome do Proprietário')),
+                ('cpf_cnpj', models.CharField(max_length=18, verbose_name='CPF/CNPJ')),
+                ('endereco', models.TextField(verbose_name='Endereço Completo')),
+                ('cidade', models.CharField(max_length=100, verbose_name='Cidade')),
+                ('estado', models.CharField(max_length=2, verbose_name='Estado (UF)')),
+                ('area_hectares', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Área em Hectares')),
+                ('agrotoxico_utilizado', models.CharField(max_length=200, verbose_name='Agrotóxico Proibido Utilizado')),
+                ('nivel_impacto', models.IntegerField(choices=[(1, 'Nível 1 - Baixo Impacto'), (2, 'Nível 2 - Médio Impacto'), (3, 'Nível 3 - Alto Impacto')], verbose_name='Nível de Impacto Ambiental')),
+                ('descricao_impacto', models.TextField(verbose_name='Descrição do Impacto')),
+                ('data_identificacao', models.DateField(verbose_name='Data de Identificação')),
+                ('latitude', models.DecimalField(blank=True, decimal_places=6, max_digits=9, null=True, verbose_name='Latitude')),
+                ('longitude', models.DecimalField(blank=True, decimal_places=6, max_digits=9, null=True, verbose_name='Longitude')),
+                ('data_cadastro', models.DateTimeField(verbose_name='Data de Cadastro')),
+                ('data_atualizacao', models.DateTimeField(verbose_name='Última Atualização')),
+                ('ativo', models.BooleanField(default=False, verbose_name='Registro Ativo')),
+                ('data_arquivamento', models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='Data de Arquivamento')),
+            ],
+            options={
+                'verbose_name': 'Propriedade Rural Arquivada',
+                'verbose_name_plural': 'Propriedades Rurais Arquivadas',
+                'ordering': ['-data_arquivamento'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='propriedaderural',
+            index=models.Index(condition=models.Q(('ativo', False)), fields=['data_atualizacao'], name='propriedade_inativa_idx'),
+        ),
+        migrations.AddField(
+            model_name='propriedaderuralarquivada',
+            name='agrotoxico',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='core.agrotoxico', verbose_name='Agrotóxico (Catálogo)'),
+        ),
+        migrations.AddField(
+            model_name='propriedaderuralarquivada',
+            name='usuario_cadastro',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Cadastrado por'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-19 16:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_arquivo_propriedades'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='perfilusuario',
+            name='caixa_rosto',
+            field=models.JSONField(blank=True, help_text='Posição do rosto na foto (topo, direita, base, esquerda), em pixels', null=True, verbose_name='Caixa do Rosto'),
+        ),
+        migrations.AddField(
+            model_name='perfilusuario',
+            name='miniaturas',
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name='Miniaturas'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-19 17:01
+
+import core.armazenamento
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_perfil_miniaturas'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='perfilusuario',
+            name='foto',
+            field=models.ImageField(blank=True, null=True, storage=core.armazenamento.ArmazenamentoPorConteudo(), upload_to='fotos_usuarios/', verbose_name='Foto do Usuário'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 17:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_foto_por_conteudo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='perfilusuario',
+            name='codificacao_facial',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+    ]
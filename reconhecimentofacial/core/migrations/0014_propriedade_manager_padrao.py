@@ -0,0 +1,24 @@
+# Generated by Django 5.2.7 on 2026-10-19 18:40
+
+import django.db.models.manager
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_codificacao_facial'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='propriedaderural',
+            options={'default_manager_name': 'todos', 'ordering': ['-data_cadastro'], 'verbose_name': 'Propriedade Rural', 'verbose_name_plural': 'Propriedades Rurais'},
+        ),
+        migrations.AlterModelManagers(
+            name='propriedaderural',
+            managers=[
+                ('todos', django.db.models.manager.Manager()),
+            ],
+        ),
+    ]
@@ -1,10 +1,24 @@
-from django.db import models
+import unicodedata
+from collections import defaultdict
+from decimal import Decimal
+from functools import partial
+
+from django.db import connections, models, transaction
+from django.db.models import Count, F, Sum
 from django.utils import timezone
 from django.contrib.auth.models import User
+from django.core.files.storage import default_storage
 from django.core.validators import MinValueValidator
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_init, post_save, pre_save
 from django.dispatch import receiver
 
+from .armazenamento import armazenamento_fotos
+from .autenticacao import invalidar_usuario
+from .cache import invalidar_propriedades
+from .galeria import invalidar_galeria, para_bytes
+from .imagens import remover_derivadas, salvar_derivadas
+from .permissoes import invalidar_permissoes
+
 
 class PerfilUsuario(models.Model):
     """Perfil estendido do usuário com foto e tipo de perfil"""
@@ -22,7 +36,22 @@ class PerfilUsuario(models.Model):
         default='COMUM',
         verbose_name="Tipo de Perfil"
     )
-    foto = models.ImageField(upload_to='fotos_usuarios/', verbose_name="Foto do Usuário", null=True, blank=True)
+    foto = models.ImageField(
+        upload_to='fotos_usuarios/',
+        storage=armazenamento_fotos,
+        verbose_name="Foto do Usuário",
+        null=True,
+        blank=True,
+    )
+    caixa_rosto = models.JSONField(
+        null=True,
+        blank=True,
+        verbose_name="Caixa do Rosto",
+        help_text="Posição do rosto na foto (topo, direita, base, esquerda), em pixels",
+    )
+    miniaturas = models.JSONField(default=dict, blank=True, editable=False, verbose_name="Miniaturas")
+    # Codificação do rosto (128 float64, ver core/galeria.py); vazia se a foto não tem rosto
+    codificacao_facial = models.BinaryField(null=True, blank=True, editable=False)
     telefone = models.CharField(max_length=20, verbose_name="Telefone", blank=True)
     cpf = models.CharField(max_length=14, verbose_name="CPF", blank=True, unique=True, null=True)
     data_nascimento = models.DateField(verbose_name="Data de Nascimento", null=True, blank=True)
@@ -43,6 +72,31 @@ class PerfilUsuario(models.Model):
         }
         return icons.get(self.tipo_perfil, '👤')
     
+    def trocar_foto(self, arquivo, caixa_rosto=None, codificacao=None):
+        """
+        Troca a foto junto com a caixa do rosto e a codificação já calculadas.
+        Trocas diretas de foto (admin) descartam as duas, que são recalculadas
+        na próxima carga da galeria.
+        """
+        self.foto = arquivo
+        self.caixa_rosto = caixa_rosto
+        self.codificacao_facial = None if codificacao is None else para_bytes(codificacao)
+        self._foto_analisada = True
+    
+    def url_miniatura(self, chave):
+        """URL da derivada da foto ('m.webp', 'p.jpeg'...), ou None se ainda não existir"""
+        nome = (self.miniaturas or {}).get(chave)
+        return default_storage.url(nome) if nome else None
+    
+    def save(self, *args, **kwargs):
+        # Mantém o perfil e a estatística do dashboard na mesma transação
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+    
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            return super().delete(*args, **kwargs)
+    
     class Meta:
         verbose_name = "Perfil de Usuário"
         verbose_name_plural = "Perfis de Usuários"
@@ -63,6 +117,13 @@ def salvar_perfil_usuario(sender, instance, **kwargs):
         instance.perfil.save()
 
 
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidar_cache_usuario(sender, instance, **kwargs):
+    """Descarta o usuário em cache (core.autenticacao) após o commit"""
+    transaction.on_commit(partial(invalidar_usuario, instance.pk))
+
+
 class FotoCapturada(models.Model):
     usuario = models.ForeignKey(User, on_delete=models.CASCADE, help_text="Usuário associado à foto")
     nome = models.CharField(max_length=100, help_text="Nome da pessoa")
@@ -78,6 +139,68 @@ class FotoCapturada(models.Model):
         ordering = ['-data_captura']
 
 
+class Agrotoxico(models.Model):
+    """
+    Catálogo de agrotóxicos. Grafias que diferem só em acentos, maiúsculas ou
+    espaços apontam para a mesma substância (mesmo nome_normalizado).
+    """
+
+    nome = models.CharField(max_length=200, verbose_name="Nome")
+    nome_normalizado = models.CharField(max_length=200, unique=True, editable=False, verbose_name="Nome Normalizado")
+
+    def __str__(self):
+        return self.nome
+
+    @staticmethod
+    def normalizar(nome):
+        sem_acentos = unicodedata.normalize('NFKD', nome).encode('ascii', 'ignore').decode('ascii')
+        return ' '.join(sem_acentos.casefold().split())
+
+    def save(self, *args, **kwargs):
+        self.nome_normalizado = self.normalizar(self.nome)
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def mapear(cls, nomes):
+        """
+        Retorna {nome normalizado: id} para os nomes informados, cadastrando
+        no catálogo as substâncias que ainda não existem.
+        """
+        novos = {}
+        for nome in nomes:
+            if nome and nome.strip():
+                novos.setdefault(cls.normalizar(nome), nome.strip())
+
+        ids = dict(cls.objects.filter(nome_normalizado__in=novos).values_list('nome_normalizado', 'id'))
+        faltantes = [chave for chave in novos if chave not in ids]
+        if faltantes:
+            cls.objects.bulk_create(
+                [cls(nome=novos[chave], nome_normalizado=chave) for chave in faltantes],
+                ignore_conflicts=True,
+            )
+            ids.update(cls.objects.filter(nome_normalizado__in=faltantes).values_list('nome_normalizado', 'id'))
+        return ids
+
+    @classmethod
+    def resolver(cls, nome):
+        """id do agrotóxico do catálogo para o nome (None se vazio)"""
+        if not nome or not nome.strip():
+            return None
+        return cls.mapear([nome])[cls.normalizar(nome)]
+
+    class Meta:
+        verbose_name = "Agrotóxico"
+        verbose_name_plural = "Agrotóxicos"
+        ordering = ['nome']
+
+
+class PropriedadeAtivaManager(models.Manager):
+    """Manager objects de PropriedadeRural: só registros ativos"""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(ativo=True)
+
+
 class PropriedadeRural(models.Model):
     NIVEL_CHOICES = [
         (1, 'Nível 1 - Baixo Impacto'),
@@ -87,7 +210,7 @@ class PropriedadeRural(models.Model):
 
     nome_propriedade = models.CharField(max_length=200, verbose_name="Nome da Propriedade")
     proprietario = models.CharField(max_length=200, verbose_name="Nome do Proprietário")
-    cpf_cnpj = models.CharField(max_length=18, verbose_name="CPF/CNPJ")
+    cpf_cnpj = models.CharField(max_length=18, verbose_name="CPF/CNPJ", db_index=True)
     endereco = models.TextField(verbose_name="Endereço Completo")
     cidade = models.CharField(max_length=100, verbose_name="Cidade")
     estado = models.CharField(max_length=2, verbose_name="Estado (UF)")
@@ -99,6 +222,14 @@ class PropriedadeRural(models.Model):
     )
     
     agrotoxico_utilizado = models.CharField(max_length=200, verbose_name="Agrotóxico Proibido Utilizado")
+    agrotoxico = models.ForeignKey(
+        Agrotoxico,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name='propriedades',
+        verbose_name="Agrotóxico (Catálogo)"
+    )
     nivel_impacto = models.IntegerField(
         choices=NIVEL_CHOICES,
         verbose_name="Nível de Impacto Ambiental"
@@ -141,10 +272,564 @@ class PropriedadeRural(models.Model):
     
     ativo = models.BooleanField(default=True, verbose_name="Registro Ativo")
 
+    # objects ignora os registros desativados; todos inclui também os inativos
+    # e é o manager padrão (estatísticas, arquivamento, admin, dumpdata)
+    objects = PropriedadeAtivaManager()
+    todos = models.Manager()
+
     def __str__(self):
         return f"{self.nome_propriedade} - {self.proprietario} (Nível {self.nivel_impacto})"
 
+    def save(self, *args, **kwargs):
+        # Mantém a propriedade e a estatística do dashboard na mesma transação
+        with transaction.atomic():
+            if self._vincular_agrotoxico() and kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'agrotoxico'}
+            super().save(*args, **kwargs)
+
+    def _vincular_agrotoxico(self):
+        """Aponta agrotoxico para o catálogo quando o texto é novo ou mudou"""
+        if 'agrotoxico_utilizado' not in self.__dict__:
+            return False
+        original = getattr(self, '_estado_original', None)
+        if self.agrotoxico_id and original and original[3] == self.agrotoxico_utilizado:
+            return False
+        self.agrotoxico_id = Agrotoxico.resolver(self.agrotoxico_utilizado)
+        return True
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            return super().delete(*args, **kwargs)
+
     class Meta:
         verbose_name = "Propriedade Rural"
         verbose_name_plural = "Propriedades Rurais"
         ordering = ['-data_cadastro']
+        default_manager_name = 'todos'
+        indexes = [
+            # Atende ao "últimas propriedades" do dashboard (ativo + nível, ordenado por data)
+            models.Index(fields=['ativo', 'nivel_impacto', '-data_cadastro'], name='propriedade_dashboard_idx'),
+            # Contagens por faceta da listagem (agrupadas por agrotóxico, nível e estado)
+            models.Index(fields=['ativo', 'nivel_impacto', 'agrotoxico', 'estado'], name='propriedade_facetas_idx'),
+            # Candidatas ao arquivamento (inativas, pela data da desativação)
+            models.Index(fields=['data_atualizacao'], condition=models.Q(ativo=False), name='propriedade_inativa_idx'),
+        ]
+
+
+class PropriedadeRuralArquivada(models.Model):
+    """
+    Propriedades desativadas movidas para fora da tabela principal pelo
+    comando arquivar_propriedades. Tem os mesmos campos de PropriedadeRural
+    e mantém o id original, permitindo a restauração.
+    """
+
+    id = models.BigIntegerField(primary_key=True, verbose_name="ID Original")
+    nome_propriedade = models.CharField(max_length=200, verbose_name="Nome da Propriedade")
+    proprietario = models.CharField(max_length=200, verbose_name="Nome do Proprietário")
+    cpf_cnpj = models.CharField(max_length=18, verbose_name="CPF/CNPJ")
+    endereco = models.TextField(verbose_name="Endereço Completo")
+    cidade = models.CharField(max_length=100, verbose_name="Cidade")
+    estado = models.CharField(max_length=2, verbose_name="Estado (UF)")
+    area_hectares = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Área em Hectares")
+    agrotoxico_utilizado = models.CharField(max_length=200, verbose_name="Agrotóxico Proibido Utilizado")
+    agrotoxico = models.ForeignKey(
+        Agrotoxico,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name="Agrotóxico (Catálogo)"
+    )
+    nivel_impacto = models.IntegerField(choices=PropriedadeRural.NIVEL_CHOICES, verbose_name="Nível de Impacto Ambiental")
+    descricao_impacto = models.TextField(verbose_name="Descrição do Impacto")
+    data_identificacao = models.DateField(verbose_name="Data de Identificação")
+    latitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True, verbose_name="Latitude")
+    longitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True, verbose_name="Longitude")
+    usuario_cadastro = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='+',
+        verbose_name="Cadastrado por"
+    )
+    data_cadastro = models.DateTimeField(verbose_name="Data de Cadastro")
+    data_atualizacao = models.DateTimeField(verbose_name="Última Atualização")
+    ativo = models.BooleanField(default=False, verbose_name="Registro Ativo")
+    data_arquivamento = models.DateTimeField(default=timezone.now, db_index=True, verbose_name="Data de Arquivamento")
+
+    def __str__(self):
+        return f"{self.nome_propriedade} - {self.proprietario} (arquivada)"
+
+    class Meta:
+        verbose_name = "Propriedade Rural Arquivada"
+        verbose_name_plural = "Propriedades Rurais Arquivadas"
+        ordering = ['-data_arquivamento']
+
+
+class EstatisticaPropriedade(models.Model):
+    """
+    Contagem consolidada de propriedades por nível, situação e estado.
+    Mantida pelos sinais de save/delete de PropriedadeRural e lida pelo dashboard.
+    """
+
+    nivel_impacto = models.IntegerField(choices=PropriedadeRural.NIVEL_CHOICES, verbose_name="Nível de Impacto Ambiental")
+    ativo = models.BooleanField(verbose_name="Registro Ativo")
+    estado = models.CharField(max_length=2, verbose_name="Estado (UF)")
+    total = models.IntegerField(default=0, verbose_name="Total")
+
+    def __str__(self):
+        situacao = 'ativas' if self.ativo else 'inativas'
+        return f"Nível {self.nivel_impacto} / {self.estado} ({situacao}): {self.total}"
+
+    @classmethod
+    def ajustar(cls, nivel_impacto, ativo, estado, delta):
+        """Soma delta ao contador da combinação informada"""
+        if not delta:
+            return
+        with transaction.atomic():
+            linha, _ = cls.objects.select_for_update().get_or_create(
+                nivel_impacto=nivel_impacto, ativo=ativo, estado=estado
+            )
+            cls.objects.filter(pk=linha.pk).update(total=F('total') + delta)
+
+    @classmethod
+    def contar_ativas(cls, niveis):
+        """Total de propriedades ativas nos níveis informados"""
+        return cls.objects.filter(ativo=True, nivel_impacto__in=niveis).aggregate(soma=Sum('total'))['soma'] or 0
+
+    @classmethod
+    def calcular(cls):
+        """Recalcula as contagens direto da tabela de propriedades"""
+        linhas = PropriedadeRural.todos.values('nivel_impacto', 'ativo', 'estado').annotate(total=Count('id')).order_by()
+        return {(l['nivel_impacto'], l['ativo'], l['estado']): l['total'] for l in linhas}
+
+    @classmethod
+    def armazenadas(cls):
+        return {(e.nivel_impacto, e.ativo, e.estado): e.total for e in cls.objects.all() if e.total}
+
+    @classmethod
+    def recalcular(cls):
+        """Reconstrói a tabela inteira a partir das propriedades"""
+        with transaction.atomic():
+            cls.objects.all().delete()
+            cls.objects.bulk_create([
+                cls(nivel_impacto=nivel, ativo=ativo, estado=estado, total=total)
+                for (nivel, ativo, estado), total in cls.calcular().items()
+            ])
+
+    class Meta:
+        verbose_name = "Estatística de Propriedades"
+        verbose_name_plural = "Estatísticas de Propriedades"
+        constraints = [
+            models.UniqueConstraint(fields=['nivel_impacto', 'ativo', 'estado'], name='estatistica_propriedade_unica'),
+        ]
+
+
+class EstatisticaUsuario(models.Model):
+    """Contagem consolidada de usuários por tipo de perfil"""
+
+    tipo_perfil = models.CharField(
+        max_length=10,
+        choices=PerfilUsuario.TIPO_PERFIL_CHOICES,
+        unique=True,
+        verbose_name="Tipo de Perfil"
+    )
+    total = models.IntegerField(default=0, verbose_name="Total")
+
+    def __str__(self):
+        return f"{self.get_tipo_perfil_display()}: {self.total}"
+
+    @classmethod
+    def ajustar(cls, tipo_perfil, delta):
+        """Soma delta ao contador do tipo de perfil informado"""
+        if not delta:
+            return
+        with transaction.atomic():
+            linha, _ = cls.objects.select_for_update().get_or_create(tipo_perfil=tipo_perfil)
+            cls.objects.filter(pk=linha.pk).update(total=F('total') + delta)
+
+    @classmethod
+    def contar_total(cls):
+        return cls.objects.aggregate(soma=Sum('total'))['soma'] or 0
+
+    @classmethod
+    def calcular(cls):
+        linhas = PerfilUsuario.objects.values('tipo_perfil').annotate(total=Count('id')).order_by()
+        return {l['tipo_perfil']: l['total'] for l in linhas}
+
+    @classmethod
+    def armazenadas(cls):
+        return {e.tipo_perfil: e.total for e in cls.objects.all() if e.total}
+
+    @classmethod
+    def recalcular(cls):
+        with transaction.atomic():
+            cls.objects.all().delete()
+            cls.objects.bulk_create([
+                cls(tipo_perfil=tipo, total=total) for tipo, total in cls.calcular().items()
+            ])
+
+    class Meta:
+        verbose_name = "Estatística de Usuários"
+        verbose_name_plural = "Estatísticas de Usuários"
+
+
+class AgregadoPropriedade(models.Model):
+    """
+    Totais de propriedades ativas por período de identificação (dia e mês),
+    estado, agrotóxico e nível, com a soma das áreas. Mantido pelos sinais de
+    save/delete de PropriedadeRural e consultado por core.analytics.
+    """
+
+    PERIODO_DIA = 'D'
+    PERIODO_MES = 'M'
+    PERIODO_CHOICES = [
+        (PERIODO_DIA, 'Dia'),
+        (PERIODO_MES, 'Mês'),
+    ]
+
+    periodo = models.CharField(max_length=1, choices=PERIODO_CHOICES, verbose_name="Período")
+    data = models.DateField(verbose_name="Início do Período")
+    estado = models.CharField(max_length=2, verbose_name="Estado (UF)")
+    agrotoxico_utilizado = models.CharField(max_length=200, verbose_name="Agrotóxico Proibido Utilizado")
+    nivel_impacto = models.IntegerField(choices=PropriedadeRural.NIVEL_CHOICES, verbose_name="Nível de Impacto Ambiental")
+    total = models.IntegerField(default=0, verbose_name="Total")
+    area_total = models.DecimalField(max_digits=16, decimal_places=2, default=0, verbose_name="Área Total (ha)")
+
+    def __str__(self):
+        return f"{self.get_periodo_display()} {self.data} / {self.estado} / {self.agrotoxico_utilizado} / Nível {self.nivel_impacto}: {self.total}"
+
+    @classmethod
+    def periodos(cls, data):
+        """(período, início) dos baldes que contêm a data"""
+        return ((cls.PERIODO_DIA, data), (cls.PERIODO_MES, data.replace(day=1)))
+
+    @classmethod
+    def chaves(cls, nivel_impacto, estado, agrotoxico, data):
+        """Chaves (periodo, data, estado, agrotoxico, nivel) dos baldes de dia e mês"""
+        return [(periodo, inicio, estado, agrotoxico, nivel_impacto) for periodo, inicio in cls.periodos(data)]
+
+    @classmethod
+    def ajustar(cls, nivel_impacto, estado, agrotoxico, data, total, area):
+        """Soma total propriedades e area hectares aos baldes de dia e mês da data"""
+        if not total and not area:
+            return
+        with transaction.atomic():
+            for periodo, inicio in cls.periodos(data):
+                linha, _ = cls.objects.select_for_update().get_or_create(
+                    periodo=periodo, data=inicio, estado=estado,
+                    agrotoxico_utilizado=agrotoxico, nivel_impacto=nivel_impacto,
+                )
+                cls.objects.filter(pk=linha.pk).update(
+                    total=F('total') + total,
+                    area_total=F('area_total') + area,
+                )
+
+    @classmethod
+    def aplicar_deltas(cls, deltas):
+        """
+        Soma de uma vez vários deltas {chave: (total, area)} (usado pelas
+        operações em massa): cria as linhas que faltam e incrementa todas com
+        um único UPDATE em executemany, sem ler as linhas antes.
+        """
+        deltas = {chave: valores for chave, valores in deltas.items() if valores[0] or valores[1]}
+        if not deltas:
+            return
+        campos = [cls._meta.get_field(nome) for nome in ('periodo', 'data', 'estado', 'agrotoxico_utilizado', 'nivel_impacto')]
+        conexao = connections[cls.objects.db]
+        coluna = conexao.ops.quote_name
+        area_total = cls._meta.get_field('area_total')
+
+        with transaction.atomic(using=conexao.alias):
+            cls.objects.bulk_create(
+                [cls(**{campo.name: valor for campo, valor in zip(campos, chave)}) for chave in deltas],
+                ignore_conflicts=True,
+                batch_size=500,
+            )
+            condicoes = ' AND '.join(f'{coluna(campo.column)} = %s' for campo in campos)
+            parametros = [
+                [total, area_total.get_db_prep_save(area, conexao)]
+                + [campo.get_db_prep_save(valor, conexao) for campo, valor in zip(campos, chave)]
+                for chave, (total, area) in deltas.items()
+            ]
+            with conexao.cursor() as cursor:
+                cursor.executemany(
+                    f'UPDATE {coluna(cls._meta.db_table)} '
+                    f'SET {coluna("total")} = {coluna("total")} + %s, '
+                    f'{coluna("area_total")} = {coluna("area_total")} + %s '
+                    f'WHERE {condicoes}',
+                    parametros,
+                )
+
+    @classmethod
+    def calcular(cls, estado=None):
+        """Recalcula os baldes direto da tabela de propriedades (opcionalmente de um estado)"""
+        propriedades = PropriedadeRural.objects.filter(ativo=True)
+        if estado is not None:
+            propriedades = propriedades.filter(estado=estado)
+        linhas = propriedades.values(
+            'estado', 'agrotoxico_utilizado', 'nivel_impacto', 'data_identificacao'
+        ).annotate(total=Count('id'), area=Sum('area_hectares')).order_by()
+
+        # Uma consulta por dia; os meses são somados a partir dos dias
+        baldes = defaultdict(lambda: [0, Decimal(0)])
+        for l in linhas:
+            for periodo, inicio in cls.periodos(l['data_identificacao']):
+                balde = baldes[(periodo, inicio, l['estado'], l['agrotoxico_utilizado'], l['nivel_impacto'])]
+                balde[0] += l['total']
+                balde[1] += l['area'] or 0
+        return {chave: tuple(valores) for chave, valores in baldes.items()}
+
+    @classmethod
+    def armazenadas(cls, estado=None):
+        agregados = cls.objects.filter(total__gt=0)
+        if estado is not None:
+            agregados = agregados.filter(estado=estado)
+        return {
+            (a.periodo, a.data, a.estado, a.agrotoxico_utilizado, a.nivel_impacto): (a.total, a.area_total)
+            for a in agregados
+        }
+
+    @classmethod
+    def recalcular(cls, estado=None):
+        """Reconstrói os baldes (de todos os estados ou de um só). Retorna o número de linhas"""
+        baldes = cls.calcular(estado)
+        with transaction.atomic():
+            existentes = cls.objects.all()
+            if estado is not None:
+                existentes = existentes.filter(estado=estado)
+            existentes.delete()
+            cls.objects.bulk_create([
+                cls(
+                    periodo=periodo, data=data, estado=uf, agrotoxico_utilizado=agrotoxico,
+                    nivel_impacto=nivel, total=total, area_total=area,
+                )
+                for (periodo, data, uf, agrotoxico, nivel), (total, area) in baldes.items()
+            ], batch_size=2000)
+        return len(baldes)
+
+    class Meta:
+        verbose_name = "Agregado de Propriedades"
+        verbose_name_plural = "Agregados de Propriedades"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['periodo', 'data', 'estado', 'agrotoxico_utilizado', 'nivel_impacto'],
+                name='agregado_propriedade_unico',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['periodo', 'nivel_impacto', 'data'], name='agregado_periodo_nivel_idx'),
+        ]
+
+
+# Sinais que mantêm as estatísticas do dashboard e os agregados atualizados.
+# O estado original é guardado no post_init (sem consulta extra) para que o
+# post_save saiba de qual combinação a linha saiu.
+
+CAMPOS_MONITORADOS_PROPRIEDADE = (
+    'nivel_impacto', 'ativo', 'estado', 'agrotoxico_utilizado', 'data_identificacao', 'area_hectares',
+)
+
+
+def _estado_propriedade(instance, base=None):
+    """
+    Valores de CAMPOS_MONITORADOS_PROPRIEDADE da instância, já convertidos
+    para o tipo do campo. Campos adiados (only/defer) não foram alterados,
+    então vêm de base; sem base, retorna None.
+    """
+    valores = instance.__dict__
+    estado = []
+    for indice, campo in enumerate(CAMPOS_MONITORADOS_PROPRIEDADE):
+        if campo in valores:
+            estado.append(instance._meta.get_field(campo).to_python(valores[campo]))
+        elif base is not None:
+            estado.append(base[indice])
+        else:
+            return None
+    return tuple(estado)
+
+
+def _mover_propriedade(original, atual):
+    """
+    Tira a propriedade das contagens do estado original e a soma às do atual
+    (None quando ela não existia ou deixou de existir).
+    """
+    if (original and original[:3]) != (atual and atual[:3]):
+        if original is not None:
+            EstatisticaPropriedade.ajustar(*original[:3], -1)
+        if atual is not None:
+            EstatisticaPropriedade.ajustar(*atual[:3], 1)
+
+    # Os agregados consideram só propriedades ativas
+    for estado, delta in ((original, -1), (atual, 1)):
+        if estado is not None and estado[1]:
+            nivel, _, uf, agrotoxico, data, area = estado
+            AgregadoPropriedade.ajustar(nivel, uf, agrotoxico, data, delta, (area or 0) * delta)
+
+
+def mover_propriedades(linhas, alteracoes=None):
+    """
+    Versão em lote de _mover_propriedade, para gravações que não disparam
+    sinais (update() e DELETE em massa). linhas são os valores de
+    CAMPOS_MONITORADOS_PROPRIEDADE antes da gravação; alteracoes, os campos
+    gravados em todas elas, ou None quando as linhas foram removidas.
+    """
+    estatisticas = defaultdict(int)
+    agregados = defaultdict(lambda: [0, Decimal(0)])
+    for linha in linhas:
+        antes = dict(zip(CAMPOS_MONITORADOS_PROPRIEDADE, linha))
+        depois = None if alteracoes is None else {
+            **antes, **{campo: valor for campo, valor in alteracoes.items() if campo in antes}
+        }
+        if antes == depois:
+            continue
+
+        for dados, sinal in ((antes, -1), (depois, 1)):
+            if dados is None:
+                continue
+            estatisticas[(dados['nivel_impacto'], dados['ativo'], dados['estado'])] += sinal
+            # Os agregados consideram só propriedades ativas
+            if not dados['ativo']:
+                continue
+            for chave in AgregadoPropriedade.chaves(
+                dados['nivel_impacto'], dados['estado'], dados['agrotoxico_utilizado'], dados['data_identificacao']
+            ):
+                agregados[chave][0] += sinal
+                agregados[chave][1] += sinal * (dados['area_hectares'] or 0)
+
+    for chave, delta in estatisticas.items():
+        EstatisticaPropriedade.ajustar(*chave, delta)
+    AgregadoPropriedade.aplicar_deltas(agregados)
+
+
+@receiver(post_init, sender=PropriedadeRural)
+def guardar_estado_original_propriedade(sender, instance, **kwargs):
+    instance._estado_original = _estado_propriedade(instance) if instance.pk else None
+
+
+@receiver(pre_save, sender=PropriedadeRural)
+def carregar_estado_original_propriedade(sender, instance, **kwargs):
+    """Busca o estado salvo quando a instância foi carregada com campos adiados"""
+    if instance.pk and instance._estado_original is None and not instance._state.adding:
+        linha = sender.todos.filter(pk=instance.pk).values_list(*CAMPOS_MONITORADOS_PROPRIEDADE).first()
+        instance._estado_original = tuple(linha) if linha else None
+
+
+@receiver(post_save, sender=PropriedadeRural)
+def atualizar_estatistica_propriedade(sender, instance, created, **kwargs):
+    original = None if created else instance._estado_original
+    atual = _estado_propriedade(instance, base=original)
+    if original == atual:
+        return
+    _mover_propriedade(original, atual)
+    instance._estado_original = atual
+
+
+@receiver(post_delete, sender=PropriedadeRural)
+def remover_estatistica_propriedade(sender, instance, **kwargs):
+    estado = instance._estado_original or _estado_propriedade(instance)
+    if estado is not None:
+        _mover_propriedade(estado, None)
+
+
+@receiver(post_init, sender=PerfilUsuario)
+def guardar_tipo_original_perfil(sender, instance, **kwargs):
+    instance._tipo_perfil_original = instance.__dict__.get('tipo_perfil') if instance.pk else None
+    foto = instance.__dict__.get('foto')
+    instance._foto_original = str(getattr(foto, 'name', foto) or '') if instance.pk else None
+
+
+@receiver(pre_save, sender=PerfilUsuario)
+def carregar_tipo_original_perfil(sender, instance, **kwargs):
+    """Busca o tipo salvo quando o perfil foi carregado com campos adiados"""
+    if instance.pk and instance._tipo_perfil_original is None and not instance._state.adding:
+        instance._tipo_perfil_original = sender.objects.filter(pk=instance.pk).values_list('tipo_perfil', flat=True).first()
+    if instance.pk and instance._foto_original is None and not instance._state.adding:
+        instance._foto_original = sender.objects.filter(pk=instance.pk).values_list('foto', flat=True).first() or ''
+    if (instance.foto.name or '') != (instance._foto_original or '') and not getattr(instance, '_foto_analisada', False):
+        # A caixa e a codificação eram da foto anterior
+        instance.caixa_rosto = None
+        instance.codificacao_facial = None
+
+
+@receiver(post_save, sender=PerfilUsuario)
+def atualizar_estatistica_usuario(sender, instance, created, **kwargs):
+    original = None if created else instance._tipo_perfil_original
+    if original == instance.tipo_perfil:
+        return
+    if original is not None:
+        EstatisticaUsuario.ajustar(original, -1)
+        # O selo de perfil de quem cadastrou aparece nas páginas em cache
+        transaction.on_commit(invalidar_propriedades)
+        # As permissões guardadas nas sessões do usuário deixam de valer
+        transaction.on_commit(partial(invalidar_permissoes, instance.usuario_id))
+    EstatisticaUsuario.ajustar(instance.tipo_perfil, 1)
+    instance._tipo_perfil_original = instance.tipo_perfil
+
+
+@receiver(post_delete, sender=PerfilUsuario)
+def remover_estatistica_usuario(sender, instance, **kwargs):
+    EstatisticaUsuario.ajustar(instance._tipo_perfil_original or instance.tipo_perfil, -1)
+
+
+@receiver(post_save, sender=PerfilUsuario)
+@receiver(post_delete, sender=PerfilUsuario)
+def invalidar_cache_usuario_perfil(sender, instance, **kwargs):
+    """O perfil fica em cache junto com o usuário"""
+    transaction.on_commit(partial(invalidar_usuario, instance.usuario_id))
+
+
+def atualizar_miniaturas(perfil_id):
+    """Gera as derivadas da foto atual do perfil e grava os nomes em miniaturas"""
+    perfil = PerfilUsuario.objects.filter(pk=perfil_id).only('foto', 'caixa_rosto', 'miniaturas').first()
+    if perfil is None:
+        return
+    miniaturas = salvar_derivadas(perfil.foto.name, perfil.caixa_rosto)
+    PerfilUsuario.objects.filter(pk=perfil_id).update(miniaturas=miniaturas)
+
+
+def liberar_foto(nome):
+    """
+    Apaga a foto e suas derivadas quando nenhum perfil aponta mais para ela
+    (o mesmo arquivo pode ser compartilhado, ver core/armazenamento.py).
+    """
+    if PerfilUsuario.objects.filter(foto=nome).exists():
+        return
+    if not armazenamento_fotos.exists(nome) or armazenamento_fotos.recente(nome):
+        # Na carência fica para o limpar_fotos
+        return
+    armazenamento_fotos.delete(nome)
+    remover_derivadas(nome)
+
+
+@receiver(post_save, sender=PerfilUsuario)
+def atualizar_foto_perfil(sender, instance, created, raw=False, **kwargs):
+    """Foto nova ou trocada: gera as miniaturas e libera a anterior depois do commit"""
+    foto = instance.foto.name or ''
+    anterior = instance._foto_original or ''
+    instance._foto_analisada = False
+    if raw or foto == anterior:
+        return
+    instance._foto_original = foto
+    transaction.on_commit(invalidar_galeria)
+    if foto:
+        transaction.on_commit(partial(atualizar_miniaturas, instance.pk))
+    elif instance.miniaturas:
+        sender.objects.filter(pk=instance.pk).update(miniaturas={})
+        instance.miniaturas = {}
+    if anterior:
+        transaction.on_commit(partial(liberar_foto, anterior))
+
+
+@receiver(post_delete, sender=PerfilUsuario)
+def liberar_foto_perfil(sender, instance, **kwargs):
+    if instance.foto:
+        transaction.on_commit(partial(liberar_foto, instance.foto.name))
+        transaction.on_commit(invalidar_galeria)
+
+
+@receiver(post_save, sender=PropriedadeRural)
+@receiver(post_delete, sender=PropriedadeRural)
+def invalidar_cache_propriedades(sender, instance, **kwargs):
+    """Invalida as páginas e consultas de propriedades em cache após o commit"""
+    transaction.on_commit(invalidar_propriedades)
@@ -0,0 +1,199 @@
+"""
+Motores do reconhecimento facial: detector (onde estão os rostos),
+codificador (rosto -> vetor de 128 dimensões) e comparador (vetores -> usuário
+da galeria), escolhidos nas settings MOTOR_DETECTOR, MOTOR_CODIFICADOR e
+MOTOR_COMPARADOR pelo nome registrado abaixo ou pelo caminho de uma classe
+(ex.: 'meupacote.motores.DetectorYuNet').
+
+O padrão ('hog', 'dlib', 'exato') é o comportamento original do login:
+face_locations com HOG e uma ampliação, face_encodings com os 5 pontos e
+distância euclidiana contra a galeria inteira. Os comparadores 'float16' e
+'int8' varrem uma cópia compacta da galeria e só conferem os mais próximos
+com a codificação exata. Compare as alternativas no mesmo conjunto de
+imagens com python manage.py benchmark_motores.
+
+Trocar o codificador muda o espaço das codificações: recalcule a galeria
+com python manage.py codificar_galeria --todas.
+"""
+
+import os
+from functools import partial
+
+import numpy as np
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.module_loading import import_string
+
+from .galeria import DIMENSOES, Galeria, GaleriaQuantizada, arquivo_exatas
+
+# Cascatas do OpenCV carregadas neste processo, por nome
+_cascatas = {}
+
+
+def carregar_cascata(nome):
+    """
+    Cascata Haar/LBP do OpenCV: nome de um arquivo de cv2.data.haarcascades
+    (as que vêm com o opencv-python) ou caminho absoluto para outra.
+    """
+    import cv2
+
+    if nome not in _cascatas:
+        caminho = nome if os.path.isabs(nome) else os.path.join(cv2.data.haarcascades, nome)
+        cascata = cv2.CascadeClassifier(caminho)
+        if cascata.empty():
+            raise ImproperlyConfigured(f'Cascata não encontrada: {caminho}')
+        _cascatas[nome] = cascata
+    return _cascatas[nome]
+
+
+class Detector:
+    """Imagem RGB (uint8) -> caixas (top, right, bottom, left) dos rostos"""
+
+    def localizar(self, image_np):
+        raise NotImplementedError
+
+
+class DetectorDlib(Detector):
+    """face_locations do face_recognition: 'hog' (CPU) ou 'cnn' (MMOD, bem mais lento sem GPU)"""
+
+    def __init__(self, modelo='hog', ampliacoes=1):
+        self.modelo = modelo
+        self.ampliacoes = ampliacoes
+
+    def localizar(self, image_np):
+        import face_recognition
+
+        return face_recognition.face_locations(image_np, self.ampliacoes, self.modelo)
+
+
+class DetectorCascata(Detector):
+    """Cascata do OpenCV; as caixas são mais largas que as do dlib, mas os pontos do rosto se ajustam"""
+
+    def __init__(self, cascata='haarcascade_frontalface_alt2.xml', vizinhos=4, rosto_minimo=60):
+        self.cascata = cascata
+        self.vizinhos = vizinhos
+        self.rosto_minimo = rosto_minimo
+
+    def localizar(self, image_np):
+        import cv2
+
+        cinza = cv2.equalizeHist(cv2.cvtColor(image_np, cv2.COLOR_RGB2GRAY))
+        rostos = carregar_cascata(self.cascata).detectMultiScale(
+            cinza, scaleFactor=1.1, minNeighbors=self.vizinhos, minSize=(self.rosto_minimo, self.rosto_minimo)
+        )
+        return [(int(y), int(x + w), int(y + h), int(x)) for x, y, w, h in rostos]
+
+
+class Codificador:
+    """Imagem e caixas -> codificações (k x DIMENSOES, float64)"""
+
+    def codificar(self, image_np, caixas):
+        raise NotImplementedError
+
+
+class CodificadorDlib(Codificador):
+    """face_encodings do face_recognition, com os 5 ('small') ou 68 ('large') pontos do rosto"""
+
+    def __init__(self, pontos='small', amostras=1):
+        self.pontos = pontos
+        self.amostras = amostras
+
+    def codificar(self, image_np, caixas):
+        import face_recognition
+
+        codificacoes = face_recognition.face_encodings(image_np, caixas, self.amostras, self.pontos)
+        return np.array(codificacoes, dtype=np.float64).reshape(-1, DIMENSOES)
+
+
+class Comparador:
+    """
+    Codificações -> [(usuario_id ou None, distância)] contra a galeria
+    (core/galeria.py), com o mesmo contrato de Galeria.identificar. indexar
+    monta a galeria na representação que o comparador usa.
+    """
+
+    def indexar(self, usuario_ids, matriz, versao, diretorio=None):
+        return Galeria(usuario_ids, matriz)
+
+    def identificar(self, galeria, codificacoes, tolerancia):
+        raise NotImplementedError
+
+
+class ComparadorExato(Comparador):
+    """Distância euclidiana contra todas as codificações da galeria"""
+
+    def identificar(self, galeria, codificacoes, tolerancia):
+        return galeria.identificar(codificacoes, tolerancia)
+
+
+class ComparadorQuantizado(ComparadorExato):
+    """
+    Varredura em float16 ou int8 (GaleriaQuantizada) e reordenação dos
+    `candidatos` mais próximos pela distância exata, lida do disco
+    """
+
+    def __init__(self, tipo, candidatos=16):
+        self.tipo = tipo
+        self.candidatos = candidatos
+
+    def indexar(self, usuario_ids, matriz, versao, diretorio=None):
+        arquivo = arquivo_exatas(usuario_ids, versao, diretorio)
+        return GaleriaQuantizada(usuario_ids, matriz, self.tipo, arquivo, self.candidatos)
+
+
+DETECTORES = {
+    'hog': DetectorDlib,
+    'hog_sem_ampliacao': partial(DetectorDlib, 'hog', 0),
+    'cnn': partial(DetectorDlib, 'cnn', 1),
+    'haar': DetectorCascata,
+}
+
+CODIFICADORES = {
+    'dlib': CodificadorDlib,
+    'dlib_68_pontos': partial(CodificadorDlib, 'large'),
+    'dlib_5_amostras': partial(CodificadorDlib, 'small', 5),
+}
+
+COMPARADORES = {
+    'exato': ComparadorExato,
+    'float16': partial(ComparadorQuantizado, 'float16'),
+    'int8': partial(ComparadorQuantizado, 'int8'),
+}
+
+REGISTROS = {
+    'detector': (DETECTORES, 'MOTOR_DETECTOR'),
+    'codificador': (CODIFICADORES, 'MOTOR_CODIFICADOR'),
+    'comparador': (COMPARADORES, 'MOTOR_COMPARADOR'),
+}
+
+# Motores criados neste processo, por (tipo, nome)
+_motores = {}
+
+
+def motor(tipo, nome=None):
+    """Instância (única no processo) do motor pelo nome registrado ou caminho da classe"""
+    registro, setting = REGISTROS[tipo]
+    nome = nome or getattr(settings, setting)
+    chave = (tipo, nome)
+    if chave not in _motores:
+        if nome in registro:
+            fabrica = registro[nome]
+        else:
+            try:
+                fabrica = import_string(nome)
+            except ImportError:
+                raise ImproperlyConfigured(f'{setting}: {nome!r} não é um {tipo} registrado nem uma classe')
+        _motores[chave] = fabrica()
+    return _motores[chave]
+
+
+def detector(nome=None):
+    return motor('detector', nome)
+
+
+def codificador(nome=None):
+    return motor('codificador', nome)
+
+
+def comparador(nome=None):
+    return motor('comparador', nome)
@@ -0,0 +1,97 @@
+"""
+Operações em massa sobre propriedades rurais (mudança de nível, desativação
+e reatribuição do responsável).
+
+A permissão é verificada uma única vez para o conjunto inteiro (e o nível,
+de novo, nas linhas travadas de cada lote) e as alterações são gravadas com
+queryset.update() em lotes transacionais.
+Como update() não dispara sinais, as estatísticas do dashboard e os
+agregados são ajustados por lote a partir dos valores lidos antes da
+alteração.
+"""
+
+from django.contrib.auth.models import User
+from django.core.exceptions import PermissionDenied, ValidationError
+from django.db import transaction
+from django.utils import timezone
+
+from .cache import invalidar_propriedades
+from .models import CAMPOS_MONITORADOS_PROPRIEDADE, PropriedadeRural, mover_propriedades
+from .permissoes import permissoes_do_usuario
+
+OPERACOES = {
+    'nivel': 'Alterar nível de impacto',
+    'desativar': 'Desativar',
+    'reatribuir': 'Reatribuir responsável pelo cadastro',
+}
+
+TAMANHO_LOTE = 1000
+
+
+def _alteracoes(operacao, valor, niveis_permitidos):
+    """Campos gravados pela operação (valida o valor informado)"""
+    if operacao == 'nivel':
+        try:
+            nivel = int(valor)
+        except (TypeError, ValueError):
+            raise ValidationError('Informe o novo nível (1, 2 ou 3).')
+        if nivel not in niveis_permitidos:
+            raise PermissionDenied('Você não tem permissão para classificar propriedades neste nível!')
+        return {'nivel_impacto': nivel}
+
+    if operacao == 'desativar':
+        return {'ativo': False}
+
+    if operacao == 'reatribuir':
+        usuario = User.objects.filter(pk=valor, is_active=True).first() if str(valor).isdigit() else None
+        if usuario is None:
+            raise ValidationError('Usuário de destino não encontrado.')
+        return {'usuario_cadastro': usuario}
+
+    raise ValidationError(f'Operação inválida. Use: {", ".join(OPERACOES)}.')
+
+
+def executar_em_massa(usuario, propriedades, operacao, valor=None, tamanho_lote=TAMANHO_LOTE):
+    """
+    Aplica a operação a todas as propriedades ativas do queryset, em lotes de
+    tamanho_lote (uma transação por lote). O usuário precisa poder cadastrar
+    em todos os níveis envolvidos; propriedades levadas para outro nível por
+    outro usuário durante a execução ficam de fora. Retorna quantas
+    propriedades foram alteradas.
+    """
+    niveis_permitidos = list(permissoes_do_usuario(usuario).niveis_criacao)
+    if not niveis_permitidos:
+        raise PermissionDenied('Você não tem permissão para alterar propriedades!')
+
+    alteracoes = _alteracoes(operacao, valor, niveis_permitidos)
+    propriedades = propriedades.filter(ativo=True)
+
+    # Verificação única para o conjunto: nenhuma propriedade fora dos níveis permitidos
+    fora_do_nivel = propriedades.exclude(nivel_impacto__in=niveis_permitidos).count()
+    if fora_do_nivel:
+        raise PermissionDenied(
+            f'{fora_do_nivel} propriedade(s) estão em níveis que você não tem permissão para alterar!'
+        )
+
+    alteradas = 0
+    ultimo_id = 0
+    while True:
+        # Paginação por chave: os lotes seguintes não dependem do filtro original
+        # continuar valendo depois das alterações
+        ids = list(
+            propriedades.filter(pk__gt=ultimo_id).order_by('pk').values_list('pk', flat=True)[:tamanho_lote]
+        )
+        if not ids:
+            break
+        ultimo_id = ids[-1]
+
+        with transaction.atomic():
+            # O nível é conferido de novo nas linhas travadas do lote
+            lote = PropriedadeRural.todos.filter(pk__in=ids, ativo=True, nivel_impacto__in=niveis_permitidos)
+            linhas = list(lote.select_for_update().values_list(*CAMPOS_MONITORADOS_PROPRIEDADE))
+            alteradas += lote.update(**alteracoes, data_atualizacao=timezone.now())
+            mover_propriedades(linhas, alteracoes)
+
+    if alteradas:
+        transaction.on_commit(invalidar_propriedades)
+    return alteradas
@@ -0,0 +1,168 @@
+"""
+Contexto de permissões do usuário logado.
+
+As regras de acesso (níveis de impacto que o usuário pode ver e cadastrar e
+os tipos de perfil que pode criar) dependem só de is_staff/is_superuser e
+do tipo de perfil. PermissoesMiddleware (core/middleware.py) resolve o
+contexto uma vez por requisição e o guarda na sessão; a versão por usuário
+no cache é incrementada quando o tipo de perfil muda, descartando o
+contexto salvo nas sessões abertas. Por isso a sessão só é usada com um
+cache compartilhado entre os workers (settings.CACHE_COMPARTILHADO).
+"""
+
+import time
+from dataclasses import asdict, dataclass
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .cache import cache_compartilhado
+
+NIVEIS = {
+    1: 'Nível 1 - Baixo Impacto',
+    2: 'Nível 2 - Médio Impacto',
+    3: 'Nível 3 - Alto Impacto',
+}
+
+PERFIS = {
+    'COMUM': '👤 Usuário Comum',
+    'DIRETOR': '👔 Diretor de Divisões',
+    'MINISTRO': '🎖️ Ministro do Meio Ambiente',
+}
+
+# Tipo de perfil -> (níveis visíveis, níveis que cadastra, perfis que cria)
+REGRAS = {
+    'MINISTRO': ((1, 2, 3), (1, 2, 3), ('COMUM', 'DIRETOR', 'MINISTRO')),
+    'DIRETOR': ((1, 2), (1, 2), ('COMUM', 'DIRETOR')),
+    'COMUM': ((1,), (), ()),
+}
+
+# Administradores têm as mesmas permissões do Ministro
+REGRAS_ADMIN = REGRAS['MINISTRO']
+
+# Usuário sem perfil: apenas nível 1
+REGRAS_SEM_PERFIL = ((1,), (), ())
+
+CHAVE_SESSAO = '_permissoes'
+
+
+@dataclass(frozen=True)
+class ContextoPermissoes:
+    autenticado: bool = False
+    tipo_perfil: str = ''
+    niveis_visualizacao: tuple = ()
+    niveis_criacao: tuple = ()
+    perfis_permitidos: tuple = ()
+
+    @property
+    def pode_criar_usuarios(self):
+        return bool(self.perfis_permitidos)
+
+    @property
+    def pode_criar_propriedades(self):
+        return bool(self.niveis_criacao)
+
+    @property
+    def tipo_perfil_rotulo(self):
+        from .models import PerfilUsuario
+        return dict(PerfilUsuario.TIPO_PERFIL_CHOICES).get(self.tipo_perfil, '')
+
+    def opcoes_niveis_criacao(self):
+        """Tuplas (valor, label) para o select de nível"""
+        return [(nivel, NIVEIS[nivel]) for nivel in self.niveis_criacao]
+
+    def opcoes_perfis(self):
+        """Tuplas (valor, label) para o select de tipo de perfil"""
+        return [(perfil, PERFIS[perfil]) for perfil in self.perfis_permitidos]
+
+
+ANONIMO = ContextoPermissoes()
+
+
+def calcular_permissoes(usuario):
+    """Resolve as permissões a partir do usuário (acessa o perfil uma vez)"""
+    if not usuario.is_authenticated:
+        return ANONIMO
+
+    perfil = getattr(usuario, 'perfil', None)
+    tipo_perfil = perfil.tipo_perfil if perfil is not None else ''
+    if usuario.is_staff or usuario.is_superuser:
+        regras = REGRAS_ADMIN
+    elif perfil is None:
+        regras = REGRAS_SEM_PERFIL
+    else:
+        regras = REGRAS.get(tipo_perfil, REGRAS['COMUM'])
+
+    return ContextoPermissoes(True, tipo_perfil, *regras)
+
+
+def permissoes_do_usuario(usuario):
+    """Contexto de permissões memorizado na própria instância do usuário"""
+    contexto = getattr(usuario, '_contexto_permissoes', None)
+    if contexto is None:
+        contexto = calcular_permissoes(usuario)
+        if usuario.is_authenticated:
+            usuario._contexto_permissoes = contexto
+    return contexto
+
+
+def _chave_versao(usuario_id):
+    return f'permissoes:versao:{usuario_id}'
+
+
+def versao_permissoes(usuario_id):
+    """Versão atual das permissões do usuário"""
+    versao = cache.get(_chave_versao(usuario_id))
+    if versao is None:
+        # Como em versao_propriedades: começa pelo relógio para que sessões
+        # antigas não coincidam caso a chave seja descartada pelo backend
+        cache.add(_chave_versao(usuario_id), time.time_ns(), None)
+        versao = cache.get(_chave_versao(usuario_id))
+    return versao
+
+
+def invalidar_permissoes(usuario_id):
+    """Descarta o contexto de permissões guardado nas sessões do usuário"""
+    try:
+        cache.incr(_chave_versao(usuario_id))
+    except ValueError:
+        cache.add(_chave_versao(usuario_id), time.time_ns(), None)
+
+
+def permissoes_da_requisicao(request):
+    """
+    Contexto de permissões do usuário da requisição, reaproveitando o que foi
+    guardado na sessão enquanto usuário, is_staff/is_superuser e a versão das
+    permissões não mudarem.
+    """
+    usuario = request.user
+    if not usuario.is_authenticated:
+        return ANONIMO
+    if not getattr(settings, 'PERMISSOES_NA_SESSAO', True) or not hasattr(request, 'session'):
+        return permissoes_do_usuario(usuario)
+    if not cache_compartilhado():
+        # A versão incrementada por um worker não seria vista pelos outros
+        return permissoes_do_usuario(usuario)
+
+    versao = versao_permissoes(usuario.pk)
+    if versao is None:
+        # Cache desativado (DummyCache): sem como invalidar o que ficou na sessão
+        return permissoes_do_usuario(usuario)
+
+    chave = [usuario.pk, usuario.is_staff, usuario.is_superuser, versao]
+    salvo = request.session.get(CHAVE_SESSAO)
+    if salvo and salvo['chave'] == chave:
+        dados = salvo['dados']
+        contexto = ContextoPermissoes(
+            autenticado=True,
+            tipo_perfil=dados['tipo_perfil'],
+            niveis_visualizacao=tuple(dados['niveis_visualizacao']),
+            niveis_criacao=tuple(dados['niveis_criacao']),
+            perfis_permitidos=tuple(dados['perfis_permitidos']),
+        )
+        usuario._contexto_permissoes = contexto
+        return contexto
+
+    contexto = permissoes_do_usuario(usuario)
+    request.session[CHAVE_SESSAO] = {'chave': chave, 'dados': asdict(contexto)}
+    return contexto
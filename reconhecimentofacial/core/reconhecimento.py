@@ -0,0 +1,253 @@
+"""
+Etapas do reconhecimento facial compartilhadas pelo login, pelo cadastro de
+fotos e pela identificação de vários rostos.
+
+face_recognition (dlib) e OpenCV são importados dentro das funções, como
+nas views, para que o restante do sistema funcione sem eles.
+"""
+
+import numpy as np
+from django.conf import settings
+
+from . import motores
+from .imagens import FotoInvalida
+from .motores import carregar_cascata
+
+# Margem (proporcional ao rosto) do recorte feito em volta da caixa indicada
+# pelo cliente
+MARGEM_REGIAO = 0.5
+# Caixas menores que isso (na escala de trabalho) são ignoradas
+LADO_MINIMO_REGIAO = 20
+
+
+def expandir(caixa, margem, formato):
+    """Caixa (top, right, bottom, left) com margem proporcional ao rosto, limitada à imagem"""
+    top, right, bottom, left = caixa
+    dy, dx = round((bottom - top) * margem), round((right - left) * margem)
+    return max(top - dy, 0), min(right + dx, formato[1]), min(bottom + dy, formato[0]), max(left - dx, 0)
+
+
+def ler_regiao(valor, escala, formato):
+    """
+    Caixa do rosto indicada pelo cliente ('top,right,bottom,left' nas
+    coordenadas da imagem enviada, como nas respostas) convertida para a
+    escala de trabalho. None se ausente, inválida ou pequena demais.
+    """
+    try:
+        top, right, bottom, left = (int(parte) / escala for parte in (valor or '').strip('[] ').split(','))
+    except ValueError:
+        return None
+    top, left = max(round(top), 0), max(round(left), 0)
+    bottom, right = min(round(bottom), formato[0]), min(round(right), formato[1])
+    if bottom - top < LADO_MINIMO_REGIAO or right - left < LADO_MINIMO_REGIAO:
+        return None
+    return top, right, bottom, left
+
+
+def para_original(caixa, deslocamento, escala):
+    """Caixa de um recorte (deslocado em (top, left)) nas coordenadas da imagem enviada"""
+    top, left = deslocamento
+    t, r, b, l = caixa
+    return [round((t + top) * escala), round((r + left) * escala), round((b + top) * escala), round((l + left) * escala)]
+
+
+def preprocessar_imagem_opencv(image_np):
+    """
+    Pré-processa imagem com OpenCV para melhorar reconhecimento facial.
+    """
+    import cv2
+    import numpy as np
+    
+    try:
+        # 1. Converter RGB para BGR (OpenCV usa BGR)
+        image_bgr = cv2.cvtColor(image_np, cv2.COLOR_RGB2BGR)
+        
+        # 2. Avaliar qualidade da imagem
+        gray = cv2.cvtColor(image_bgr, cv2.COLOR_BGR2GRAY)
+        
+        # 2.1 Detectar blur (Laplacian variance)
+        blur_score = cv2.Laplacian(gray, cv2.CV_64F).var()
+        if blur_score < 30:  # Threshold mais permissivo
+            return None, blur_score, f"Imagem desfocada (score: {blur_score:.1f}). Use uma imagem mais nítida."
+        
+        # 2.2 Verificar brilho médio
+        brightness = np.mean(gray)
+        if brightness < 30:
+            return None, brightness, "Imagem muito escura. Melhore a iluminação."
+        if brightness > 240:
+            return None, brightness, "Imagem muito clara. Reduza a iluminação."
+        
+        # 3. Equalização adaptativa de histograma (CLAHE)
+        clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
+        
+        # Aplicar em cada canal de cor
+        b, g, r = cv2.split(image_bgr)
+        b_clahe = clahe.apply(b)
+        g_clahe = clahe.apply(g)
+        r_clahe = clahe.apply(r)
+        image_clahe = cv2.merge([b_clahe, g_clahe, r_clahe])
+        
+        # 4. Redução de ruído (Denoising)
+        image_denoised = cv2.fastNlMeansDenoisingColored(
+            image_clahe, 
+            None, 
+            h=10,
+            hColor=10,
+            templateWindowSize=7,
+            searchWindowSize=21
+        )
+        
+        # 5. Aumentar nitidez (Sharpening)
+        kernel_sharpening = np.array([
+            [-1, -1, -1],
+            [-1,  9, -1],
+            [-1, -1, -1]
+        ])
+        image_sharp = cv2.filter2D(image_denoised, -1, kernel_sharpening)
+        
+        # 6. Ajustar gamma para melhorar contraste
+        def adjust_gamma(image, gamma=1.2):
+            inv_gamma = 1.0 / gamma
+            table = np.array([((i / 255.0) ** inv_gamma) * 255 
+                            for i in np.arange(0, 256)]).astype("uint8")
+            return cv2.LUT(image, table)
+        
+        image_gamma = adjust_gamma(image_sharp, gamma=1.2)
+        
+        # 7. Converter de volta para RGB (para face_recognition)
+        image_processed = cv2.cvtColor(image_gamma, cv2.COLOR_BGR2RGB)
+        
+        # Calcular score de qualidade final
+        quality_score = min(100, (blur_score / 5) + (50 if 60 < brightness < 200 else 0))
+        
+        return image_processed, quality_score, None
+        
+    except Exception as e:
+        return None, 0, f"Erro no pré-processamento: {str(e)}"
+
+
+def detectar_qualidade_imagem(image_np):
+    """
+    Detecta qualidade da imagem e retorna score + sugestões.
+    """
+    import cv2
+    import numpy as np
+    
+    sugestoes = []
+    score = 100
+    
+    # Converter para BGR e grayscale
+    image_bgr = cv2.cvtColor(image_np, cv2.COLOR_RGB2BGR)
+    gray = cv2.cvtColor(image_bgr, cv2.COLOR_BGR2GRAY)
+    
+    # 1. Verificar nitidez (blur)
+    blur_score = cv2.Laplacian(gray, cv2.CV_64F).var()
+    if blur_score < 30:
+        score -= 30
+        sugestoes.append("Imagem desfocada - segure a câmera com firmeza")
+    elif blur_score < 60:
+        score -= 15
+        sugestoes.append("Imagem levemente desfocada")
+    
+    # 2. Verificar iluminação
+    brightness = np.mean(gray)
+    if brightness < 40:
+        score -= 25
+        sugestoes.append("Ambiente muito escuro - aumente a iluminação")
+    elif brightness < 60:
+        score -= 10
+        sugestoes.append("Iluminação baixa")
+    elif brightness > 220:
+        score -= 20
+        sugestoes.append("Ambiente muito claro - reduza a luz")
+    elif brightness > 200:
+        score -= 10
+        sugestoes.append("Iluminação alta")
+    
+    # 3. Verificar contraste
+    contrast = gray.std()
+    if contrast < 25:
+        score -= 15
+        sugestoes.append("Baixo contraste - melhore a iluminação")
+    
+    # 4. Verificar se imagem está muito pixelada
+    height, width = gray.shape
+    if height < 240 or width < 320:
+        score -= 20
+        sugestoes.append("Resolução baixa - use câmera melhor")
+    
+    qualidade_ok = score >= 40  # Threshold mais permissivo
+    
+    if not sugestoes:
+        sugestoes.append("Qualidade de imagem boa!")
+    
+    return qualidade_ok, score, sugestoes
+
+
+# Pré-filtro: varredura fina e rostos a partir de 20 px na cópia reduzida
+PREFILTRO_ESCALA = 1.1
+PREFILTRO_ROSTO_MINIMO = 20
+
+def provavel_rosto(image_np, lado=None, vizinhos=None, cascata=None):
+    """
+    Pré-filtro barato para quadros sem rosto: roda a cascata em uma cópia
+    pequena (lado máximo PREFILTRO_LADO) em tons de cinza, em poucos
+    milissegundos, antes do pré-processamento e da detecção do dlib. Só
+    False quando a cascata não acha nada parecido com um rosto.
+    """
+    import cv2
+    
+    lado = lado or settings.PREFILTRO_LADO
+    vizinhos = settings.PREFILTRO_VIZINHOS if vizinhos is None else vizinhos
+    altura, largura = image_np.shape[:2]
+    fator = min(lado / max(altura, largura), 1.0)
+    pequena = cv2.resize(image_np, (round(largura * fator), round(altura * fator)), interpolation=cv2.INTER_AREA)
+    cinza = cv2.equalizeHist(cv2.cvtColor(pequena, cv2.COLOR_RGB2GRAY))
+    rostos = carregar_cascata(cascata or settings.PREFILTRO_CASCATA).detectMultiScale(
+        cinza,
+        scaleFactor=PREFILTRO_ESCALA,
+        minNeighbors=vizinhos,
+        minSize=(PREFILTRO_ROSTO_MINIMO, PREFILTRO_ROSTO_MINIMO),
+    )
+    return len(rostos) > 0
+
+
+def preparar_para_codificacao(image_np):
+    """Pré-processa a imagem; se o pré-processamento a recusar, segue com a original"""
+    processada, _, _ = preprocessar_imagem_opencv(image_np)
+    return image_np if processada is None else processada
+
+
+def localizar_rostos(image_np):
+    """Caixas (top, right, bottom, left) dos rostos, pelo detector de MOTOR_DETECTOR"""
+    return motores.detector().localizar(image_np)
+
+
+def codificar_rostos(image_np, face_locations):
+    """Codificações (k x 128) de todos os rostos em uma única chamada do codificador de MOTOR_CODIFICADOR"""
+    return motores.codificador().codificar(image_np, face_locations)
+
+
+def identificar(galeria, codificacoes, tolerancia):
+    """[(usuario_id ou None, distância)] de cada rosto na galeria, pelo comparador de MOTOR_COMPARADOR"""
+    return motores.comparador().identificar(galeria, codificacoes, tolerancia)
+
+
+def localizar_e_codificar(image_np):
+    """Pré-processa, detecta todos os rostos e os codifica. Retorna (caixas, codificações)"""
+    image_np = preparar_para_codificacao(image_np)
+    face_locations = localizar_rostos(image_np)
+    return face_locations, codificar_rostos(image_np, face_locations)
+
+
+def codificar_foto_perfil(image_np, exigir_unico=True):
+    """
+    Foto de perfil -> (caixa do rosto, codificação). Sem rosto (ou, com
+    exigir_unico, com mais de um) levanta FotoInvalida.
+    """
+    face_locations, codificacoes = localizar_e_codificar(image_np)
+    if not len(codificacoes):
+        raise FotoInvalida('Nenhum rosto detectado na foto.', ['Centralize seu rosto na câmera', 'Melhore a iluminação'])
+    if exigir_unico and len(codificacoes) > 1:
+        raise FotoInvalida('Mais de um rosto detectado na foto.', ['Apenas uma pessoa deve aparecer'])
+    return list(face_locations[0]), codificacoes[0]
@@ -0,0 +1,85 @@
+"""
+Roteamento de leituras para réplicas do banco.
+
+Gravações sempre vão para o banco principal ('default'). As leituras também,
+exceto durante as views marcadas com @leitura_em_replica (páginas de consulta
+acessadas por GET/HEAD) e nos blocos with em_replica(), quando vão para uma
+das réplicas de settings.REPLICAS_LEITURA. A escolha fica em uma ContextVar
+definida pelo ReplicaMiddleware, então vale só para a requisição atual.
+
+Leitura das próprias gravações: depois de um POST/PUT/PATCH/DELETE o
+middleware grava um cookie que, por REPLICA_ATRASO_MAXIMO segundos, faz as
+leituras daquele navegador voltarem ao principal.
+
+Para testar localmente com SQLite: copie o banco (cp db.sqlite3 replica.sqlite3)
+e use DATABASE_REPLICAS=replica.sqlite3.
+"""
+
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+COOKIE_PRIMARIO = 'ler_do_principal'
+
+METODOS_LEITURA = ('GET', 'HEAD', 'OPTIONS')
+
+_banco_leitura = ContextVar('banco_leitura', default=None)
+
+
+def escolher_replica():
+    """Uma das réplicas configuradas, ou None se não houver"""
+    replicas = getattr(settings, 'REPLICAS_LEITURA', [])
+    return random.choice(replicas) if replicas else None
+
+
+def banco_leitura():
+    """Alias usado para leituras na requisição atual"""
+    return _banco_leitura.get() or 'default'
+
+
+def ler_do_principal(request):
+    """O navegador gravou algo há pouco e precisa ler do principal"""
+    return COOKIE_PRIMARIO in request.COOKIES
+
+
+@contextmanager
+def em_replica(request=None):
+    """Leituras do bloco vão para uma réplica (salvo logo após uma gravação)"""
+    replica = None if request is not None and ler_do_principal(request) else escolher_replica()
+    token = _banco_leitura.set(replica or _banco_leitura.get())
+    try:
+        yield
+    finally:
+        _banco_leitura.reset(token)
+
+
+def iniciar_requisicao():
+    """Começa a requisição lendo do principal; retorna o token para encerrar"""
+    return _banco_leitura.set(None)
+
+
+def usar_replica():
+    """Passa as leituras do restante da requisição para uma réplica"""
+    _banco_leitura.set(escolher_replica())
+
+
+def encerrar_requisicao(token):
+    _banco_leitura.reset(token)
+
+
+class RoteadorReplicas:
+    def db_for_read(self, model, **hints):
+        return banco_leitura()
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Réplicas têm os mesmos dados do principal
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # As réplicas recebem o esquema pela replicação
+        return db == 'default'
@@ -0,0 +1,61 @@
+from rest_framework import serializers
+
+from .models import PropriedadeRural
+
+
+class PropriedadeRuralSerializer(serializers.ModelSerializer):
+    """
+    Serializer somente leitura das propriedades. Aceita campos=[...] para
+    devolver apenas um subconjunto dos campos (sparse fieldsets).
+    """
+
+    cadastrado_por = serializers.CharField(source='usuario_cadastro.username', read_only=True, default=None)
+
+    # Campos do modelo necessários para cada campo do serializer (usado no only())
+    CAMPOS_MODELO = {
+        'cadastrado_por': ['usuario_cadastro__username'],
+    }
+
+    class Meta:
+        model = PropriedadeRural
+        fields = [
+            'id', 'nome_propriedade', 'proprietario', 'cpf_cnpj', 'endereco', 'cidade', 'estado',
+            'area_hectares', 'agrotoxico_utilizado', 'nivel_impacto', 'descricao_impacto',
+            'data_identificacao', 'latitude', 'longitude', 'cadastrado_por',
+            'data_cadastro', 'data_atualizacao',
+        ]
+        read_only_fields = fields
+
+    def __init__(self, *args, campos=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if campos:
+            for nome in set(self.fields) - set(campos):
+                self.fields.pop(nome)
+
+    @classmethod
+    def campos_validos(cls, texto):
+        """Converte ?fields=a,b em lista, ignorando nomes desconhecidos (None = todos)"""
+        if not texto:
+            return None
+        campos = [campo.strip() for campo in texto.split(',')]
+        return [campo for campo in campos if campo in cls.Meta.fields] or None
+
+    @classmethod
+    def campos_modelo(cls, campos):
+        """Campos a carregar do banco para servir os campos pedidos"""
+        nomes = set()
+        for campo in campos or cls.Meta.fields:
+            nomes.update(cls.CAMPOS_MODELO.get(campo, [campo]))
+        return nomes
+
+
+class FiltroPropriedadesSerializer(serializers.Serializer):
+    """Filtro das operações em massa, com os mesmos critérios da listagem"""
+
+    nivel = serializers.ChoiceField(choices=[1, 2, 3], required=False, allow_null=True)
+    estado = serializers.RegexField(r'^[A-Za-z]{2}$', required=False, allow_null=True, allow_blank=True)
+    agrotoxico = serializers.IntegerField(min_value=1, required=False, allow_null=True)
+    search = serializers.CharField(required=False, allow_blank=True, default='')
+
+    def validate_estado(self, valor):
+        return valor.upper() if valor else None
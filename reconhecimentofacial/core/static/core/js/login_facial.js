@@ -19,6 +19,16 @@ document.addEventListener('DOMContentLoaded', function() {
     let detectionInterval = null;
     let isProcessing = false;
     let faceDetectedTime = null;
+    let socket = null;
+    // Caixa do rosto da última tentativa: o servidor detecta só em volta dela
+    let lastFaceBox = null;
+    let useStreaming = 'WebSocket' in window && Boolean(startCameraBtn.dataset.streamPath);
+
+    // Quadros pequenos para o reconhecimento ao vivo
+    const streamCanvas = document.createElement('canvas');
+    const streamContext = streamCanvas.getContext('2d');
+    streamCanvas.width = 320;
+    streamCanvas.height = 240;
 
     /**
      * Exibe mensagem de status com estilo
@@ -50,7 +60,11 @@ document.addEventListener('DOMContentLoaded', function() {
             
             // Aguardar vídeo estar pronto e iniciar detecção
             video.addEventListener('loadedmetadata', function() {
-                startFaceDetection();
+                if (useStreaming) {
+                    startStreaming();
+                } else {
+                    startFaceDetection();
+                }
             });
             
             showMessage('Câmera ativada! Posicione seu rosto no círculo para reconhecimento automático.', 'success');
@@ -60,6 +74,71 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     }
 
+    /**
+     * Reconhecimento ao vivo: envia quadros pequenos por WebSocket, um por vez
+     * (o próximo só depois da resposta do anterior). Se o servidor não aceitar
+     * a conexão, volta à captura por foto
+     */
+    function startStreaming() {
+        const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
+        let answered = false;
+
+        socket = new WebSocket(`${protocol}//${window.location.host}${startCameraBtn.dataset.streamPath}`);
+        socket.addEventListener('open', sendFrame);
+        socket.addEventListener('message', function(event) {
+            answered = true;
+            handleStreamMessage(JSON.parse(event.data));
+        });
+        socket.addEventListener('close', function() {
+            socket = null;
+            if (!answered && stream) {
+                // Servidor sem WebSocket (ex.: Gunicorn WSGI): login por foto
+                useStreaming = false;
+                startFaceDetection();
+            }
+        });
+    }
+
+    /**
+     * Envia o quadro atual da câmera em JPEG
+     */
+    function sendFrame() {
+        if (!socket || socket.readyState !== WebSocket.OPEN) return;
+        streamContext.drawImage(video, 0, 0, streamCanvas.width, streamCanvas.height);
+        streamCanvas.toBlob(function(blob) {
+            if (blob && socket && socket.readyState === WebSocket.OPEN) {
+                socket.send(blob);
+            }
+        }, 'image/jpeg', 0.7);
+    }
+
+    /**
+     * Trata o retorno do servidor para cada quadro
+     * @param {Object} data - estado, mensagem e, no reconhecimento, url e confianca
+     */
+    function handleStreamMessage(data) {
+        if (data.estado === 'reconhecido') {
+            showMessage(`✅ ${data.mensagem}<br>Confiança: ${data.confianca}<br>Redirecionando...`, 'success');
+            stopCamera();
+            // Conclui o login por HTTP (a sessão não passa pelo WebSocket)
+            window.location.href = data.url;
+            return;
+        }
+
+        if (data.estado === 'falha') {
+            showMessage(`❌ ${data.mensagem}`, 'error');
+            faceOverlay.classList.remove('face-detected');
+            tryAgainBtn.style.display = '';
+            return;
+        }
+
+        faceOverlay.classList.toggle('face-detected', data.estado === 'acompanhando');
+        showMessage(data.mensagem, data.estado === 'acompanhando' ? 'info' : 'warning');
+
+        // No máximo ~10 quadros por segundo
+        setTimeout(sendFrame, 100);
+    }
+
     /**
      * Inicia detecção contínua de rosto
      */
@@ -170,15 +249,20 @@ document.addEventListener('DOMContentLoaded', function() {
             const recognizeUrl = startCameraBtn.dataset.recognizeUrl;
 
             // Enviar imagem para o servidor
+            const params = new URLSearchParams({ foto_base64: imageData });
+            if (lastFaceBox) {
+                params.append('caixa_rosto', lastFaceBox.join(','));
+            }
             const response = await fetch(recognizeUrl, {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/x-www-form-urlencoded',
                 },
-                body: `foto_base64=${encodeURIComponent(imageData)}`
+                body: params.toString()
             });
 
             const data = await response.json();
+            lastFaceBox = data.caixa || null;
 
             processing.classList.remove('active');
 
@@ -230,6 +314,10 @@ document.addEventListener('DOMContentLoaded', function() {
      */
     function stopCamera() {
         stopFaceDetection();
+        if (socket) {
+            socket.close();
+            socket = null;
+        }
         if (stream) {
             stream.getTracks().forEach(track => track.stop());
             stream = null;
@@ -243,7 +331,11 @@ document.addEventListener('DOMContentLoaded', function() {
         tryAgainBtn.style.display = 'none';
         isProcessing = false;
         faceOverlay.classList.remove('face-detected');
-        startFaceDetection();
+        if (useStreaming) {
+            startStreaming();
+        } else {
+            startFaceDetection();
+        }
         showMessage('Posicione seu rosto no círculo para tentar novamente.', 'info');
     }
 
@@ -0,0 +1,21 @@
+from django import template
+
+register = template.Library()
+
+
+@register.inclusion_tag('core/partials/foto_perfil.html')
+def foto_perfil(perfil, tamanho='m', alt=''):
+    """
+    Foto do perfil na derivada pedida ('p', 'm' ou 'rosto'), em WebP com
+    JPEG como alternativa. Sem o recorte do rosto usa 'm'; sem derivadas
+    (foto recém-enviada ou ainda não processada) usa a foto original.
+    """
+    webp = jpeg = None
+    if perfil is not None and perfil.foto:
+        for chave in dict.fromkeys([tamanho, 'm']):
+            webp, jpeg = perfil.url_miniatura(f'{chave}.webp'), perfil.url_miniatura(f'{chave}.jpeg')
+            if jpeg:
+                break
+        else:
+            jpeg = perfil.foto.url
+    return {'webp': webp, 'jpeg': jpeg, 'alt': alt}
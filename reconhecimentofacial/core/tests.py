@@ -1,3 +1,1468 @@
-from django.test import TestCase
+import base64
+import csv
+import gzip
+import importlib.util
+import io
+import json
+import os
+import shutil
+import tempfile
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import date, timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import BACKEND_SESSION_KEY
+from django.contrib.auth.models import Group, User
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import connection
+from django.db.migrations.loader import MigrationLoader
+from django.db.models.signals import post_delete
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.template import Context, Template
+from django.urls import URLPattern, reverse
+from django.utils import timezone
+import numpy as np
+from PIL import Image, ImageFile
+
+from asgiref.testing import ApplicationCommunicator
+
+from . import urls
+from .ao_vivo import QUADROS_ESTAVEIS, SessaoAoVivo, gerar_token, reconhecimento_websocket, usuario_do_token
+from .armazenamento import CARENCIA_SEGUNDOS, armazenamento_fotos
+from .autenticacao import CAMINHO as CAMINHO_BACKEND
+from .cache import chave_cache, invalidar_propriedades, obter_ou_calcular
+from .carga import CAMPOS_IMPORTACAO
+from . import motores
+from .galeria import Galeria, versao_galeria
+from .imagens import FotoInvalida, carregar_rgb, codificar_jpeg, nome_derivada, normalizar_foto, salvar_derivadas
+from .models import (
+    AgregadoPropriedade, Agrotoxico, EstatisticaPropriedade, EstatisticaUsuario, FotoCapturada, PerfilUsuario,
+    PropriedadeRural, PropriedadeRuralArquivada, mover_propriedades,
+)
+from .middleware import ReplicaMiddleware
+from .operacoes import executar_em_massa
+from .permissoes import CHAVE_SESSAO
+from .reconhecimento import identificar, ler_regiao, para_original
+from .replicas import COOKIE_PRIMARIO, RoteadorReplicas, banco_leitura
+from .views import contar_facetas, ler_filtros_propriedades, montar_facetas
+
+# Rotas que dependem do face_recognition (dlib) para serem medidas
+ROTAS_RECONHECIMENTO = {'reconhecer_face', 'api_identificar_rostos'}
+
+CACHE_LOCAL = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'testes'}}
+
+# Os testes que acessam o banco leem sempre do principal (ver ReplicasTest)
+
+ESTADOS = ('SP', 'MG', 'PR', 'GO', 'MT')
+
+
+def criar_propriedades(usuarios, quantidade, inicio=0):
+    agrotoxicos = list(Agrotoxico.objects.all()[:4])
+    for i in range(inicio, inicio + quantidade):
+        agrotoxico = agrotoxicos[i % len(agrotoxicos)]
+        PropriedadeRural.objects.create(
+            nome_propriedade=f'Fazenda {i}',
+            proprietario=f'Proprietário {i}',
+            cpf_cnpj=f'{i:011d}',
+            endereco='Estrada Rural, km 10',
+            cidade='Cidade',
+            estado=ESTADOS[i % len(ESTADOS)],
+            area_hectares=10 + i,
+            agrotoxico_utilizado=agrotoxico.nome,
+            nivel_impacto=i % 3 + 1,
+            descricao_impacto='Descrição',
+            data_identificacao=date(2025, 1, 1) + timedelta(days=i * 3),
+            usuario_cadastro=usuarios[i % len(usuarios)],
+        )
+
+
+def criar_usuarios(quantidade, inicio=0):
+    usuarios = []
+    for i in range(inicio, inicio + quantidade):
+        usuario = User.objects.create_user(f'usuario{i}', f'usuario{i}@exemplo.gov.br', 'senha', first_name=f'Nome {i}')
+        usuario.perfil.tipo_perfil = ('COMUM', 'DIRETOR', 'MINISTRO')[i % 3]
+        usuario.perfil.telefone = f'(11) 9{i:04d}-0000'
+        usuario.perfil.save()
+        usuarios.append(usuario)
+    return usuarios
+
+
+def foto_base64(tamanho=(640, 480), cor=(120, 90, 60)):
+    buffer = io.BytesIO()
+    Image.new('RGB', tamanho, cor).save(buffer, 'JPEG')
+    return 'data:image/jpeg;base64,' + base64.b64encode(buffer.getvalue()).decode()
+
+
+def orcamento(callback):
+    """Orçamento declarado com @orcamento_consultas (nas classes, em view_class)"""
+    return getattr(getattr(callback, 'view_class', callback), 'orcamento_consultas', None)
+
+
+def criar_agrotoxicos():
+    for nome in ('Glifosato', 'Atrazina', '2,4-D', 'Mancozebe'):
+        Agrotoxico.objects.get_or_create(nome=nome)
+
+
+def assert_estatisticas_em_dia(teste):
+    """Tabelas consolidadas iguais às recalculadas a partir das propriedades e perfis"""
+    teste.assertEqual(EstatisticaPropriedade.armazenadas(), EstatisticaPropriedade.calcular())
+    teste.assertEqual(EstatisticaUsuario.armazenadas(), EstatisticaUsuario.calcular())
+    teste.assertEqual(AgregadoPropriedade.armazenadas(), AgregadoPropriedade.calcular())
+
+
+class EstatisticasTest(TestCase):
+    """Contadores do dashboard e agregados mantidos pelos sinais"""
+
+    @classmethod
+    def setUpTestData(cls):
+        criar_agrotoxicos()
+        cls.usuarios = criar_usuarios(3)
+        criar_propriedades(cls.usuarios, 12)
+
+    def test_cadastro(self):
+        assert_estatisticas_em_dia(self)
+        self.assertEqual(EstatisticaPropriedade.contar_ativas([1, 2, 3]), 12)
+        self.assertEqual(EstatisticaUsuario.contar_total(), 3)
+
+    def test_edicao_move_entre_contadores(self):
+        propriedade = PropriedadeRural.objects.filter(nivel_impacto=1).first()
+        propriedade.nivel_impacto = 3
+        propriedade.estado = 'RS'
+        propriedade.area_hectares = 99
+        propriedade.save()
+        assert_estatisticas_em_dia(self)
+
+        # Instância com campos adiados: o estado original vem do banco
+        parcial = PropriedadeRural.objects.only('id', 'ativo').get(pk=propriedade.pk)
+        parcial.ativo = False
+        parcial.save(update_fields=['ativo'])
+        assert_estatisticas_em_dia(self)
+        self.assertEqual(EstatisticaPropriedade.contar_ativas([1, 2, 3]), 11)
+
+    def test_exclusao(self):
+        PropriedadeRural.objects.first().delete()
+        self.usuarios[0].delete()
+        assert_estatisticas_em_dia(self)
+        self.assertEqual(EstatisticaPropriedade.contar_ativas([1, 2, 3]), 11)
+        self.assertEqual(EstatisticaUsuario.contar_total(), 2)
+
+    def test_troca_de_perfil(self):
+        perfil = self.usuarios[0].perfil
+        perfil.tipo_perfil = 'MINISTRO'
+        perfil.save()
+        assert_estatisticas_em_dia(self)
+
+
+class ImportacaoTest(TestCase):
+    """importar_propriedades: upsert pelo CPF/CNPJ e retomada sem repetir erros"""
+
+    def setUp(self):
+        criar_agrotoxicos()
+        self.pasta = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.pasta, ignore_errors=True)
+
+    def escrever_csv(self, niveis, nome='Fazenda'):
+        caminho = os.path.join(self.pasta, 'propriedades.csv')
+        with open(caminho, 'w', newline='', encoding='utf-8') as arquivo:
+            escritor = csv.writer(arquivo)
+            escritor.writerow(CAMPOS_IMPORTACAO)
+            for i, nivel in enumerate(niveis):
+                escritor.writerow([
+                    f'{nome} {i}', 'Proprietário', f'{i:011d}', 'Estrada', 'Cidade', 'SP', '12.5',
+                    'Glifosato', nivel, 'Descrição', '2025-03-01', '', '',
+                ])
+        return caminho
+
+    def importar(self, caminho, *opcoes):
+        call_command('importar_propriedades', caminho, *opcoes, stdout=io.StringIO())
+
+    def linhas_com_erro(self, caminho):
+        with open(caminho + '.erros.csv', newline='', encoding='utf-8') as arquivo:
+            return [linha[0] for linha in list(csv.reader(arquivo))[1:]]
+
+    def test_upsert_atualiza_pelo_documento(self):
+        self.importar(self.escrever_csv([1, 2, 3]))
+        self.importar(self.escrever_csv([3, 2, 1], nome='Sítio'), '--upsert')
+
+        self.assertEqual(PropriedadeRural.objects.count(), 3)
+        propriedade = PropriedadeRural.objects.get(cpf_cnpj=f'{0:011d}')
+        self.assertEqual((propriedade.nome_propriedade, propriedade.nivel_impacto), ('Sítio 0', 3))
+        self.assertIsNotNone(propriedade.agrotoxico_id)
+        assert_estatisticas_em_dia(self)
+
+    def test_retomada_nao_duplica_erros(self):
+        # Linhas 3 e 5 do arquivo (nível 9) são rejeitadas
+        caminho = self.escrever_csv([1, 9, 2, 9, 3])
+        self.importar(caminho, '--lote', '1', '--upsert')
+        self.assertEqual(self.linhas_com_erro(caminho), ['3', '5'])
+
+        # Interrompida depois do lote da linha 3: as seguintes são lidas de novo
+        with open(caminho + '.progresso', 'w') as progresso:
+            json.dump({'linha': 3}, progresso)
+        self.importar(caminho, '--lote', '1', '--upsert', '--retomar')
+
+        self.assertEqual(self.linhas_com_erro(caminho), ['3', '5'])
+        self.assertEqual(PropriedadeRural.objects.count(), 3)
+
+
+class GerarDadosCargaTest(TestCase):
+    """gerar_dados_carga: --limpar remove a carga anterior e as estatísticas batem"""
+
+    def gerar(self, *opcoes):
+        call_command('gerar_dados_carga', '--quantidade', '30', '--usuarios', '4', '--lote', '7', *opcoes,
+                     stdout=io.StringIO())
+
+    def test_limpar_e_gerar_novamente(self):
+        self.gerar()
+        self.gerar('--limpar', '--seed', '7')
+
+        self.assertEqual(PropriedadeRural.todos.count(), 30)
+        self.assertEqual(User.objects.count(), 4)
+        self.assertEqual(PerfilUsuario.objects.count(), 4)
+        assert_estatisticas_em_dia(self)
+
+    def test_limpar_sem_sinais_por_linha(self):
+        self.gerar()
+        # Dependências que os usuários de carga podem ter ganho depois de gerados
+        usuario = User.objects.filter(username__startswith='carga_').first()
+        usuario.groups.add(Group.objects.create(name='Carga'))
+        FotoCapturada.objects.create(usuario=usuario, nome='Carga', imagem='fotos_capturadas/carga.jpg')
+        removidos = mock.Mock()
+        for modelo in (User, PerfilUsuario, PropriedadeRural):
+            post_delete.connect(removidos, sender=modelo)
+            self.addCleanup(post_delete.disconnect, removidos, sender=modelo)
+
+        self.gerar('--limpar')
+
+        removidos.assert_not_called()
+        self.assertFalse(FotoCapturada.objects.exists())
+        self.assertEqual(PerfilUsuario.objects.count(), User.objects.count())
+        assert_estatisticas_em_dia(self)
+
+
+@override_settings(CACHES=CACHE_LOCAL, REPLICAS_LEITURA=[])
+class ExportacaoTest(TestCase):
+    """Exportação em fluxo: todas as linhas visíveis, em vários blocos, nos três formatos"""
+
+    def setUp(self):
+        cache.clear()
+
+    @classmethod
+    def setUpTestData(cls):
+        criar_agrotoxicos()
+        cls.usuarios = criar_usuarios(3)
+        criar_propriedades(cls.usuarios, 25)
+        cls.comum = cls.usuarios[0]
+        cls.ministro = cls.usuarios[2]
+
+    def exportar(self, usuario, **parametros):
+        self.client.force_login(usuario)
+        # Blocos pequenos para a resposta sair em vários pedaços
+        with mock.patch('core.exportacao.TAMANHO_BLOCO_SAIDA', 256):
+            response = self.client.get(reverse('propriedades_exportar'), parametros)
+            self.assertTrue(response.streaming)
+            blocos = list(response.streaming_content)
+        self.assertGreater(len(blocos), 1)
+        return response, b''.join(blocos)
+
+    def test_csv_respeita_niveis_visiveis(self):
+        response, conteudo = self.exportar(self.comum)
+        self.assertIn('propriedades.csv', response['Content-Disposition'])
+        linhas = list(csv.DictReader(io.StringIO(conteudo.decode('utf-8'))))
+
+        esperadas = PropriedadeRural.objects.filter(nivel_impacto=1)
+        self.assertEqual(sorted(int(linha['id']) for linha in linhas), sorted(esperadas.values_list('pk', flat=True)))
+        self.assertEqual({linha['nivel_impacto'] for linha in linhas}, {'1'})
+
+    def test_geojson_e_ndjson(self):
+        _, conteudo = self.exportar(self.ministro, formato='geojson', estado='SP')
+        colecao = json.loads(conteudo)
+        self.assertEqual(colecao['type'], 'FeatureCollection')
+        self.assertEqual(len(colecao['features']), 5)
+        self.assertTrue(all(feature['properties']['estado'] == 'SP' for feature in colecao['features']))
+
+        _, conteudo = self.exportar(self.ministro, formato='ndjson')
+        self.assertEqual(len([json.loads(linha) for linha in conteudo.decode('utf-8').splitlines()]), 25)
+
+    def test_gzip_igual_ao_original(self):
+        _, original = self.exportar(self.ministro, formato='ndjson')
+        response, comprimido = self.exportar(self.ministro, formato='ndjson', gzip='1')
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertEqual(gzip.decompress(comprimido), original)
+
+    def test_formato_invalido(self):
+        self.client.force_login(self.ministro)
+        self.assertEqual(self.client.get(reverse('propriedades_exportar'), {'formato': 'xml'}).status_code, 400)
+
+
+@override_settings(CACHES=CACHE_LOCAL, REPLICAS_LEITURA=[])
+class PropriedadesAPITest(TestCase):
+    """API v1: níveis visíveis, paginação por cursor, campos esparsos e GET condicional"""
+
+    def setUp(self):
+        cache.clear()
+
+    @classmethod
+    def setUpTestData(cls):
+        criar_agrotoxicos()
+        cls.usuarios = criar_usuarios(3)
+        criar_propriedades(cls.usuarios, 25)
+        cls.comum = cls.usuarios[0]
+        cls.ministro = cls.usuarios[2]
+
+    def test_cursor_percorre_tudo_sem_repetir(self):
+        originais = set(PropriedadeRural.objects.values_list('pk', flat=True))
+        self.client.force_login(self.ministro)
+        url, ids = reverse('api_propriedades_list') + '?page_size=10', []
+        while url:
+            dados = self.client.get(url).json()
+            ids += [item['id'] for item in dados['results']]
+            if len(ids) == 10:
+                # Inserções durante a navegação não deslocam as páginas seguintes
+                criar_propriedades(self.usuarios, 2, inicio=100)
+            url = dados['next']
+
+        self.assertEqual(len(ids), len(set(ids)))
+        self.assertEqual(set(ids), originais)
+
+    def test_niveis_visiveis(self):
+        self.client.force_login(self.comum)
+        dados = self.client.get(reverse('api_propriedades_list'), {'page_size': 100}).json()
+        self.assertEqual({item['nivel_impacto'] for item in dados['results']}, {1})
+
+        outra = PropriedadeRural.objects.filter(nivel_impacto=3).first()
+        self.assertEqual(self.client.get(reverse('api_propriedade_detail', args=[outra.pk])).status_code, 404)
+
+    def test_campos_esparsos(self):
+        self.client.force_login(self.ministro)
+        dados = self.client.get(reverse('api_propriedades_list'), {'fields': 'id,cadastrado_por,inexistente'}).json()
+        for item in dados['results']:
+            self.assertEqual(set(item), {'id', 'cadastrado_por'})
+            self.assertTrue(item['cadastrado_por'].startswith('usuario'))
+
+    def test_get_condicional(self):
+        self.client.force_login(self.ministro)
+        url = reverse('api_propriedades_list') + '?estado=SP'
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        # Alteração de uma propriedade do filtro muda o ETag
+        propriedade = PropriedadeRural.objects.filter(estado='SP').first()
+        propriedade.area_hectares += 1
+        propriedade.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+        detalhe = reverse('api_propriedade_detail', args=[propriedade.pk])
+        etag = self.client.get(detalhe)['ETag']
+        self.assertEqual(self.client.get(detalhe, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_atualizado_desde(self):
+        self.client.force_login(self.ministro)
+        url = reverse('api_propriedades_list')
+        self.assertEqual(len(self.client.get(url, {'atualizado_desde': '2000-01-01'}).json()['results']), 25)
+        self.assertEqual(self.client.get(url, {'atualizado_desde': '2999-01-01T00:00:00Z'}).json()['results'], [])
+        for invalido in ('abc', '2025-13-01'):
+            with self.subTest(atualizado_desde=invalido):
+                response = self.client.get(url, {'atualizado_desde': invalido})
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('atualizado_desde', response.json())
+
+
+@override_settings(CACHES=CACHE_LOCAL, REPLICAS_LEITURA=[])
+class PaginasDetalheCondicionaisTest(TestCase):
+    """Páginas de detalhe com ETag/Last-Modified: 304 até o registro ou o visitante mudar"""
+
+    def setUp(self):
+        cache.clear()
+
+    @classmethod
+    def setUpTestData(cls):
+        criar_agrotoxicos()
+        cls.usuarios = criar_usuarios(3)
+        criar_propriedades(cls.usuarios, 3)
+        cls.diretor = cls.usuarios[1]
+        cls.ministro = cls.usuarios[2]
+        cls.propriedade = PropriedadeRural.objects.get(nivel_impacto=1)
+
+    def assert_revalidacao(self, url, alterar):
+        """304 com o ETag recebido; 200 e outro ETag depois de alterar()"""
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('private', response['Cache-Control'])
+        etag = response['ETag']
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(
+            self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 304
+        )
+
+        # Os caches do usuário e das páginas são invalidados após o commit
+        with self.captureOnCommitCallbacks(execute=True):
+            alterar()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_propriedade_alterada(self):
+        self.client.force_login(self.ministro)
+
+        def alterar():
+            self.propriedade.descricao_impacto = 'Nova descrição'
+            self.propriedade.save()
+
+        self.assert_revalidacao(reverse('propriedade_detail', args=[self.propriedade.pk]), alterar)
+
+    def test_visitante_alterado(self):
+        self.client.force_login(self.diretor)
+
+        def alterar():
+            self.diretor.first_name = 'Outro nome'
+            self.diretor.save()
+
+        self.assert_revalidacao(reverse('propriedade_detail', args=[self.propriedade.pk]), alterar)
+
+    def test_usuario_alterado(self):
+        self.client.force_login(self.ministro)
+        perfil = self.usuarios[0].perfil
+
+        def alterar():
+            perfil.telefone = '(11) 91234-5678'
+            perfil.save()
+
+        self.assert_revalidacao(reverse('usuario_detail', args=[self.usuarios[0].pk]), alterar)
+
+    def test_visitantes_diferentes(self):
+        url = reverse('propriedade_detail', args=[self.propriedade.pk])
+        self.client.force_login(self.ministro)
+        etag = self.client.get(url)['ETag']
+        self.client.force_login(self.diretor)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+@override_settings(CACHES=CACHE_LOCAL, CACHE_COMPARTILHADO=True, REPLICAS_LEITURA=[])
+class CachePropriedadesTest(TestCase):
+    """Páginas de propriedades em cache por conjunto de níveis, com versão invalidada após o commit"""
+
+    def setUp(self):
+        cache.clear()
+
+    @classmethod
+    def setUpTestData(cls):
+        criar_agrotoxicos()
+        cls.usuarios = criar_usuarios(3)
+        criar_propriedades(cls.usuarios, 6)
+        cls.diretor = cls.usuarios[1]
+        cls.ministro = cls.usuarios[2]
+        cls.propriedade = PropriedadeRural.objects.filter(nivel_impacto=1).order_by('pk').first()
+
+    def test_chaves_versionadas_por_conjunto_de_niveis(self):
+        chave = chave_cache('lista', [2, 1], 'busca')
+        self.assertEqual(chave, chave_cache('lista', [1, 2], 'busca'))
+        self.assertNotEqual(chave, chave_cache('lista', [1], 'busca'))
+        invalidar_propriedades()
+        self.assertNotEqual(chave, chave_cache('lista', [1, 2], 'busca'))
+
+        calcular = mock.Mock(side_effect=lambda: calcular.call_count)
+        self.assertEqual(obter_ou_calcular('total', [1], (), calcular), 1)
+        self.assertEqual(obter_ou_calcular('total', [1, 2], (), calcular), 2)
+        self.assertEqual(obter_ou_calcular('total', [1], (), calcular), 1)
+        invalidar_propriedades()
+        self.assertEqual(obter_ou_calcular('total', [1], (), calcular), 3)
+
+    def test_invalidacao_apos_o_commit(self):
+        self.client.force_login(self.diretor)
+        self.assertIn(self.propriedade.nome_propriedade, self.client.get(reverse('propriedades_list')).context['tabela'])
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.propriedade.nome_propriedade = 'Fazenda Renomeada'
+            self.propriedade.save()
+        # Antes do commit as páginas prontas continuam valendo
+        self.assertNotIn('Fazenda Renomeada', self.client.get(reverse('propriedades_list')).context['tabela'])
+        for callback in callbacks:
+            callback()
+        self.assertIn('Fazenda Renomeada', self.client.get(reverse('propriedades_list')).context['tabela'])
+
+    @contextmanager
+    def alteracao(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            yield
+
+    def assert_paginas_em_dia(self):
+        """Listagem, facetas, dashboard e detalhe do diretor iguais ao banco"""
+        visiveis = PropriedadeRural.objects.filter(nivel_impacto__in=[1, 2])
+        lista = self.client.get(reverse('propriedades_list'))
+        for propriedade in PropriedadeRural.todos.all():
+            with self.subTest(propriedade=propriedade.nome_propriedade):
+                if propriedade in visiveis:
+                    self.assertIn(propriedade.nome_propriedade, lista.context['tabela'])
+                else:
+                    self.assertNotIn(propriedade.nome_propriedade, lista.context['tabela'])
+        niveis = dict(lista.context['facetas'])['Nível']
+        self.assertEqual(
+            {item['rotulo']: item['total'] for item in niveis},
+            {f'Nível {nivel}': total for nivel, total in Counter(visiveis.values_list('nivel_impacto', flat=True)).items()},
+        )
+
+        inicio = self.client.get(reverse('index'))
+        self.assertEqual(inicio.context['total_propriedades'], visiveis.count())
+        self.assertEqual(
+            [p.pk for p in inicio.context['ultimas_propriedades']],
+            list(visiveis.order_by('-data_cadastro').values_list('pk', flat=True)[:5]),
+        )
+
+        detalhe = self.client.get(reverse('propriedade_detail', args=[self.propriedade.pk]))
+        propriedade = PropriedadeRural.todos.get(pk=self.propriedade.pk)
+        if propriedade in visiveis:
+            self.assertContains(detalhe, propriedade.nome_propriedade)
+        else:
+            self.assertNotEqual(detalhe.status_code, 200)
+
+    def assert_paginas_acompanham_gravacoes(self):
+        self.client.force_login(self.diretor)
+        self.assert_paginas_em_dia()
+
+        with self.alteracao():
+            criar_propriedades(self.usuarios, 1, inicio=6)
+        self.assert_paginas_em_dia()
+
+        with self.alteracao():
+            self.propriedade.nome_propriedade = 'Fazenda Renomeada'
+            self.propriedade.save()
+        self.assert_paginas_em_dia()
+
+        with self.alteracao():
+            desativada = PropriedadeRural.objects.filter(nivel_impacto=2).first()
+            desativada.ativo = False
+            desativada.save()
+        self.assert_paginas_em_dia()
+
+        # Do nível 1 para o 3: some das páginas do diretor
+        with self.alteracao():
+            executar_em_massa(self.ministro, PropriedadeRural.objects.filter(nivel_impacto=1), 'nivel', 3)
+        self.assert_paginas_em_dia()
+
+    def test_paginas_acompanham_gravacoes(self):
+        self.assert_paginas_acompanham_gravacoes()
+
+    @override_settings(CACHE_COMPARTILHADO=False)
+    def test_sem_cache_compartilhado_paginas_nao_dependem_da_invalidacao(self):
+        # A invalidação feita pelo worker que gravou não chega aos outros
+        with mock.patch('core.models.invalidar_propriedades'), mock.patch('core.operacoes.invalidar_propriedades'):
+            self.assert_paginas_acompanham_gravacoes()
+
+
+class FacetasAgrotoxicosTest(TestCase):
+    """Catálogo de agrotóxicos e facetas da listagem de propriedades"""
+
+    @classmethod
+    def setUpTestData(cls):
+        criar_agrotoxicos()
+        cls.usuarios = criar_usuarios(3)
+        criar_propriedades(cls.usuarios, 15)
+
+    def facetas(self, parametros):
+        request = RequestFactory().get(reverse('propriedades_list'), parametros)
+        filtros = ler_filtros_propriedades(request)
+        return {
+            titulo: {item['rotulo']: item['total'] for item in itens}
+            for titulo, itens in montar_facetas(request, contar_facetas([1, 2, 3]), filtros)
+        }
+
+    def esperadas(self, selecionados):
+        """Cada faceta conta as propriedades que atendem aos filtros das outras"""
+        linhas = PropriedadeRural.objects.values_list('agrotoxico__nome', 'nivel_impacto', 'estado')
+        esperadas = {}
+        for posicao, (titulo, rotulo) in enumerate(
+            (('Agrotóxico', str), ('Nível', lambda nivel: f'Nível {nivel}'), ('Estado', str))
+        ):
+            esperadas[titulo] = dict(Counter(
+                rotulo(linha[posicao]) for linha in linhas
+                if all(valor is None or linha[outra] == valor
+                       for outra, valor in enumerate(selecionados) if outra != posicao)
+            ))
+        return esperadas
+
+    def test_facetas_sob_cada_filtro(self):
+        glifosato = Agrotoxico.objects.get(nome='Glifosato')
+        casos = [
+            ({}, (None, None, None)),
+            ({'estado': 'sp'}, (None, None, 'SP')),
+            ({'nivel': '2'}, (None, 2, None)),
+            ({'agrotoxico': glifosato.pk}, ('Glifosato', None, None)),
+            ({'estado': 'MG', 'nivel': '1', 'agrotoxico': glifosato.pk}, ('Glifosato', 1, 'MG')),
+        ]
+        for parametros, selecionados in casos:
+            with self.subTest(parametros=parametros):
+                self.assertEqual(self.facetas(parametros), self.esperadas(selecionados))
+
+        # A faceta ignora o próprio filtro: os outros estados continuam contados
+        self.assertEqual(sum(self.facetas({'estado': 'SP'})['Estado'].values()), 15)
+        self.assertEqual(sum(self.facetas({'estado': 'SP'})['Nível'].values()), 3)
+
+    def test_grafias_resolvem_para_o_mesmo_agrotoxico(self):
+        glifosato = Agrotoxico.objects.get(nome='Glifosato')
+        for grafia in ('Glifosato', '  glifosato ', 'GLIFOSATO', 'Glifosáto'):
+            with self.subTest(grafia=grafia):
+                self.assertEqual(Agrotoxico.resolver(grafia), glifosato.pk)
+        self.assertIsNone(Agrotoxico.resolver('  '))
+
+        ids = Agrotoxico.mapear(['Produto Novo', 'produto   NOVO', 'Glifosato', ''])
+        self.assertEqual(ids, {'produto novo': ids['produto novo'], 'glifosato': glifosato.pk})
+        self.assertEqual(Agrotoxico.objects.get(pk=ids['produto novo']).nome, 'Produto Novo')
+
+    def test_save_vincula_e_revincula_ao_mudar_o_texto(self):
+        propriedade = PropriedadeRural.objects.order_by('pk').first()
+        propriedade.agrotoxico_utilizado = 'ATRAZINA'
+        propriedade.save()
+        self.assertEqual(PropriedadeRural.objects.get(pk=propriedade.pk).agrotoxico.nome, 'Atrazina')
+
+        propriedade = PropriedadeRural.objects.get(pk=propriedade.pk)
+        propriedade.agrotoxico_utilizado = 'Clorpirifós'
+        propriedade.save(update_fields=['agrotoxico_utilizado'])
+        self.assertEqual(PropriedadeRural.objects.get(pk=propriedade.pk).agrotoxico.nome, 'Clorpirifós')
+
+        # Texto igual: o vínculo não é recalculado
+        propriedade = PropriedadeRural.objects.get(pk=propriedade.pk)
+        with mock.patch.object(Agrotoxico, 'resolver') as resolver:
+            propriedade.descricao_impacto = 'Outra descrição'
+            propriedade.save()
+        resolver.assert_not_called()
+
+    def test_migracao_0009_popula_o_catalogo(self):
+        migracao = importlib.import_module('core.migrations.0009_catalogo_agrotoxicos')
+        historico = MigrationLoader(connection).project_state(('core', '0009_catalogo_agrotoxicos')).apps
+        PropriedadeRural.todos.filter(pk=PropriedadeRural.objects.order_by('pk').first().pk).update(
+            agrotoxico_utilizado=' glifosáto'
+        )
+        PropriedadeRural.todos.update(agrotoxico=None)
+        Agrotoxico.objects.all().delete()
+
+        migracao.popular_catalogo(historico, None)
+
+        self.assertEqual(Agrotoxico.objects.filter(nome_normalizado='glifosato').count(), 1)
+        self.assertTrue(Agrotoxico.objects.filter(nome='Paraquat').exists())
+        for propriedade in PropriedadeRural.todos.select_related('agrotoxico'):
+            with self.subTest(propriedade=propriedade.pk):
+                self.assertEqual(
+                    propriedade.agrotoxico.nome_normalizado, Agrotoxico.normalizar(propriedade.agrotoxico_utilizado)
+                )
+
+
+@override_settings(CACHES=CACHE_LOCAL, REPLICAS_LEITURA=[])
+class AnalisePropriedadesTest(TestCase):
+    """API de análise: agregados iguais às contagens diretas nas propriedades"""
+
+    def setUp(self):
+        cache.clear()
+
+    @classmethod
+    def setUpTestData(cls):
+        criar_agrotoxicos()
+        cls.usuarios = criar_usuarios(3)
+        criar_propriedades(cls.usuarios, 25)
+        cls.comum = cls.usuarios[0]
+        cls.ministro = cls.usuarios[2]
+
+    def analisar(self, usuario, **parametros):
+        self.client.force_login(usuario)
+        return self.client.get(reverse('api_analytics_propriedades'), parametros)
+
+    def esperado(self, niveis, inicio=date.min, fim=date.max):
+        """{(estado, início do mês): (total, área)} contado direto nas propriedades"""
+        contagem = {}
+        for propriedade in PropriedadeRural.objects.filter(nivel_impacto__in=niveis):
+            mes = propriedade.data_identificacao.replace(day=1)
+            if inicio <= mes <= fim:
+                total, area = contagem.get((propriedade.estado, mes), (0, 0))
+                contagem[(propriedade.estado, mes)] = (total + 1, area + float(propriedade.area_hectares))
+        return contagem
+
+    def resultados(self, response):
+        self.assertEqual(response.status_code, 200)
+        return {
+            (linha['estado'], date.fromisoformat(linha['periodo'])): (linha['total'], float(linha['area_total']))
+            for linha in response.json()['resultados']
+        }
+
+    def test_por_estado_e_mes(self):
+        response = self.analisar(self.ministro, agrupar='estado,periodo', periodo='mes')
+        self.assertEqual(self.resultados(response), self.esperado([1, 2, 3]))
+
+    def test_intervalo_e_niveis_visiveis(self):
+        response = self.analisar(self.comum, agrupar='estado,periodo', inicio='2025-02', fim='2025-03-31')
+        self.assertEqual(self.resultados(response), self.esperado([1], date(2025, 2, 1), date(2025, 3, 31)))
+
+    def test_acompanha_edicao(self):
+        propriedade = PropriedadeRural.objects.filter(nivel_impacto=2).first()
+        propriedade.estado = 'RS'
+        propriedade.save()
+        response = self.analisar(self.ministro, agrupar='estado,periodo')
+        self.assertEqual(self.resultados(response), self.esperado([1, 2, 3]))
+
+    def test_parametros_invalidos(self):
+        for parametro, valor in (('inicio', '2025-13'), ('fim', 'abc'), ('inicio', '2025-02-30'),
+                                 ('agrupar', 'cidade'), ('periodo', 'ano'), ('nivel', '4')):
+            with self.subTest(**{parametro: valor}):
+                response = self.analisar(self.ministro, **{parametro: valor})
+                self.assertEqual(response.status_code, 400)
+                self.assertIn(parametro, response.json())
+
+
+class ArquivamentoTest(TestCase):
+    """arquivar_propriedades: ida e volta pelo arquivo sem perder linhas nem contagens"""
+
+    @classmethod
+    def setUpTestData(cls):
+        criar_agrotoxicos()
+        cls.usuarios = criar_usuarios(3)
+        criar_propriedades(cls.usuarios, 12)
+
+    def desativar(self, propriedades, dias):
+        for propriedade in propriedades:
+            propriedade.ativo = False
+            propriedade.save()
+        PropriedadeRural.todos.filter(pk__in=[p.pk for p in propriedades]).update(
+            data_atualizacao=timezone.now() - timedelta(days=dias)
+        )
+
+    def arquivar(self, *opcoes):
+        call_command('arquivar_propriedades', *opcoes, stdout=io.StringIO())
+
+    def test_ida_e_volta(self):
+        propriedades = list(PropriedadeRural.objects.order_by('pk'))
+        self.desativar(propriedades[:5], dias=200)
+        self.desativar(propriedades[5:7], dias=10)
+        antigas = [p.pk for p in propriedades[:5]]
+
+        self.arquivar('--dias', '180', '--lote', '2')
+        self.assertEqual(sorted(PropriedadeRuralArquivada.objects.values_list('pk', flat=True)), antigas)
+        self.assertEqual(PropriedadeRural.todos.count(), 7)
+        self.assertEqual(PropriedadeRural.todos.filter(ativo=False).count(), 2)
+        assert_estatisticas_em_dia(self)
+
+        self.arquivar('--restaurar', *map(str, antigas[:3]))
+        self.arquivar('--restaurar', *map(str, antigas[3:]), '--reativar')
+        self.assertFalse(PropriedadeRuralArquivada.objects.exists())
+        self.assertEqual(PropriedadeRural.todos.count(), 12)
+        self.assertEqual(EstatisticaPropriedade.contar_ativas([1, 2, 3]), 7)
+        restaurada = PropriedadeRural.todos.get(pk=antigas[0])
+        self.assertEqual(restaurada.data_cadastro, propriedades[0].data_cadastro)
+        assert_estatisticas_em_dia(self)
+
+    def test_desativadas_no_dumpdata_e_no_admin(self):
+        desativada = PropriedadeRural.objects.order_by('pk').first()
+        self.desativar([desativada], dias=1)
+
+        saida = io.StringIO()
+        call_command('dumpdata', 'core.propriedaderural', stdout=saida)
+        self.assertIn(desativada.pk, [linha['pk'] for linha in json.loads(saida.getvalue())])
+        self.assertEqual(len(json.loads(saida.getvalue())), 12)
+
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@exemplo.gov.br', 'senha'))
+        response = self.client.get(reverse('admin:core_propriedaderural_changelist'))
+        self.assertEqual(response.context['cl'].result_count, 12)
+        response = self.client.get(reverse('admin:core_propriedaderural_change', args=[desativada.pk]))
+        self.assertEqual(response.status_code, 200)
+
+
+@override_settings(CACHES=CACHE_LOCAL, REPLICAS_LEITURA=[])
+class OperacoesEmMassaTest(TestCase):
+    """Operações em massa: contagens ajustadas por lote, permissões e validação do filtro"""
+
+    def setUp(self):
+        cache.clear()
+
+    @classmethod
+    def setUpTestData(cls):
+        criar_agrotoxicos()
+        cls.usuarios = criar_usuarios(3)
+        criar_propriedades(cls.usuarios, 30)
+        cls.comum, cls.diretor, cls.ministro = cls.usuarios
+
+    def em_massa(self, usuario, dados):
+        self.client.force_login(usuario)
+        return self.client.post(reverse('api_propriedades_em_massa'), json.dumps(dados), content_type='application/json')
+
+    def test_nivel_por_filtro(self):
+        esperadas = PropriedadeRural.objects.filter(estado='SP').count()
+        response = self.em_massa(self.ministro, {'operacao': 'nivel', 'valor': 3, 'filtro': {'estado': 'sp'}})
+        self.assertEqual(response.json(), {'operacao': 'nivel', 'alteradas': esperadas})
+        self.assertEqual(set(PropriedadeRural.objects.filter(estado='SP').values_list('nivel_impacto', flat=True)), {3})
+        assert_estatisticas_em_dia(self)
+
+    def test_lotes_com_sobreposicao_de_chaves(self):
+        # Lotes pequenos: vários ajustes seguidos nos mesmos contadores e baldes
+        propriedades = PropriedadeRural.objects.filter(nivel_impacto__in=[1, 2])
+        alteradas = executar_em_massa(self.diretor, propriedades, 'desativar', tamanho_lote=4)
+        self.assertEqual(alteradas, 20)
+        self.assertEqual(EstatisticaPropriedade.contar_ativas([1, 2, 3]), 10)
+        assert_estatisticas_em_dia(self)
+
+        alteradas = executar_em_massa(self.ministro, PropriedadeRural.objects.all(), 'reatribuir', self.comum.pk, 7)
+        self.assertEqual(alteradas, 10)
+        self.assertEqual(set(PropriedadeRural.objects.values_list('usuario_cadastro', flat=True)), {self.comum.pk})
+        assert_estatisticas_em_dia(self)
+
+    def test_propriedade_que_muda_de_nivel_entre_lotes(self):
+        # Filtro por ids, como na API: a paginação dos lotes não olha o nível
+        ids = PropriedadeRural.objects.filter(nivel_impacto__in=[1, 2]).values_list('pk', flat=True)
+        propriedades = PropriedadeRural.objects.filter(pk__in=list(ids))
+        ultima = propriedades.order_by('pk').last()
+
+        def outro_usuario_reclassifica(*args):
+            # Durante o primeiro lote, outro usuário leva a última propriedade ao nível 3
+            mover.side_effect = None
+            ultima.nivel_impacto = 3
+            ultima.save()
+            return mover_propriedades(*args)
+
+        with mock.patch('core.operacoes.mover_propriedades', wraps=mover_propriedades) as mover:
+            mover.side_effect = outro_usuario_reclassifica
+            alteradas = executar_em_massa(self.diretor, propriedades, 'desativar', tamanho_lote=4)
+
+        self.assertEqual(alteradas, 19)
+        self.assertTrue(PropriedadeRural.objects.filter(pk=ultima.pk, nivel_impacto=3).exists())
+        assert_estatisticas_em_dia(self)
+
+    def test_permissoes(self):
+        ids = list(PropriedadeRural.objects.filter(nivel_impacto=1).values_list('pk', flat=True))
+        self.assertEqual(self.em_massa(self.comum, {'operacao': 'desativar', 'ids': ids}).status_code, 403)
+        # Diretor não classifica no nível 3
+        response = self.em_massa(self.diretor, {'operacao': 'nivel', 'valor': 3, 'ids': ids})
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(EstatisticaPropriedade.contar_ativas([1]), 10)
+        assert_estatisticas_em_dia(self)
+
+    def test_filtro_invalido(self):
+        for filtro in ({'agrotoxico': 'abc'}, {'nivel': 5}, {'estado': 'XYZ'}, 'abc'):
+            with self.subTest(filtro=filtro):
+                response = self.em_massa(self.ministro, {'operacao': 'desativar', 'filtro': filtro})
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('filtro', response.json())
+        self.assertEqual(EstatisticaPropriedade.contar_ativas([1, 2, 3]), 30)
+
+
+@override_settings(
+    CACHES=CACHE_LOCAL, CACHE_COMPARTILHADO=True, REPLICAS_LEITURA=[],
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+)
+class OrcamentoConsultasTest(TestCase):
+    """
+    Cada rota de core.urls declara um orçamento de consultas e o respeita.
+    As medições são de uma sessão já em uso (permissões guardadas na sessão)
+    com o cache de propriedades invalidado, ou seja, sem páginas prontas, e
+    com várias páginas de dados (de todos os níveis e estados) em cada lista.
+    """
+
+    def setUp(self):
+        cache.clear()
+
+    @classmethod
+    def setUpTestData(cls):
+        criar_agrotoxicos()
+        cls.admin = User.objects.create_user('admin', 'admin@exemplo.gov.br', 'senha', is_staff=True)
+        cls.ministro = User.objects.create_user('ministro', 'ministro@exemplo.gov.br', 'senha')
+        cls.ministro.perfil.tipo_perfil = 'MINISTRO'
+        cls.ministro.perfil.save()
+        # Cinco páginas da API (50 por página) e 25 da listagem; seis de usuários
+        cls.usuarios = criar_usuarios(60)
+        criar_propriedades(cls.usuarios, 250)
+        cls.propriedade = PropriedadeRural.objects.order_by('pk').first()
+        cls.usuario = cls.usuarios[0]
+
+    def requisicoes(self):
+        """(nome da rota, usuário logado ou None, método, url, dados) a medir"""
+        propriedade, usuario = self.propriedade.pk, self.usuario.pk
+        return [
+            ('index', self.admin, 'get', reverse('index'), None),
+            ('index', self.ministro, 'get', reverse('index'), None),
+            ('login', None, 'get', reverse('login'), None),
+            ('login', None, 'post', reverse('login'), {'username': 'ministro', 'password': 'senha'}),
+            ('login_facial', None, 'get', reverse('login_facial'), None),
+            ('login_facial_confirmar', None, 'get',
+             reverse('login_facial_confirmar') + '?token=' + gerar_token(self.ministro), None),
+            ('reconhecer_face', None, 'post', reverse('reconhecer_face'), {}),
+            ('logout', self.ministro, 'get', reverse('logout'), None),
+            ('propriedades_list', self.ministro, 'get', reverse('propriedades_list') + '?page=2', None),
+            ('propriedades_list', self.ministro, 'get', reverse('propriedades_list') + '?search=Fazenda&estado=SP', None),
+            ('propriedades_exportar', self.ministro, 'get', reverse('propriedades_exportar') + '?formato=geojson', None),
+            ('propriedade_create', self.ministro, 'get', reverse('propriedade_create'), None),
+            ('propriedade_detail', self.ministro, 'get', reverse('propriedade_detail', args=[propriedade]), None),
+            ('propriedade_update', self.ministro, 'get', reverse('propriedade_update', args=[propriedade]), None),
+            ('propriedade_delete', self.ministro, 'get', reverse('propriedade_delete', args=[propriedade]), None),
+            ('usuarios_list', self.ministro, 'get', reverse('usuarios_list') + '?page=2', None),
+            ('usuarios_list', self.ministro, 'get', reverse('usuarios_list') + '?search=usuario', None),
+            ('usuario_create', None, 'get', reverse('usuario_create'), None),
+            ('usuario_create', self.ministro, 'get', reverse('usuario_create'), None),
+            ('usuario_detail', self.ministro, 'get', reverse('usuario_detail', args=[usuario]), None),
+            ('usuario_update', self.admin, 'get', reverse('usuario_update', args=[usuario]), None),
+            ('usuario_delete', self.admin, 'get', reverse('usuario_delete', args=[usuario]), None),
+            ('api_propriedades_list', self.ministro, 'get', reverse('api_propriedades_list') + '?page_size=20', None),
+            ('api_propriedades_list', self.ministro, 'get',
+             reverse('api_propriedades_list') + '?fields=id,nome_propriedade,cadastrado_por', None),
+            ('api_propriedades_em_massa', self.ministro, 'post', reverse('api_propriedades_em_massa'),
+             {'operacao': 'nivel', 'valor': 3, 'filtro': {'estado': 'SP'}}),
+            ('api_propriedade_detail', self.ministro, 'get', reverse('api_propriedade_detail', args=[propriedade]), None),
+            ('api_analytics_propriedades', self.ministro, 'get',
+             reverse('api_analytics_propriedades') + '?agrupar=estado,periodo&periodo=mes', None),
+            ('api_identificar_rostos', self.ministro, 'post', reverse('api_identificar_rostos'),
+             {'foto_base64': foto_base64()}),
+        ]
+
+    def medir(self, usuario, metodo, url, dados):
+        if usuario is not None:
+            self.client.force_login(usuario)
+            self.client.get(reverse('index'))
+        else:
+            self.client.logout()
+        invalidar_propriedades()
+        with CaptureQueriesContext(connection) as consultas:
+            if metodo == 'post' and url.startswith('/api/'):
+                response = self.client.post(url, json.dumps(dados), content_type='application/json')
+            else:
+                response = getattr(self.client, metodo)(url, dados)
+            # Respostas em fluxo só consultam o banco ao serem consumidas
+            if response.streaming:
+                b''.join(response.streaming_content)
+        self.assertLess(response.status_code, 500, url)
+        return len(consultas)
+
+    def test_todas_as_rotas_tem_orcamento(self):
+        for padrao in urls.urlpatterns:
+            self.assertIsInstance(padrao, URLPattern)
+            with self.subTest(rota=padrao.name):
+                self.assertIsNotNone(orcamento(padrao.callback), 'sem @orcamento_consultas')
+
+    def test_todas_as_rotas_sao_medidas(self):
+        medidas = {nome for nome, *_ in self.requisicoes()}
+        self.assertEqual(medidas, {padrao.name for padrao in urls.urlpatterns})
+
+    def test_consultas_dentro_do_orcamento(self):
+        callbacks = {padrao.name: padrao.callback for padrao in urls.urlpatterns}
+        for nome, usuario, metodo, url, dados in self.requisicoes():
+            with self.subTest(rota=nome, url=url, metodo=metodo):
+                if nome in ROTAS_RECONHECIMENTO and importlib.util.find_spec('face_recognition') is None:
+                    self.skipTest('face_recognition não está instalado')
+                maximo = orcamento(callbacks[nome])
+                self.assertLessEqual(self.medir(usuario, metodo, url, dados), maximo)
+
+    def test_campos_esparsos_medidos_existem(self):
+        # Os campos pedidos são todos devolvidos: nenhum foi ignorado como desconhecido
+        self.client.force_login(self.ministro)
+        for nome, _, _, url, _ in self.requisicoes():
+            if nome == 'api_propriedades_list' and 'fields=' in url:
+                pedidos = set(url.split('fields=')[1].split(','))
+                for item in self.client.get(url).json()['results']:
+                    self.assertEqual(set(item), pedidos)
+                    self.assertIsNotNone(item['cadastrado_por'])
+
+    def test_custo_das_listas_nao_depende_do_volume(self):
+        listas = [
+            (nome, usuario, url) for nome, usuario, metodo, url, _ in self.requisicoes()
+            if nome in ('index', 'propriedades_list', 'propriedades_exportar', 'usuarios_list', 'api_propriedades_list')
+        ]
+        antes = [self.medir(usuario, 'get', url, None) for _, usuario, url in listas]
+
+        # Três vezes mais propriedades e o dobro de usuários
+        criar_propriedades(self.usuarios + criar_usuarios(60, inicio=60), 500, inicio=250)
+        self.assertEqual(PropriedadeRural.objects.count(), 750)
+
+        for (nome, usuario, url), consultas in zip(listas, antes):
+            with self.subTest(rota=nome, url=url, usuario=usuario.username):
+                self.assertEqual(self.medir(usuario, 'get', url, None), consultas)
+
+
+@override_settings(CACHES=CACHE_LOCAL, CACHE_COMPARTILHADO=True, REPLICAS_LEITURA=[])
+class ContextoPermissoesTest(TestCase):
+    """Permissões resolvidas uma vez, guardadas na sessão e invalidadas ao mudar o perfil"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user('diretor', 'diretor@exemplo.gov.br', 'senha')
+        cls.usuario.perfil.tipo_perfil = 'DIRETOR'
+        cls.usuario.perfil.save()
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.usuario)
+
+    def test_sessao_dispensa_o_perfil(self):
+        self.client.get(reverse('propriedades_list'))
+        self.assertEqual(self.client.session[CHAVE_SESSAO]['dados']['niveis_visualizacao'], [1, 2])
+
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(reverse('propriedades_list'))
+        self.assertEqual(response.context['permissoes'].niveis_visualizacao, (1, 2))
+        self.assertFalse(any('core_perfilusuario' in consulta['sql'] for consulta in consultas))
+
+    def test_mudanca_de_perfil_invalida_a_sessao(self):
+        self.client.get(reverse('index'))
+        perfil = User.objects.get(pk=self.usuario.pk).perfil
+        perfil.tipo_perfil = 'COMUM'
+        with self.captureOnCommitCallbacks(execute=True):
+            perfil.save()
+
+        response = self.client.get(reverse('propriedades_list'))
+        self.assertEqual(response.context['permissoes'].niveis_visualizacao, (1,))
+        self.assertFalse(response.context['permissoes'].pode_criar_propriedades)
+
+    @override_settings(CACHE_COMPARTILHADO=False)
+    def test_cache_por_processo_nao_usa_a_sessao(self):
+        # A versão que invalida a sessão ficaria só no worker que a incrementou
+        response = self.client.get(reverse('propriedades_list'))
+        self.assertEqual(response.context['permissoes'].niveis_visualizacao, (1, 2))
+        self.assertNotIn(CHAVE_SESSAO, self.client.session)
+
+
+@override_settings(CACHES=CACHE_LOCAL, CACHE_COMPARTILHADO=True, REPLICAS_LEITURA=[])
+class BackendUsuarioEmCacheTest(TestCase):
+    """Usuário e perfil vêm do cache até serem alterados"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user('comum', 'comum@exemplo.gov.br', 'senha')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.usuario)
+        self.client.get(reverse('propriedades_list'))
+
+    def test_requisicao_nao_consulta_usuario_nem_perfil(self):
+        with CaptureQueriesContext(connection) as consultas:
+            self.client.get(reverse('propriedades_list'))
+        tabelas = ' '.join(consulta['sql'] for consulta in consultas)
+        self.assertNotIn('auth_user', tabelas)
+        self.assertNotIn('core_perfilusuario', tabelas)
+
+    def test_troca_de_senha_encerra_a_sessao(self):
+        usuario = User.objects.get(pk=self.usuario.pk)
+        usuario.set_password('nova-senha')
+        with self.captureOnCommitCallbacks(execute=True):
+            usuario.save()
+
+        response = self.client.get(reverse('propriedades_list'))
+        self.assertRedirects(response, f'{reverse("login")}?next={reverse("propriedades_list")}')
+
+    def test_login_por_senha_usa_o_backend_em_cache(self):
+        self.client.logout()
+        self.client.post(reverse('login'), {'username': 'comum', 'password': 'senha'})
+        self.assertEqual(self.client.session[BACKEND_SESSION_KEY], CAMINHO_BACKEND)
+
+    def test_sessoes_do_model_backend_continuam_validas(self):
+        self.client.force_login(self.usuario, backend='django.contrib.auth.backends.ModelBackend')
+        response = self.client.get(reverse('propriedades_list'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['user'], self.usuario)
+
+    @override_settings(CACHE_COMPARTILHADO=False)
+    def test_cache_por_processo_consulta_o_banco(self):
+        with CaptureQueriesContext(connection) as consultas:
+            self.client.get(reverse('propriedades_list'))
+        self.assertIn('auth_user', ' '.join(consulta['sql'] for consulta in consultas))
+
+
+class FotosPerfilTest(TestCase):
+    """Fotos gravadas pelo conteúdo, com miniaturas, e liberadas quando deixam de ser usadas"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.media = tempfile.mkdtemp()
+        cls.enterClassContext(override_settings(MEDIA_ROOT=cls.media))
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(cls.media, ignore_errors=True)
+
+    def setUp(self):
+        self.perfil = User.objects.create_user('fotografado').perfil
+
+    def enviar_foto(self, perfil, cor=(120, 90, 60), caixa=None, analisada=True):
+        """Como as views (trocar_foto) ou, com analisada=False, como o admin"""
+        buffer = io.BytesIO()
+        Image.new('RGB', (1280, 960), cor).save(buffer, 'JPEG')
+        arquivo = ContentFile(buffer.getvalue(), name='foto.jpg')
+        if analisada:
+            perfil.trocar_foto(arquivo, caixa)
+        else:
+            perfil.foto = arquivo
+        with self.captureOnCommitCallbacks(execute=True):
+            perfil.save()
+        return PerfilUsuario.objects.get(pk=perfil.pk)
+
+    def envelhecer(self, nome):
+        """Tira o arquivo da carência de liberar_foto"""
+        antigo = time.time() - CARENCIA_SEGUNDOS - 1
+        os.utime(armazenamento_fotos.path(nome), (antigo, antigo))
+
+    def test_envio_gera_derivadas(self):
+        perfil = self.enviar_foto(self.perfil, caixa=[300, 700, 700, 300])
+        self.assertRegex(perfil.foto.name, r'^fotos_usuarios/(\w\w)/(\w\w)/\1\2\w{60}\.jpg$')
+        self.assertEqual(
+            set(perfil.miniaturas),
+            {f'{nome}.{formato}' for nome in ('p', 'm', 'rosto') for formato in ('webp', 'jpeg')},
+        )
+        with default_storage.open(perfil.miniaturas['p.webp']) as arquivo, Image.open(arquivo) as imagem:
+            self.assertEqual(imagem.size, (80, 80))
+
+        html = Template("{% load fotos %}{% foto_perfil perfil 'rosto' %}").render(Context({'perfil': perfil}))
+        self.assertIn(perfil.url_miniatura('rosto.webp'), html)
+        self.assertNotIn(perfil.foto.url, html)
+
+    def test_troca_de_foto_libera_a_anterior(self):
+        perfil = self.enviar_foto(self.perfil, caixa=[300, 700, 700, 300])
+        antigos = [perfil.foto.name, *perfil.miniaturas.values()]
+        self.envelhecer(perfil.foto.name)
+        perfil = self.enviar_foto(perfil, cor=(30, 60, 90))
+        self.assertNotIn('rosto.jpeg', perfil.miniaturas)
+        self.assertFalse(any(default_storage.exists(nome) for nome in antigos))
+
+        html = Template("{% load fotos %}{% foto_perfil perfil 'rosto' %}").render(Context({'perfil': perfil}))
+        self.assertIn(perfil.url_miniatura('m.jpeg'), html)
+
+    def test_troca_direta_de_foto_descarta_a_codificacao(self):
+        perfil = self.enviar_foto(self.perfil, caixa=[300, 700, 700, 300])
+        perfil.trocar_foto(perfil.foto.name, perfil.caixa_rosto, np.ones(128))
+        perfil.save()
+        self.assertEqual(len(PerfilUsuario.objects.get(pk=perfil.pk).codificacao_facial), 1024)
+
+        perfil = self.enviar_foto(perfil, cor=(30, 60, 90), analisada=False)
+        self.assertIsNone(perfil.codificacao_facial)
+        self.assertIsNone(perfil.caixa_rosto)
+
+    def test_foto_identica_e_compartilhada_ate_o_ultimo_perfil(self):
+        outro = User.objects.create_user('gemeo').perfil
+        perfil = self.enviar_foto(self.perfil)
+        outro = self.enviar_foto(outro)
+        self.assertEqual(perfil.foto.name, outro.foto.name)
+        nome = perfil.foto.name
+        self.envelhecer(nome)
+
+        perfil.foto = None
+        with self.captureOnCommitCallbacks(execute=True):
+            perfil.save()
+        self.assertTrue(armazenamento_fotos.exists(nome))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            outro.usuario.delete()
+        self.assertFalse(armazenamento_fotos.exists(nome))
+        self.assertFalse(default_storage.exists(nome_derivada(nome, 'm.webp')))
+
+    def test_gerar_miniaturas_uma_vez_por_arquivo(self):
+        # Mesma foto com caixas diferentes: as derivadas têm os mesmos nomes
+        outro = User.objects.create_user('gemeo').perfil
+        perfil = self.enviar_foto(self.perfil, caixa=[300, 700, 700, 300])
+        outro = self.enviar_foto(outro, caixa=[310, 690, 690, 310])
+        PerfilUsuario.objects.update(miniaturas={})
+
+        with mock.patch(
+            'core.management.commands.gerar_miniaturas.salvar_derivadas', wraps=salvar_derivadas
+        ) as gerar:
+            call_command('gerar_miniaturas', '--workers', '4', stdout=io.StringIO())
+
+        gerar.assert_called_once_with(perfil.foto.name, perfil.caixa_rosto)
+        miniaturas = [p.miniaturas for p in PerfilUsuario.objects.filter(pk__in=[perfil.pk, outro.pk])]
+        self.assertEqual(miniaturas[0], miniaturas[1])
+        self.assertIn('rosto.webp', miniaturas[0])
+
+    @override_settings(CACHE_COMPARTILHADO=False)
+    def test_versao_da_galeria_vem_do_banco_sem_cache_compartilhado(self):
+        versao = versao_galeria()
+        # A invalidação feita em outro worker não chega ao cache deste
+        with mock.patch('core.models.invalidar_galeria'):
+            perfil = self.enviar_foto(self.perfil)
+            self.assertNotEqual(versao_galeria(), versao)
+            versao = versao_galeria()
+            with self.captureOnCommitCallbacks(execute=True):
+                perfil.usuario.delete()
+        self.assertNotEqual(versao_galeria(), versao)
+
+
+class GaleriaTest(SimpleTestCase):
+    def setUp(self):
+        gerador = np.random.default_rng(7)
+        self.matriz = gerador.normal(0, 0.1, (500, 128))
+        self.galeria = Galeria(np.arange(1000, 1500), self.matriz)
+
+    def test_distancias_em_lote_iguais_as_individuais(self):
+        consultas = self.matriz[[3, 42, 499]] + 0.01
+        esperadas = np.linalg.norm(consultas[:, None, :] - self.matriz[None, :, :], axis=2)
+        np.testing.assert_allclose(self.galeria.distancias(consultas), esperadas, atol=1e-9)
+
+    def test_identifica_varios_rostos_de_uma_vez(self):
+        estranho = np.full(128, 5.0)
+        consultas = np.vstack([self.matriz[10], estranho, self.matriz[20] + 0.001])
+        resultados = self.galeria.identificar(consultas, tolerancia=0.6)
+        self.assertEqual([usuario_id for usuario_id, _ in resultados], [1010, None, 1020])
+        self.assertAlmostEqual(resultados[0][1], 0.0, places=6)
+
+    def test_galeria_vazia(self):
+        vazia = Galeria([], np.empty((0, 128)))
+        self.assertEqual(vazia.identificar(self.matriz[:2], 0.6), [(None, None), (None, None)])
+
+    def test_galerias_compactas_reordenam_pela_distancia_exata(self):
+        consultas = np.vstack([self.matriz[[3, 42, 499]] + 0.002, np.full(128, 5.0)])
+        esperados = self.galeria.identificar(consultas, tolerancia=0.6)
+        with tempfile.TemporaryDirectory() as diretorio:
+            for nome, reducao in (('float16', 3), ('int8', 6)):
+                comparador = motores.comparador(nome)
+                compacta = comparador.indexar(np.arange(1000, 1500), self.matriz, 1, diretorio)
+                self.assertLess(compacta.nbytes * reducao, self.galeria.nbytes)
+                resultados = comparador.identificar(compacta, consultas, 0.6)
+                self.assertEqual([r[0] for r in resultados], [1003, 1042, 1499, None])
+                np.testing.assert_allclose([r[1] for r in resultados], [e[1] for e in esperados], rtol=1e-5)
+
+            # Uma nova versão apaga os arquivos das anteriores
+            motores.comparador('int8').indexar(np.arange(1000, 1500), self.matriz, 2, diretorio)
+            self.assertEqual([nome.split('-')[1] for nome in os.listdir(diretorio)], ['2'])
+
+
+class ComparadorRecusaTudo(motores.Comparador):
+    def identificar(self, galeria, codificacoes, tolerancia):
+        return [(None, None)] * len(np.atleast_2d(codificacoes))
+
+
+class MotoresTest(SimpleTestCase):
+    def test_padrao_e_o_comportamento_original(self):
+        self.assertIsInstance(motores.detector(), motores.DetectorDlib)
+        self.assertEqual((motores.detector().modelo, motores.detector().ampliacoes), ('hog', 1))
+        self.assertEqual(motores.codificador().pontos, 'small')
+        self.assertIsInstance(motores.comparador(), motores.ComparadorExato)
+
+    @override_settings(MOTOR_COMPARADOR='core.tests.ComparadorRecusaTudo')
+    def test_motor_pelo_caminho_da_classe(self):
+        galeria = Galeria([1], np.zeros((1, 128)))
+        self.assertEqual(identificar(galeria, np.zeros(128), 0.6), [(None, None)])
+        with override_settings(MOTOR_COMPARADOR='exato'):
+            self.assertEqual(identificar(galeria, np.zeros(128), 0.6), [(1, 0.0)])
+
+    @override_settings(MOTOR_DETECTOR='inexistente')
+    def test_motor_desconhecido(self):
+        with self.assertRaises(ImproperlyConfigured):
+            motores.detector()
+
+
+@override_settings(FOTO_LADO_MAXIMO=1024)
+class NormalizarFotoTest(SimpleTestCase):
+    def test_gira_reduz_e_remove_metadados(self):
+        exif = Image.Exif()
+        exif[0x0112] = 6  # Orientation: girada 90° (retrato gravado deitado)
+        exif[0x010F] = 'Camera'
+        buffer = io.BytesIO()
+        Image.new('RGB', (4000, 3000)).save(buffer, 'JPEG', exif=exif)
+
+        imagem = normalizar_foto(buffer.getvalue())
+        self.assertEqual(imagem.size, (768, 1024))
+        with Image.open(io.BytesIO(codificar_jpeg(imagem))) as gravada:
+            self.assertEqual(gravada.format, 'JPEG')
+            self.assertFalse(gravada.getexif())
+
+    def test_reconhecimento_decodifica_na_escala_de_trabalho(self):
+        buffer = io.BytesIO()
+        Image.new('RGB', (4000, 3000), (200, 150, 100)).save(buffer, 'JPEG')
+
+        array, escala = carregar_rgb(io.BytesIO(buffer.getvalue()), 640)
+        self.assertEqual(array.shape, (480, 640, 3))
+        self.assertEqual(escala, 6.25)
+        self.assertAlmostEqual(int(array[240, 320, 0]), 200, delta=3)
+
+    def test_recusa_imagem_ilegivel(self):
+        buffer = io.BytesIO()
+        Image.new('RGB', (640, 480)).save(buffer, 'PNG')
+        for dados in (b'nao e uma imagem', buffer.getvalue()[:200]):
+            with self.subTest(tamanho=len(dados)), self.assertRaises(FotoInvalida):
+                normalizar_foto(dados)
+
+    @mock.patch('PIL.ImageFile.LOAD_TRUNCATED_IMAGES', True)
+    def test_recusa_truncada_sem_mexer_na_flag_global(self):
+        # Como depois de importar o face_recognition
+        ruido = np.random.default_rng(0).integers(0, 256, (480, 640, 3), dtype=np.uint8)
+        for formato in ('JPEG', 'PNG', 'WEBP'):
+            buffer = io.BytesIO()
+            Image.fromarray(ruido).save(buffer, formato)
+            dados = buffer.getvalue()
+            with self.subTest(formato=formato):
+                self.assertEqual(normalizar_foto(dados).size, (640, 480))
+                self.assertEqual(carregar_rgb(io.BytesIO(dados))[0].shape, (480, 640, 3))
+                truncados = dados[:len(dados) // 2]
+                with self.assertRaises(FotoInvalida):
+                    normalizar_foto(truncados)
+                with self.assertRaises(FotoInvalida):
+                    carregar_rgb(io.BytesIO(truncados))
+        self.assertIs(ImageFile.LOAD_TRUNCATED_IMAGES, True)
+
+
+class SessaoTeste(SessaoAoVivo):
+    """Detector e codificador fixos: testa só o rastreamento e a estabilidade"""
+
+    def __init__(self, caixas):
+        super().__init__()
+        self.caixas = caixas
+        self.localizacoes = 0
+
+    def localizar(self, image_np):
+        self.localizacoes += 1
+        return [self.caixas[self.quadros - 1]] if image_np.shape[:2] == (240, 320) else []
+
+    def codificar(self, image_np, caixa):
+        return np.zeros(128)
+
+
+def quadro_jpeg(nivel=None):
+    imagem = Image.new('L', (320, 240), nivel) if nivel is not None else Image.effect_noise((320, 240), 40)
+    buffer = io.BytesIO()
+    imagem.convert('RGB').save(buffer, 'JPEG')
+    return buffer.getvalue()
+
+
+@override_settings(CACHES=CACHE_LOCAL, AO_VIVO_LADO_MAXIMO=320, PREFILTRO_ROSTO=False)
+class AoVivoTest(TestCase):
+    def test_codifica_so_com_rosto_parado(self):
+        parada, movida = (60, 200, 180, 100), (60, 300, 180, 200)
+        sessao = SessaoTeste([parada] * QUADROS_ESTAVEIS + [movida])
+        respostas = [sessao.processar(quadro_jpeg()) for _ in range(QUADROS_ESTAVEIS + 1)]
+
+        self.assertEqual(['codificacao' in resposta for resposta in respostas], [False, False, True, False])
+        self.assertEqual(respostas[0]['caixa'], list(parada))
+        self.assertEqual(sessao.codificacoes, 1)
+
+    def test_quadro_escuro_nao_chega_ao_detector(self):
+        sessao = SessaoTeste([])
+        self.assertEqual(sessao.processar(quadro_jpeg(nivel=5))['estado'], 'qualidade')
+        self.assertEqual(sessao.localizacoes, 0)
+
+    @override_settings(PREFILTRO_ROSTO=True)
+    def test_prefiltro_dispensa_o_detector_sem_rosto(self):
+        sessao = SessaoTeste([(60, 200, 180, 100)] * 2)
+        with mock.patch('core.ao_vivo.provavel_rosto', side_effect=[False, True]):
+            self.assertEqual(sessao.processar(quadro_jpeg())['estado'], 'sem_rosto')
+            self.assertEqual(sessao.localizacoes, 0)
+            self.assertEqual(sessao.processar(quadro_jpeg())['estado'], 'acompanhando')
+            self.assertEqual(sessao.localizacoes, 1)
+
+    def test_token_de_login_e_de_uso_unico(self):
+        usuario = User.objects.create_user('ao_vivo', password='senha')
+        url = reverse('login_facial_confirmar') + '?token=' + gerar_token(usuario)
+
+        self.assertRedirects(self.client.get(url), reverse('index'), fetch_redirect_response=False)
+        self.assertEqual(int(self.client.session['_auth_user_id']), usuario.pk)
+        self.client.logout()
+        self.assertRedirects(self.client.get(url), reverse('login_facial'))
+        self.assertNotIn('_auth_user_id', self.client.session)
+
+    def test_token_usado_vale_para_todos_os_processos(self):
+        usuario = User.objects.create_user('ao_vivo', password='senha')
+        token = gerar_token(usuario)
+
+        self.assertEqual(usuario_do_token(token), usuario)
+        # Outro worker, com o próprio cache local
+        cache.clear()
+        self.assertIsNone(usuario_do_token(token))
+
+    def test_token_de_antes_de_outro_login_e_recusado(self):
+        usuario = User.objects.create_user('ao_vivo', password='senha')
+        token = gerar_token(usuario)
+        self.client.login(username='ao_vivo', password='senha')
+        self.assertIsNone(usuario_do_token(token))
+
+    async def test_websocket_recusa_outra_origem(self):
+        scope = {
+            'type': 'websocket',
+            'path': '/ws/reconhecimento/',
+            'headers': [(b'host', b'sistema.gov.br'), (b'origin', b'https://outro.site')],
+        }
+        comunicador = ApplicationCommunicator(reconhecimento_websocket, scope)
+        await comunicador.send_input({'type': 'websocket.connect'})
+        self.assertEqual(await comunicador.receive_output(1), {'type': 'websocket.close', 'code': 1008})
+
+
+class IdentificacaoRostosAPITest(TestCase):
+    def test_so_quem_cria_usuarios_identifica_rostos(self):
+        comum = User.objects.create_user('comum', password='senha')
+        self.client.force_login(comum)
+        response = self.client.post(
+            reverse('api_identificar_rostos'), json.dumps({'foto_base64': foto_base64()}),
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 403)
+
+
+class RegiaoRostoTest(SimpleTestCase):
+    def test_regiao_do_cliente_na_escala_de_trabalho(self):
+        for valor in ('200,600,500,300', '[200, 600, 500, 300]'):
+            with self.subTest(valor=valor):
+                self.assertEqual(ler_regiao(valor, 2.0, (480, 640, 3)), (100, 300, 250, 150))
+        self.assertEqual(para_original((10, 60, 80, 20), (90, 140), 2.0), [200, 400, 340, 320])
+
+    def test_regiao_limitada_a_imagem(self):
+        self.assertEqual(ler_regiao('-40,900,700,100', 1.0, (480, 640, 3)), (0, 640, 480, 100))
+
+    def test_ignora_regiao_invalida(self):
+        for valor in (None, '', 'abc', '1,2,3', '10,12,12,10', '300,100,100,300'):
+            with self.subTest(valor=valor):
+                self.assertIsNone(ler_regiao(valor, 1.0, (480, 640, 3)))
+
+
+class CadastroFotoTest(TestCase):
+    def test_foto_invalida_nao_cria_usuario(self):
+        response = self.client.post(reverse('usuario_create'), {
+            'username': 'novo',
+            'password': 'senha-forte-123',
+            'password_confirm': 'senha-forte-123',
+            'foto_base64': 'data:image/jpeg;base64,' + base64.b64encode(b'corrompida').decode(),
+        })
+        self.assertContains(response, 'não é uma imagem válida')
+        self.assertFalse(User.objects.filter(username='novo').exists())
+
+
+@override_settings(REPLICAS_LEITURA=['replica1'], REPLICA_ATRASO_MAXIMO=5)
+class ReplicasTest(SimpleTestCase):
+    """Leituras das views marcadas vão para a réplica, salvo logo após uma gravação"""
+
+    def requisitar(self, request, marcada=True):
+        def view(request):
+            return HttpResponse(RoteadorReplicas().db_for_read(PropriedadeRural))
+        view.leitura_em_replica = marcada
+
+        def get_response(request):
+            middleware.process_view(request, view, (), {})
+            return view(request)
+
+        middleware = ReplicaMiddleware(get_response)
+        return middleware(request)
+
+    def test_get_em_view_marcada_le_da_replica(self):
+        response = self.requisitar(RequestFactory().get('/'))
+        self.assertEqual(response.content, b'replica1')
+        self.assertEqual(banco_leitura(), 'default')
+
+    def test_view_nao_marcada_le_do_principal(self):
+        self.assertEqual(self.requisitar(RequestFactory().get('/'), marcada=False).content, b'default')
+
+    def test_gravacao_marca_leitura_do_principal(self):
+        response = self.requisitar(RequestFactory().post('/'))
+        self.assertEqual(response.content, b'default')
+        self.assertEqual(response.cookies[COOKIE_PRIMARIO]['max-age'], 5)
+
+        request = RequestFactory().get('/')
+        request.COOKIES[COOKIE_PRIMARIO] = '1'
+        self.assertEqual(self.requisitar(request).content, b'default')
+
+    def test_gravacoes_vao_para_o_principal(self):
+        self.assertEqual(RoteadorReplicas().db_for_write(PropriedadeRural), 'default')
+        self.assertFalse(RoteadorReplicas().allow_migrate('replica1', 'core'))
@@ -1,16 +1,18 @@
 from django.urls import path
 
-from . import views
+from . import api, views
 
 urlpatterns = [
     path("", views.index, name="index"),
     path("login/", views.login_view, name="login"),
     path("login/facial/", views.login_facial_view, name="login_facial"),
+    path("login/facial/confirmar/", views.login_facial_confirmar, name="login_facial_confirmar"),
     path("reconhecer-face/", views.reconhecer_face, name="reconhecer_face"),
     path("logout/", views.logout_view, name="logout"),
     
     # CRUD Propriedades Rurais
     path("propriedades/", views.propriedades_list, name="propriedades_list"),
+    path("propriedades/exportar/", views.propriedades_exportar, name="propriedades_exportar"),
     path("propriedades/nova/", views.propriedade_create, name="propriedade_create"),
     path("propriedades/<int:pk>/", views.propriedade_detail, name="propriedade_detail"),
     path("propriedades/<int:pk>/editar/", views.propriedade_update, name="propriedade_update"),
@@ -22,4 +24,11 @@ urlpatterns = [
     path("usuarios/<int:pk>/", views.usuario_detail, name="usuario_detail"),
     path("usuarios/<int:pk>/editar/", views.usuario_update, name="usuario_update"),
     path("usuarios/<int:pk>/deletar/", views.usuario_delete, name="usuario_delete"),
+    
+    # API REST
+    path("api/v1/propriedades/", api.PropriedadeListaAPI.as_view(), name="api_propriedades_list"),
+    path("api/v1/propriedades/em-massa/", api.PropriedadesEmMassaAPI.as_view(), name="api_propriedades_em_massa"),
+    path("api/v1/propriedades/<int:pk>/", api.PropriedadeDetalheAPI.as_view(), name="api_propriedade_detail"),
+    path("api/v1/analytics/propriedades/", api.AnalisePropriedadesAPI.as_view(), name="api_analytics_propriedades"),
+    path("api/v1/reconhecimento/identificar/", api.IdentificacaoRostosAPI.as_view(), name="api_identificar_rostos"),
 ]
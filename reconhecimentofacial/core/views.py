@@ -1,5 +1,7 @@
+from django.conf import settings
 from django.shortcuts import render, redirect, get_object_or_404
-from django.http import HttpResponse, JsonResponse
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.template.loader import render_to_string
 from django.core.files.base import ContentFile
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
@@ -7,26 +9,38 @@ from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.models import User
 from django.core.paginator import Paginator
 from django.db import IntegrityError
+from django.db.models import Count, Q
+from django.utils.http import http_date
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
 from django.views.decorators.csrf import csrf_exempt
-import base64
-from .models import PropriedadeRural, PerfilUsuario
-
+import hashlib
+import logging
+from collections import Counter
+from .exportacao import FORMATOS as FORMATOS_EXPORTACAO, codificar, comprimir_gzip
+from .ao_vivo import usuario_do_token
+from .autenticacao import CAMINHO as BACKEND_AUTENTICACAO
+from .decorators import leitura_em_replica, orcamento_consultas
+from .cache import obter_ou_calcular, timeout_fragmentos, versao_propriedades
+from .galeria import carregar_galeria
+from .imagens import FotoInvalida, carregar_rgb, codificar_jpeg, decodificar_base64, normalizar_foto
+from .permissoes import permissoes_do_usuario
+from .reconhecimento import (
+    MARGEM_REGIAO, codificar_foto_perfil, codificar_rostos, detectar_qualidade_imagem, expandir, identificar,
+    ler_regiao, localizar_rostos, para_original, preprocessar_imagem_opencv, provavel_rosto,
+)
+from .models import Agrotoxico, PropriedadeRural, PropriedadeRuralArquivada, PerfilUsuario, EstatisticaPropriedade, EstatisticaUsuario
+
+logger = logging.getLogger(__name__)
+
+RESPOSTA_SEM_ROSTO = {
+    'success': False,
+    'message': 'Nenhum rosto detectado. Por favor, posicione seu rosto na câmera.',
+    'suggestions': ['Centralize seu rosto na câmera', 'Melhore a iluminação']
+}
 
 def pode_criar_usuarios(usuario):
     """Verifica se o usuário tem permissão para criar outros usuários"""
-    if not usuario.is_authenticated:
-        return False
-    
-    # Admin pode criar qualquer tipo
-    if usuario.is_staff or usuario.is_superuser:
-        return True
-    
-    # Verifica se tem perfil
-    if not hasattr(usuario, 'perfil'):
-        return False
-    
-    # Ministro e Diretor podem criar usuários
-    return usuario.perfil.tipo_perfil in ['MINISTRO', 'DIRETOR']
+    return permissoes_do_usuario(usuario).pode_criar_usuarios
 
 
 def obter_perfis_permitidos(usuario):
@@ -34,65 +48,14 @@ def obter_perfis_permitidos(usuario):
     Retorna lista de tipos de perfil que o usuário pode criar.
     Retorna tuplas (valor, label) para usar em select.
     """
-    if not usuario.is_authenticated:
-        return []
-    
-    # Admin/Superuser podem criar qualquer tipo
-    if usuario.is_staff or usuario.is_superuser:
-        return [
-            ('COMUM', '👤 Usuário Comum'),
-            ('DIRETOR', '👔 Diretor de Divisões'),
-            ('MINISTRO', '🎖️ Ministro do Meio Ambiente'),
-        ]
-    
-    # Verifica se tem perfil
-    if not hasattr(usuario, 'perfil'):
-        return []
-    
-    # Ministro pode criar Ministros, Diretores e Comuns
-    if usuario.perfil.tipo_perfil == 'MINISTRO':
-        return [
-            ('COMUM', '👤 Usuário Comum'),
-            ('DIRETOR', '👔 Diretor de Divisões'),
-            ('MINISTRO', '🎖️ Ministro do Meio Ambiente'),
-        ]
-    
-    # Diretor pode criar Diretores e Comuns
-    if usuario.perfil.tipo_perfil == 'DIRETOR':
-        return [
-            ('COMUM', '👤 Usuário Comum'),
-            ('DIRETOR', '👔 Diretor de Divisões'),
-        ]
-    
-    # Usuário comum não pode criar ninguém
-    return []
+    return permissoes_do_usuario(usuario).opcoes_perfis()
 
 
 def obter_niveis_visualizacao(usuario):
     """
     Retorna lista de níveis de impacto que o usuário pode visualizar.
     """
-    if not usuario.is_authenticated:
-        return []
-    
-    # Admin/Superuser podem ver todos
-    if usuario.is_staff or usuario.is_superuser:
-        return [1, 2, 3]
-    
-    # Verifica se tem perfil
-    if not hasattr(usuario, 'perfil'):
-        return [1]  # Padrão: apenas nível 1
-    
-    # Ministro pode ver todos os níveis
-    if usuario.perfil.tipo_perfil == 'MINISTRO':
-        return [1, 2, 3]
-    
-    # Diretor pode ver níveis 1 e 2
-    if usuario.perfil.tipo_perfil == 'DIRETOR':
-        return [1, 2]
-    
-    # Usuário comum pode ver apenas nível 1
-    return [1]
+    return list(permissoes_do_usuario(usuario).niveis_visualizacao)
 
 
 def obter_niveis_criacao(usuario):
@@ -100,58 +63,150 @@ def obter_niveis_criacao(usuario):
     Retorna lista de níveis de impacto que o usuário pode criar.
     Retorna tuplas (valor, label) para usar em select.
     """
-    if not usuario.is_authenticated:
-        return []
-    
-    # Admin/Superuser podem criar todos
-    if usuario.is_staff or usuario.is_superuser:
-        return [
-            (1, 'Nível 1 - Baixo Impacto'),
-            (2, 'Nível 2 - Médio Impacto'),
-            (3, 'Nível 3 - Alto Impacto'),
-        ]
-    
-    # Verifica se tem perfil
-    if not hasattr(usuario, 'perfil'):
-        return []
-    
-    # Ministro pode criar todos os níveis
-    if usuario.perfil.tipo_perfil == 'MINISTRO':
-        return [
-            (1, 'Nível 1 - Baixo Impacto'),
-            (2, 'Nível 2 - Médio Impacto'),
-            (3, 'Nível 3 - Alto Impacto'),
-        ]
-    
-    # Diretor pode criar níveis 1 e 2
-    if usuario.perfil.tipo_perfil == 'DIRETOR':
-        return [
-            (1, 'Nível 1 - Baixo Impacto'),
-            (2, 'Nível 2 - Médio Impacto'),
-        ]
-    
-    # Usuário comum não pode criar propriedades
-    return []
+    return permissoes_do_usuario(usuario).opcoes_niveis_criacao()
 
 
 def pode_criar_propriedades(usuario):
     """Verifica se o usuário tem permissão para criar propriedades"""
-    if not usuario.is_authenticated:
-        return False
+    return permissoes_do_usuario(usuario).pode_criar_propriedades
+
+
+def filtrar_propriedades(niveis_permitidos, nivel_filtro=None, search='', agrotoxico=None, estado=None):
+    """
+    Propriedades ativas visíveis para os níveis informados, com os mesmos
+    filtros de nível, busca e facetas da listagem.
+    """
+    propriedades = PropriedadeRural.objects.filter(ativo=True, nivel_impacto__in=niveis_permitidos)
+    
+    if nivel_filtro:
+        propriedades = propriedades.filter(nivel_impacto=nivel_filtro)
+    
+    if agrotoxico:
+        propriedades = propriedades.filter(agrotoxico_id=agrotoxico)
+    
+    if estado:
+        propriedades = propriedades.filter(estado=estado)
     
-    # Admin pode criar
-    if usuario.is_staff or usuario.is_superuser:
-        return True
+    if search:
+        propriedades = propriedades.filter(
+            Q(nome_propriedade__icontains=search) |
+            Q(proprietario__icontains=search) |
+            Q(cidade__icontains=search)
+        )
     
-    # Verifica se tem perfil
-    if not hasattr(usuario, 'perfil'):
-        return False
+    return propriedades
+
+
+def ler_filtros_propriedades(request):
+    """Filtros da listagem/exportação vindos da query string (valores inválidos são ignorados)"""
+    nivel = request.GET.get('nivel', '')
+    agrotoxico = request.GET.get('agrotoxico', '')
+    estado = request.GET.get('estado', '').upper()
+    return {
+        'nivel_filtro': nivel if nivel in ('1', '2', '3') else None,
+        'search': request.GET.get('search', ''),
+        'agrotoxico': int(agrotoxico) if agrotoxico.isdigit() else None,
+        'estado': estado if len(estado) == 2 and estado.isalpha() else None,
+    }
+
+
+def contar_facetas(niveis_permitidos, search=''):
+    """
+    Contagens por (agrotóxico, nível, estado) em uma única consulta agrupada.
+    Os filtros de faceta são aplicados depois, em memória, por montar_facetas.
+    """
+    return list(
+        filtrar_propriedades(niveis_permitidos, search=search)
+        .values_list('agrotoxico_id', 'agrotoxico__nome', 'nivel_impacto', 'estado')
+        .annotate(total=Count('id'))
+        .order_by()
+    )
+
+
+def montar_facetas(request, linhas, filtros):
+    """
+    Monta as facetas de agrotóxico, nível e estado. Cada faceta conta as
+    propriedades que atendem aos filtros das demais, para que o usuário veja
+    quantas restariam ao trocar o valor daquela faceta.
+    """
+    selecionados = {
+        'agrotoxico': filtros['agrotoxico'],
+        'nivel': filtros['nivel_filtro'] and int(filtros['nivel_filtro']),
+        'estado': filtros['estado'],
+    }
+    contagens = {faceta: Counter() for faceta in selecionados}
+    nomes = {}
+    for agrotoxico_id, agrotoxico_nome, nivel, estado, total in linhas:
+        valores = {'agrotoxico': agrotoxico_id, 'nivel': nivel, 'estado': estado}
+        nomes[agrotoxico_id] = agrotoxico_nome or 'Não catalogado'
+        for faceta in contagens:
+            if all(
+                selecionados[outra] is None or valores[outra] == selecionados[outra]
+                for outra in selecionados if outra != faceta
+            ):
+                contagens[faceta][valores[faceta]] += total
+    
+    def opcoes(faceta, rotulo):
+        itens = []
+        for valor, total in contagens[faceta].most_common():
+            if valor is None:
+                continue
+            ativo = valor == selecionados[faceta]
+            parametros = request.GET.copy()
+            parametros.pop('page', None)
+            if ativo:
+                parametros.pop(faceta, None)
+            else:
+                parametros[faceta] = valor
+            itens.append({'rotulo': rotulo(valor), 'total': total, 'ativo': ativo, 'query': parametros.urlencode()})
+        return itens
     
-    # Ministro e Diretor podem criar propriedades
-    # Usuário comum NÃO pode criar
-    return usuario.perfil.tipo_perfil in ['MINISTRO', 'DIRETOR']
+    return [
+        ('Agrotóxico', opcoes('agrotoxico', nomes.get)),
+        ('Nível', opcoes('nivel', lambda nivel: f'Nível {nivel}')),
+        ('Estado', opcoes('estado', str)),
+    ]
 
 
+def validadores_pagina(request, *partes):
+    """
+    Calcula (ETag, Last-Modified) de uma página de detalhe a partir dos valores
+    leves do registro exibido (*partes) e do usuário logado, cujo nome e tipo
+    de perfil aparecem na navegação e definem o que ele pode ver.
+    """
+    visitante = (
+        request.user.pk, request.user.get_full_name(), request.user.is_staff,
+        request.permissoes.tipo_perfil,
+    )
+    etag = '"%s"' % hashlib.md5(repr((partes, visitante)).encode('utf-8')).hexdigest()
+    datas = [valor for valor in (*partes, *visitante) if hasattr(valor, 'timestamp')]
+    return etag, max(datas) if datas else None
+
+
+def resposta_nao_modificada(request, etag, ultima_modificacao):
+    """304 Not Modified se o navegador/proxy já tem esta versão da página, senão None"""
+    # Mensagens pendentes precisam ser exibidas: a página tem que ser renderizada
+    if len(messages.get_messages(request)):
+        return None
+    response = get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=ultima_modificacao and int(ultima_modificacao.timestamp()),
+    )
+    return response and aplicar_validadores(response, etag, ultima_modificacao)
+
+
+def aplicar_validadores(response, etag, ultima_modificacao):
+    """ETag/Last-Modified com cache privado, sempre revalidado"""
+    response['ETag'] = etag
+    if ultima_modificacao:
+        response['Last-Modified'] = http_date(ultima_modificacao.timestamp())
+    patch_vary_headers(response, ('Cookie',))
+    patch_cache_control(response, private=True, max_age=0, must_revalidate=True)
+    return response
+
+
+@orcamento_consultas(15)
 def login_view(request):
     if request.user.is_authenticated:
         return redirect('index')
@@ -172,12 +227,14 @@ def login_view(request):
     return render(request, 'core/login.html')
 
 
+@orcamento_consultas(4)
 def logout_view(request):
     logout(request)
     messages.success(request, 'Você saiu com sucesso.')
     return redirect('login')
 
 
+@orcamento_consultas(2)
 def login_facial_view(request):
     """View para login com reconhecimento facial"""
     if request.user.is_authenticated:
@@ -186,146 +243,65 @@ def login_facial_view(request):
     return render(request, 'core/login_facial.html')
 
 
-def preprocessar_imagem_opencv(image_np):
-    """
-    Pré-processa imagem com OpenCV para melhorar reconhecimento facial.
-    """
-    import cv2
-    import numpy as np
+@orcamento_consultas(15)
+def login_facial_confirmar(request):
+    """Conclui o login reconhecido pelo WebSocket (ver core/ao_vivo.py)"""
+    usuario = usuario_do_token(request.GET.get('token', ''))
+    if usuario is None:
+        messages.error(request, 'Reconhecimento expirado ou inválido. Tente novamente.')
+        return redirect('login_facial')
     
-    try:
-        # 1. Converter RGB para BGR (OpenCV usa BGR)
-        image_bgr = cv2.cvtColor(image_np, cv2.COLOR_RGB2BGR)
-        
-        # 2. Avaliar qualidade da imagem
-        gray = cv2.cvtColor(image_bgr, cv2.COLOR_BGR2GRAY)
-        
-        # 2.1 Detectar blur (Laplacian variance)
-        blur_score = cv2.Laplacian(gray, cv2.CV_64F).var()
-        if blur_score < 30:  # Threshold mais permissivo
-            return None, blur_score, f"Imagem desfocada (score: {blur_score:.1f}). Use uma imagem mais nítida."
-        
-        # 2.2 Verificar brilho médio
-        brightness = np.mean(gray)
-        if brightness < 30:
-            return None, brightness, "Imagem muito escura. Melhore a iluminação."
-        if brightness > 240:
-            return None, brightness, "Imagem muito clara. Reduza a iluminação."
-        
-        # 3. Equalização adaptativa de histograma (CLAHE)
-        clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
-        
-        # Aplicar em cada canal de cor
-        b, g, r = cv2.split(image_bgr)
-        b_clahe = clahe.apply(b)
-        g_clahe = clahe.apply(g)
-        r_clahe = clahe.apply(r)
-        image_clahe = cv2.merge([b_clahe, g_clahe, r_clahe])
-        
-        # 4. Redução de ruído (Denoising)
-        image_denoised = cv2.fastNlMeansDenoisingColored(
-            image_clahe, 
-            None, 
-            h=10,
-            hColor=10,
-            templateWindowSize=7,
-            searchWindowSize=21
-        )
-        
-        # 5. Aumentar nitidez (Sharpening)
-        kernel_sharpening = np.array([
-            [-1, -1, -1],
-            [-1,  9, -1],
-            [-1, -1, -1]
-        ])
-        image_sharp = cv2.filter2D(image_denoised, -1, kernel_sharpening)
-        
-        # 6. Ajustar gamma para melhorar contraste
-        def adjust_gamma(image, gamma=1.2):
-            inv_gamma = 1.0 / gamma
-            table = np.array([((i / 255.0) ** inv_gamma) * 255 
-                            for i in np.arange(0, 256)]).astype("uint8")
-            return cv2.LUT(image, table)
-        
-        image_gamma = adjust_gamma(image_sharp, gamma=1.2)
-        
-        # 7. Converter de volta para RGB (para face_recognition)
-        image_processed = cv2.cvtColor(image_gamma, cv2.COLOR_BGR2RGB)
-        
-        # Calcular score de qualidade final
-        quality_score = min(100, (blur_score / 5) + (50 if 60 < brightness < 200 else 0))
-        
-        return image_processed, quality_score, None
-        
-    except Exception as e:
-        return None, 0, f"Erro no pré-processamento: {str(e)}"
+    login(request, usuario, backend=BACKEND_AUTENTICACAO)
+    messages.success(request, f'Bem-vindo(a), {usuario.get_full_name() or usuario.username}!')
+    return redirect('index')
 
 
-def detectar_qualidade_imagem(image_np):
+def preparar_foto_perfil(foto_data, username):
     """
-    Detecta qualidade da imagem e retorna score + sugestões.
+    Normaliza a foto de cadastro (ver core/imagens.py) e recusa fotos
+    ilegíveis, de baixa qualidade ou sem exatamente um rosto, antes de
+    gravar qualquer coisa. Retorna (arquivo JPEG, caixa do rosto,
+    codificação do rosto para a galeria).
     """
-    import cv2
     import numpy as np
     
-    sugestoes = []
-    score = 100
-    
-    # Converter para BGR e grayscale
-    image_bgr = cv2.cvtColor(image_np, cv2.COLOR_RGB2BGR)
-    gray = cv2.cvtColor(image_bgr, cv2.COLOR_BGR2GRAY)
-    
-    # 1. Verificar nitidez (blur)
-    blur_score = cv2.Laplacian(gray, cv2.CV_64F).var()
-    if blur_score < 30:
-        score -= 30
-        sugestoes.append("Imagem desfocada - segure a câmera com firmeza")
-    elif blur_score < 60:
-        score -= 15
-        sugestoes.append("Imagem levemente desfocada")
-    
-    # 2. Verificar iluminação
-    brightness = np.mean(gray)
-    if brightness < 40:
-        score -= 25
-        sugestoes.append("Ambiente muito escuro - aumente a iluminação")
-    elif brightness < 60:
-        score -= 10
-        sugestoes.append("Iluminação baixa")
-    elif brightness > 220:
-        score -= 20
-        sugestoes.append("Ambiente muito claro - reduza a luz")
-    elif brightness > 200:
-        score -= 10
-        sugestoes.append("Iluminação alta")
-    
-    # 3. Verificar contraste
-    contrast = gray.std()
-    if contrast < 25:
-        score -= 15
-        sugestoes.append("Baixo contraste - melhore a iluminação")
-    
-    # 4. Verificar se imagem está muito pixelada
-    height, width = gray.shape
-    if height < 240 or width < 320:
-        score -= 20
-        sugestoes.append("Resolução baixa - use câmera melhor")
-    
-    qualidade_ok = score >= 40  # Threshold mais permissivo
-    
-    if not sugestoes:
-        sugestoes.append("Qualidade de imagem boa!")
-    
-    return qualidade_ok, score, sugestoes
+    imagem = normalizar_foto(decodificar_base64(foto_data))
+    arquivo = ContentFile(codificar_jpeg(imagem), name=f'{username}_foto.jpg')
+    image_np = np.asarray(imagem)
+    
+    try:
+        qualidade_ok, _, sugestoes = detectar_qualidade_imagem(image_np)
+        if not qualidade_ok:
+            raise FotoInvalida('Qualidade da foto inadequada.', sugestoes)
+        caixa_rosto, codificacao = codificar_foto_perfil(image_np)
+    except ImportError:
+        logger.warning('face_recognition/OpenCV indisponíveis: foto de %s gravada sem verificação', username)
+        return arquivo, None, None
+    
+    return arquivo, caixa_rosto, codificacao
+
 
+def mensagem_foto_invalida(erro):
+    if erro.sugestoes:
+        return f'{erro} ({"; ".join(erro.sugestoes)})'
+    return str(erro)
 
+
+@orcamento_consultas(15)
 @csrf_exempt
 def reconhecer_face(request):
-    """Processa a imagem capturada e tenta reconhecer o usuário"""
-    import face_recognition
-    import numpy as np
-    from PIL import Image
+    """
+    Processa a imagem capturada e tenta reconhecer o usuário.
+    
+    O cliente pode indicar onde o rosto está (caixa_rosto, 'top,right,bottom,left'
+    como a 'caixa' das respostas): o pré-processamento e a detecção rodam só
+    em volta dela, com o quadro inteiro como alternativa se nada for achado.
+    
+    Detecção, codificação e comparação usam os motores configurados em
+    MOTOR_DETECTOR, MOTOR_CODIFICADOR e MOTOR_COMPARADOR (core/motores.py).
+    """
     import io
+    import numpy as np
     
     if request.method != 'POST':
         return JsonResponse({'error': 'Método não permitido'}, status=405)
@@ -336,17 +312,12 @@ def reconhecer_face(request):
         if not foto_data:
             return JsonResponse({'error': 'Nenhuma imagem fornecida'}, status=400)
         
-        # Remover o prefixo data:image se existir
-        if foto_data.startswith('data:image'):
-            foto_data = foto_data.split(',')[1]
-        
-        # Decodificar imagem
-        image_data = base64.b64decode(foto_data)
-        image = Image.open(io.BytesIO(image_data))
-        
-        # Converter para RGB (necessário para face_recognition)
-        image_rgb = image.convert('RGB')
-        image_np = np.array(image_rgb)
+        # Decodificar já na resolução de trabalho, em RGB (necessário para face_recognition)
+        lado_trabalho = settings.RECONHECIMENTO_LADO_MAXIMO
+        try:
+            image_np, escala = carregar_rgb(io.BytesIO(decodificar_base64(foto_data)), lado_trabalho)
+        except FotoInvalida as e:
+            return JsonResponse({'error': str(e)}, status=400)
         
         # Verificar qualidade da imagem
         qualidade_ok, quality_score, sugestoes = detectar_qualidade_imagem(image_np)
@@ -359,28 +330,42 @@ def reconhecer_face(request):
                 'suggestions': sugestoes
             })
         
-        # Pré-processar com OpenCV
-        image_processed, process_score, error_msg = preprocessar_imagem_opencv(image_np)
-        
-        if image_processed is None:
-            return JsonResponse({
-                'success': False,
-                'message': error_msg,
-                'quality_score': process_score
-            })
-        
-        # Usar imagem processada para detecção
-        image_np = image_processed
-        
-        # Detectar faces na imagem capturada
-        face_locations = face_recognition.face_locations(image_np)
+        # Pré-filtro barato: quadros sem rosto não chegam ao OpenCV/dlib
+        if settings.PREFILTRO_ROSTO and not provavel_rosto(image_np):
+            return JsonResponse(RESPOSTA_SEM_ROSTO)
+        
+        # Com a caixa indicada pelo cliente, pré-processar e detectar só no recorte
+        face_locations = []
+        regiao = ler_regiao(request.POST.get('caixa_rosto'), escala, image_np.shape)
+        if regiao is not None:
+            top, right, bottom, left = expandir(regiao, MARGEM_REGIAO, image_np.shape)
+            recorte, _, _ = preprocessar_imagem_opencv(np.ascontiguousarray(image_np[top:bottom, left:right]))
+            if recorte is not None:
+                face_locations = localizar_rostos(recorte)
+                deslocamento = (top, left)
+        
+        if face_locations:
+            image_np = recorte
+        else:
+            # Pré-processar com OpenCV
+            image_processed, process_score, error_msg = preprocessar_imagem_opencv(image_np)
+            
+            if image_processed is None:
+                return JsonResponse({
+                    'success': False,
+                    'message': error_msg,
+                    'quality_score': process_score
+                })
+            
+            # Usar imagem processada para detecção
+            image_np = image_processed
+            deslocamento = (0, 0)
+            
+            # Detectar faces na imagem capturada
+            face_locations = localizar_rostos(image_np)
         
         if not face_locations:
-            return JsonResponse({
-                'success': False,
-                'message': 'Nenhum rosto detectado. Por favor, posicione seu rosto na câmera.',
-                'suggestions': ['Centralize seu rosto na câmera', 'Melhore a iluminação']
-            })
+            return JsonResponse(RESPOSTA_SEM_ROSTO)
         
         if len(face_locations) > 1:
             return JsonResponse({
@@ -390,8 +375,8 @@ def reconhecer_face(request):
             })
         
         # Extrair encoding da face capturada
-        face_encodings = face_recognition.face_encodings(image_np, face_locations)
-        if not face_encodings:
+        face_encodings = codificar_rostos(image_np, face_locations)
+        if not len(face_encodings):
             return JsonResponse({
                 'success': False,
                 'message': 'Não foi possível processar o rosto detectado.',
@@ -399,19 +384,18 @@ def reconhecer_face(request):
             })
         
         captured_encoding = face_encodings[0]
+        # Onde o rosto está, para o cliente indicar na próxima tentativa
+        caixa = para_original(face_locations[0], deslocamento, escala)
         
-        # Buscar todos os usuários com foto de perfil
-        usuarios_com_foto = PerfilUsuario.objects.exclude(foto__isnull=True).exclude(foto='')
+        # Codificações de todos os usuários com foto (em memória no processo)
+        galeria = carregar_galeria(request)
         
-        if not usuarios_com_foto.exists():
+        if not len(galeria):
             return JsonResponse({
                 'success': False,
                 'message': 'Nenhum usuário cadastrado com foto de perfil.'
             })
         
-        melhor_match = None
-        menor_distancia = float('inf')
-        
         # Tolerância dinâmica baseada na qualidade
         if quality_score >= 80:
             tolerancia = 0.60  # Rigoroso para imagens boas
@@ -420,42 +404,9 @@ def reconhecer_face(request):
         else:
             tolerancia = 0.70  # Mais permissivo para imagens ruins
         
-        # Comparar com cada usuário cadastrado
-        for perfil in usuarios_com_foto:
-            try:
-                # Carregar foto do perfil
-                perfil_image = face_recognition.load_image_file(perfil.foto.path)
-                
-                # Pré-processar foto do perfil também
-                perfil_processed, _, _ = preprocessar_imagem_opencv(perfil_image)
-                if perfil_processed is not None:
-                    perfil_image = perfil_processed
-                
-                # Detectar face na foto do perfil
-                perfil_face_locations = face_recognition.face_locations(perfil_image)
-                
-                if not perfil_face_locations:
-                    continue
-                
-                # Extrair encoding da face do perfil
-                perfil_encodings = face_recognition.face_encodings(perfil_image, perfil_face_locations)
-                
-                if not perfil_encodings:
-                    continue
-                
-                perfil_encoding = perfil_encodings[0]
-                
-                # Calcular distância entre as faces
-                face_distance = face_recognition.face_distance([perfil_encoding], captured_encoding)[0]
-                
-                # Verificar se é o melhor match até agora
-                if face_distance < menor_distancia and face_distance < tolerancia:
-                    menor_distancia = face_distance
-                    melhor_match = perfil.usuario
-                    
-            except Exception as e:
-                print(f"Erro ao processar perfil {perfil.usuario.username}: {str(e)}")
-                continue
+        # Comparar com todos os usuários cadastrados de uma vez
+        [(usuario_id, menor_distancia)] = identificar(galeria, captured_encoding, tolerancia)
+        melhor_match = User.objects.filter(pk=usuario_id).first() if usuario_id else None
         
         # Se encontrou um match
         if melhor_match:
@@ -471,11 +422,12 @@ def reconhecer_face(request):
                     'message': f'Confiança muito baixa ({confianca_percentual:.1f}%). Tente novamente.',
                     'confidence': f'{confianca_percentual:.1f}%',
                     'quality_score': quality_score,
+                    'caixa': caixa,
                     'suggestions': sugestoes + ['Tente capturar novamente', 'Melhore as condições']
                 })
             
             # Fazer login do usuário
-            login(request, melhor_match, backend='django.contrib.auth.backends.ModelBackend')
+            login(request, melhor_match, backend=BACKEND_AUTENTICACAO)
             
             return JsonResponse({
                 'success': True,
@@ -490,6 +442,7 @@ def reconhecer_face(request):
                 'success': False,
                 'message': 'Rosto não reconhecido. Tente novamente ou use login com senha.',
                 'quality_score': quality_score,
+                'caixa': caixa,
                 'suggestions': sugestoes + ['Use login com senha', 'Tente com melhor iluminação']
             })
             
@@ -499,42 +452,41 @@ def reconhecer_face(request):
         }, status=500)
 
 
+@orcamento_consultas(6)
+@leitura_em_replica
 @login_required
 def index(request):
-    # Verificar permissões do usuário
-    pode_criar_usuarios_flag = pode_criar_usuarios(request.user)
-    pode_criar_propriedades_flag = pode_criar_propriedades(request.user)
-    
-    # Obter níveis de visualização permitidos para o usuário
-    niveis_permitidos = obter_niveis_visualizacao(request.user)
+    # Níveis de visualização permitidos (contexto de permissões da requisição)
+    niveis_permitidos = request.permissoes.niveis_visualizacao
     
-    # Estatísticas para o dashboard
-    total_usuarios = User.objects.count()
+    # Estatísticas para o dashboard (tabelas consolidadas, independentes do volume)
+    total_usuarios = EstatisticaUsuario.contar_total()
     
-    # Filtrar propriedades por nível de permissão
-    total_propriedades = PropriedadeRural.objects.filter(
-        ativo=True,
-        nivel_impacto__in=niveis_permitidos
-    ).count()
+    # Filtrar propriedades por nível de permissão (em cache por conjunto de níveis)
+    total_propriedades = obter_ou_calcular(
+        'total_ativas', niveis_permitidos, (),
+        lambda: EstatisticaPropriedade.contar_ativas(niveis_permitidos)
+    )
     
     # Últimas propriedades cadastradas (filtradas por nível de permissão)
-    ultimas_propriedades = PropriedadeRural.objects.filter(
-        ativo=True,
-        nivel_impacto__in=niveis_permitidos
-    ).order_by('-data_cadastro')[:5]
+    ultimas_propriedades = obter_ou_calcular(
+        'ultimas', niveis_permitidos, (),
+        lambda: list(PropriedadeRural.objects.filter(
+            ativo=True,
+            nivel_impacto__in=niveis_permitidos
+        ).select_related('usuario_cadastro__perfil').order_by('-data_cadastro')[:5])
+    )
     
     # Últimos usuários cadastrados (se for admin)
     ultimos_usuarios = None
     if request.user.is_staff:
-        ultimos_usuarios = User.objects.order_by('-date_joined')[:5]
+        ultimos_usuarios = User.objects.select_related('perfil').order_by('-date_joined')[:5]
     
     context = {
         'total_usuarios': total_usuarios,
         'total_propriedades': total_propriedades,
         'ultimas_propriedades': ultimas_propriedades,
         'ultimos_usuarios': ultimos_usuarios,
-        'pode_criar_usuarios': pode_criar_usuarios_flag,
-        'pode_criar_propriedades': pode_criar_propriedades_flag,
     }
     
     return render(request, 'core/index.html', context)
@@ -542,78 +494,155 @@ def index(request):
 
 # CRUD de Propriedades Rurais
 
+@orcamento_consultas(5)
+@leitura_em_replica
 @login_required
 def propriedades_list(request):
     """Lista todas as propriedades rurais"""
-    nivel_filtro = request.GET.get('nivel')
-    search = request.GET.get('search', '')
-    
-    propriedades = PropriedadeRural.objects.filter(ativo=True)
+    filtros = ler_filtros_propriedades(request)
+    page_number = request.GET.get('page')
     
     # Filtrar por níveis que o usuário pode visualizar
-    niveis_permitidos = obter_niveis_visualizacao(request.user)
-    propriedades = propriedades.filter(nivel_impacto__in=niveis_permitidos)
-    
-    if nivel_filtro:
-        propriedades = propriedades.filter(nivel_impacto=nivel_filtro)
-    
-    if search:
-        propriedades = propriedades.filter(
-            nome_propriedade__icontains=search
-        ) | propriedades.filter(
-            proprietario__icontains=search
-        ) | propriedades.filter(
-            cidade__icontains=search
-        )
-    
-    paginator = Paginator(propriedades, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    niveis_permitidos = request.permissoes.niveis_visualizacao
+    pode_criar = request.permissoes.pode_criar_propriedades
+    
+    # Filtros atuais (sem a página) para os links de paginação e exportação
+    parametros = request.GET.copy()
+    parametros.pop('page', None)
+    filtros_query = parametros.urlencode()
+    
+    def renderizar_tabela():
+        propriedades = filtrar_propriedades(niveis_permitidos, **filtros).select_related('usuario_cadastro__perfil')
+        paginator = Paginator(propriedades, 10)
+        page_obj = paginator.get_page(page_number)
+        
+        return render_to_string('core/partials/propriedades_tabela.html', {
+            'page_obj': page_obj,
+            'filtros_query': filtros_query,
+            'pode_criar': pode_criar,
+        })
+    
+    # A tabela só depende dos níveis permitidos e dos filtros
+    tabela = obter_ou_calcular(
+        'lista', niveis_permitidos,
+        (filtros['nivel_filtro'], filtros['search'], filtros['agrotoxico'], filtros['estado'], page_number),
+        renderizar_tabela
+    )
+    
+    # As contagens por faceta dependem só dos níveis e da busca
+    linhas_facetas = obter_ou_calcular(
+        'facetas', niveis_permitidos, (filtros['search'],),
+        lambda: contar_facetas(niveis_permitidos, filtros['search'])
+    )
     
     context = {
-        'page_obj': page_obj,
-        'nivel_filtro': nivel_filtro,
-        'search': search,
-        'pode_criar': pode_criar_propriedades(request.user),
-        'niveis_permitidos': niveis_permitidos,
+        'tabela': tabela,
+        'facetas': montar_facetas(request, linhas_facetas, filtros),
+        'filtros_query': filtros_query,
+        'nivel_filtro': filtros['nivel_filtro'],
+        'search': filtros['search'],
+        'agrotoxico': filtros['agrotoxico'],
+        'estado': filtros['estado'],
     }
     return render(request, 'core/propriedades_list.html', context)
 
 
+@orcamento_consultas(3)
+@login_required
+def propriedades_exportar(request):
+    """Exporta em fluxo todas as propriedades do filtro atual (CSV, GeoJSON ou NDJSON)"""
+    formato = request.GET.get('formato', 'csv')
+    if formato not in FORMATOS_EXPORTACAO:
+        return HttpResponse('Formato inválido. Use csv, geojson ou ndjson.', status=400)
+    
+    niveis_permitidos = request.permissoes.niveis_visualizacao
+    propriedades = filtrar_propriedades(niveis_permitidos, **ler_filtros_propriedades(request))
+    
+    gerador, content_type, extensao = FORMATOS_EXPORTACAO[formato]
+    nome_arquivo = f'propriedades.{extensao}'
+    blocos = gerador(propriedades)
+    
+    if request.GET.get('gzip') in ('1', 'true'):
+        conteudo = comprimir_gzip(blocos)
+        content_type = 'application/gzip'
+        nome_arquivo += '.gz'
+    else:
+        conteudo = codificar(blocos)
+    
+    response = StreamingHttpResponse(conteudo, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{nome_arquivo}"'
+    return response
+
+
+@orcamento_consultas(4)
+@leitura_em_replica
 @login_required
 def propriedade_detail(request, pk):
     """Visualiza detalhes de uma propriedade"""
-    propriedade = get_object_or_404(PropriedadeRural, pk=pk, ativo=True)
+    # Consulta leve para validar o cache HTTP antes de carregar e renderizar
+    resumo = PropriedadeRural.objects.filter(pk=pk).values_list(
+        'data_atualizacao', 'nivel_impacto', 'ativo', 'usuario_cadastro__perfil__data_atualizacao'
+    ).first()
+    if resumo is None or not resumo[2]:
+        # Administradores também enxergam as propriedades já arquivadas
+        arquivada = request.user.is_staff and PropriedadeRuralArquivada.objects.select_related(
+            'usuario_cadastro__perfil'
+        ).filter(pk=pk).first()
+        if not arquivada:
+            raise Http404('Propriedade não encontrada')
+        return render(request, 'core/propriedade_detail.html', {
+            'propriedade': arquivada,
+            'arquivada': True,
+            'cache_versao': versao_propriedades(),
+            'cache_timeout': timeout_fragmentos(),
+        })
     
     # Verificar se usuário tem permissão para ver este nível
-    niveis_permitidos = obter_niveis_visualizacao(request.user)
-    if propriedade.nivel_impacto not in niveis_permitidos:
+    if resumo[1] not in request.permissoes.niveis_visualizacao:
         messages.error(request, 'Você não tem permissão para visualizar propriedades deste nível!')
         return redirect('propriedades_list')
     
-    return render(request, 'core/propriedade_detail.html', {'propriedade': propriedade})
+    etag, ultima_modificacao = validadores_pagina(request, 'propriedade', pk, *resumo)
+    nao_modificada = resposta_nao_modificada(request, etag, ultima_modificacao)
+    if nao_modificada:
+        return nao_modificada
+    
+    propriedade = obter_ou_calcular(
+        'detalhe', [], (pk,),
+        lambda: PropriedadeRural.objects.filter(pk=pk, ativo=True).select_related('usuario_cadastro__perfil').first()
+    )
+    if propriedade is None:
+        raise Http404('Propriedade não encontrada')
+    
+    response = render(request, 'core/propriedade_detail.html', {
+        'propriedade': propriedade,
+        'cache_versao': versao_propriedades(),
+        'cache_timeout': timeout_fragmentos(),
+    })
+    return aplicar_validadores(response, etag, ultima_modificacao)
 
 
+@orcamento_consultas(3)
 @login_required
 def propriedade_create(request):
     """Cria uma nova propriedade"""
     # Verificar se usuário pode criar propriedades
-    if not pode_criar_propriedades(request.user):
+    if not request.permissoes.pode_criar_propriedades:
         messages.error(request, 'Você não tem permissão para cadastrar propriedades!')
         return redirect('propriedades_list')
     
-    niveis_permitidos = obter_niveis_criacao(request.user)
+    niveis_permitidos = request.permissoes.opcoes_niveis_criacao()
     
     if request.method == 'POST':
         try:
             nivel_escolhido = int(request.POST.get('nivel_impacto'))
             
             # Validar se o nível escolhido é permitido
-            niveis_valores = [n[0] for n in niveis_permitidos]
-            if nivel_escolhido not in niveis_valores:
+            if nivel_escolhido not in request.permissoes.niveis_criacao:
                 messages.error(request, 'Você não tem permissão para cadastrar propriedades neste nível!')
                 return render(request, 'core/propriedade_form.html', {
-                    'niveis_permitidos': niveis_permitidos
+                    'niveis_permitidos': niveis_permitidos,
+                    'agrotoxicos': Agrotoxico.objects.values_list('nome', flat=True),
                 })
             
             propriedade = PropriedadeRural(
@@ -639,18 +668,20 @@ def propriedade_create(request):
             messages.error(request, f'Erro ao cadastrar propriedade: {str(e)}')
     
     return render(request, 'core/propriedade_form.html', {
-        'niveis_permitidos': niveis_permitidos
+        'niveis_permitidos': niveis_permitidos,
+        'agrotoxicos': Agrotoxico.objects.values_list('nome', flat=True),
     })
 
 
+@orcamento_consultas(4)
 @login_required
 def propriedade_update(request, pk):
     """Atualiza uma propriedade existente"""
     propriedade = get_object_or_404(PropriedadeRural, pk=pk, ativo=True)
     
     # Verificar se usuário pode ver/editar este nível
-    niveis_permitidos = obter_niveis_criacao(request.user)
-    niveis_valores = [n[0] for n in niveis_permitidos]
+    niveis_permitidos = request.permissoes.opcoes_niveis_criacao()
+    niveis_valores = request.permissoes.niveis_criacao
     
     if propriedade.nivel_impacto not in niveis_valores:
         messages.error(request, 'Você não tem permissão para editar propriedades deste nível!')
@@ -665,7 +696,8 @@ def propriedade_update(request, pk):
                 messages.error(request, 'Você não tem permissão para alterar para este nível!')
                 return render(request, 'core/propriedade_form.html', {
                     'propriedade': propriedade,
-                    'niveis_permitidos': niveis_permitidos
+                    'niveis_permitidos': niveis_permitidos,
+                    'agrotoxicos': Agrotoxico.objects.values_list('nome', flat=True),
                 })
             
             propriedade.nome_propriedade = request.POST.get('nome_propriedade')
@@ -690,10 +722,12 @@ def propriedade_update(request, pk):
     
     return render(request, 'core/propriedade_form.html', {
         'propriedade': propriedade,
-        'niveis_permitidos': niveis_permitidos
+        'niveis_permitidos': niveis_permitidos,
+        'agrotoxicos': Agrotoxico.objects.values_list('nome', flat=True),
     })
 
 
+@orcamento_consultas(3)
 @login_required
 def propriedade_delete(request, pk):
     """Deleta (desativa) uma propriedade"""
@@ -710,22 +744,22 @@ def propriedade_delete(request, pk):
 
 # CRUD de Usuários
 
+@orcamento_consultas(4)
+@leitura_em_replica
 @login_required
 def usuarios_list(request):
     """Lista todos os usuários"""
     search = request.GET.get('search', '')
     
-    usuarios = User.objects.all()
+    # O perfil (foto, tipo e telefone) aparece em cada cartão da lista
+    usuarios = User.objects.select_related('perfil').order_by('pk')
     
     if search:
         usuarios = usuarios.filter(
-            username__icontains=search
-        ) | usuarios.filter(
-            first_name__icontains=search
-        ) | usuarios.filter(
-            last_name__icontains=search
-        ) | usuarios.filter(
-            email__icontains=search
+            Q(username__icontains=search) |
+            Q(first_name__icontains=search) |
+            Q(last_name__icontains=search) |
+            Q(email__icontains=search)
         )
     
     paginator = Paginator(usuarios, 10)
@@ -735,23 +769,37 @@ def usuarios_list(request):
     context = {
         'page_obj': page_obj,
         'search': search,
-        'pode_criar': pode_criar_usuarios(request.user),
     }
     return render(request, 'core/usuarios_list.html', context)
 
 
+@orcamento_consultas(4)
 @login_required
 def usuario_detail(request, pk):
     """Visualiza detalhes de um usuário"""
-    usuario = get_object_or_404(User, pk=pk)
-    return render(request, 'core/usuario_detail.html', {'usuario_perfil': usuario})
+    # Consulta leve para validar o cache HTTP antes de carregar e renderizar
+    resumo = User.objects.filter(pk=pk).values_list(
+        'perfil__data_atualizacao', 'perfil__tipo_perfil', 'is_active', 'is_staff', 'last_login'
+    ).first()
+    if resumo is None:
+        raise Http404('Usuário não encontrado')
+    
+    etag, ultima_modificacao = validadores_pagina(request, 'usuario', pk, *resumo)
+    nao_modificada = resposta_nao_modificada(request, etag, ultima_modificacao)
+    if nao_modificada:
+        return nao_modificada
+    
+    usuario = get_object_or_404(User.objects.select_related('perfil'), pk=pk)
+    response = render(request, 'core/usuario_detail.html', {'usuario_perfil': usuario})
+    return aplicar_validadores(response, etag, ultima_modificacao)
 
 
+@orcamento_consultas(2)
 def usuario_create(request):
     """Cria um novo usuário com foto"""
     # Verificar se é um usuário autenticado criando outro usuário
-    is_admin_creating = request.user.is_authenticated and pode_criar_usuarios(request.user)
-    perfis_permitidos = obter_perfis_permitidos(request.user) if is_admin_creating else []
+    is_admin_creating = request.permissoes.pode_criar_usuarios
+    perfis_permitidos = request.permissoes.opcoes_perfis()
     
     if request.method == 'POST':
         try:
@@ -778,6 +826,12 @@ def usuario_create(request):
                     'perfis_permitidos': perfis_permitidos
                 })
             
+            # Validar e normalizar a foto (base64) antes de criar o usuário
+            foto = None
+            foto_data = request.POST.get('foto_base64')
+            if foto_data:
+                foto = preparar_foto_perfil(foto_data, username)
+            
             # Criar usuário
             user = User.objects.create_user(
                 username=username,
@@ -796,8 +850,7 @@ def usuario_create(request):
                 tipo_perfil_escolhido = request.POST.get('tipo_perfil', 'COMUM')
                 
                 # Validar se o tipo escolhido é permitido para este usuário
-                perfis_valores = [p[0] for p in perfis_permitidos]
-                if tipo_perfil_escolhido in perfis_valores:
+                if tipo_perfil_escolhido in request.permissoes.perfis_permitidos:
                     perfil.tipo_perfil = tipo_perfil_escolhido
                 else:
                     perfil.tipo_perfil = 'COMUM'
@@ -812,14 +865,8 @@ def usuario_create(request):
             perfil.endereco = request.POST.get('endereco', '')
             perfil.bio = request.POST.get('bio', '')
             
-            # Processar foto (base64)
-            foto_data = request.POST.get('foto_base64')
-            if foto_data:
-                if foto_data.startswith('data:image'):
-                    foto_data = foto_data.split(',')[1]
-                image_data = base64.b64decode(foto_data)
-                image_file = ContentFile(image_data, name=f'{username}_foto.jpg')
-                perfil.foto = image_file
+            if foto:
+                perfil.trocar_foto(*foto)
             
             perfil.save()
             
@@ -837,6 +884,8 @@ def usuario_create(request):
             
             return redirect('login')
             
+        except FotoInvalida as e:
+            messages.error(request, mensagem_foto_invalida(e))
         except IntegrityError as e:
             messages.error(request, 'Erro: CPF já cadastrado!')
         except Exception as e:
@@ -848,10 +897,11 @@ def usuario_create(request):
     })
 
 
+@orcamento_consultas(3)
 @login_required
 def usuario_update(request, pk):
     """Atualiza um usuário existente"""
-    usuario = get_object_or_404(User, pk=pk)
+    usuario = get_object_or_404(User.objects.select_related('perfil'), pk=pk)
     
     # Apenas admin ou o próprio usuário pode editar
     if not request.user.is_staff and request.user.pk != pk:
@@ -860,6 +910,12 @@ def usuario_update(request, pk):
     
     if request.method == 'POST':
         try:
+            # Validar e normalizar a nova foto (base64) antes de alterar algo
+            foto = None
+            foto_data = request.POST.get('foto_base64')
+            if foto_data:
+                foto = preparar_foto_perfil(foto_data, usuario.username)
+            
             # Atualizar dados do usuário
             usuario.first_name = request.POST.get('first_name')
             usuario.last_name = request.POST.get('last_name')
@@ -903,24 +959,20 @@ def usuario_update(request, pk):
             # Verificar se deve deletar a foto
             delete_foto = request.POST.get('delete_foto')
             if delete_foto == 'true':
-                if perfil.foto:
-                    perfil.foto.delete()
-                    perfil.foto = None
+                # O arquivo é apagado após o commit se nenhum outro perfil o usar
+                perfil.trocar_foto(None)
             
-            # Processar nova foto se fornecida
-            foto_data = request.POST.get('foto_base64')
-            if foto_data:
-                if foto_data.startswith('data:image'):
-                    foto_data = foto_data.split(',')[1]
-                image_data = base64.b64decode(foto_data)
-                image_file = ContentFile(image_data, name=f'{usuario.username}_foto.jpg')
-                perfil.foto = image_file
+            # Nova foto, já normalizada
+            if foto:
+                perfil.trocar_foto(*foto)
             
             perfil.save()
             
             messages.success(request, 'Usuário atualizado com sucesso!')
             return redirect('usuario_detail', pk=usuario.pk)
             
+        except FotoInvalida as e:
+            messages.error(request, mensagem_foto_invalida(e))
         except IntegrityError:
             messages.error(request, 'Erro: CPF já cadastrado!')
         except Exception as e:
@@ -929,6 +981,7 @@ def usuario_update(request, pk):
     return render(request, 'core/usuario_form.html', {'usuario_perfil': usuario})
 
 
+@orcamento_consultas(3)
 @login_required
 def usuario_delete(request, pk):
     """Deleta um usuário"""
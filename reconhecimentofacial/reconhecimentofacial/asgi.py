@@ -3,6 +3,12 @@ ASGI config for reconhecimentofacial project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Requisições HTTP vão para o Django; conexões WebSocket, para o
+reconhecimento facial ao vivo (core/ao_vivo.py). Rode com um servidor ASGI
+com suporte a WebSocket, por exemplo:
+
+    uvicorn reconhecimentofacial.asgi:application
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.0/howto/deployment/asgi/
 """
@@ -13,4 +19,14 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'reconhecimentofacial.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Importado depois do setup do Django (usa models e settings)
+from core.ao_vivo import reconhecimento_websocket  # noqa: E402
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'websocket':
+        await reconhecimento_websocket(scope, receive, send)
+    else:
+        await django_application(scope, receive, send)
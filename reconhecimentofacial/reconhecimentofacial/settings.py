@@ -11,7 +11,7 @@ https://docs.djangoproject.com/en/5.0/ref/settings/
 """
 
 from pathlib import Path
-from decouple import config
+from decouple import Csv, config
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -38,6 +38,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'rest_framework',
     'core',
 ]
 
@@ -52,10 +53,12 @@ if DEBUG:
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',  # WhiteNoise para servir estáticos
+    'core.middleware.ReplicaMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.PermissoesMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -101,6 +104,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'core.context_processors.permissoes',
             ],
         },
     },
@@ -112,13 +116,150 @@ WSGI_APPLICATION = 'reconhecimentofacial.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
+# CONN_MAX_AGE mantém a conexão aberta entre requisições (0 = uma por requisição)
+# e CONN_HEALTH_CHECKS a testa antes de reaproveitar. DATABASE_POOL usa o pool
+# nativo do Django para PostgreSQL, que requer psycopg 3 (psycopg[pool]); com o
+# psycopg2 use conexões persistentes ou um pooler externo (ex.: PgBouncer).
+#
+# DATABASE_REPLICAS: réplicas somente leitura separadas por vírgula (arquivos
+# no SQLite, hosts nos demais bancos). Ver core/replicas.py.
+
+DATABASE_ENGINE = config('DATABASE_ENGINE', default='django.db.backends.sqlite3')
+DATABASE_POOL = config('DATABASE_POOL', default=False, cast=bool)
+
+
+def _banco(nome, host=''):
+    banco = {
+        'ENGINE': DATABASE_ENGINE,
+        'NAME': BASE_DIR / nome if DATABASE_ENGINE.endswith('sqlite3') else nome,
+        'CONN_MAX_AGE': 0 if DATABASE_POOL else config('DATABASE_CONN_MAX_AGE', default=60, cast=int),
+        'CONN_HEALTH_CHECKS': config('DATABASE_CONN_HEALTH_CHECKS', default=True, cast=bool),
+    }
+    if not DATABASE_ENGINE.endswith('sqlite3'):
+        banco.update({
+            'USER': config('DATABASE_USER', default=''),
+            'PASSWORD': config('DATABASE_PASSWORD', default=''),
+            'HOST': host,
+            'PORT': config('DATABASE_PORT', default=''),
+        })
+    if DATABASE_POOL:
+        banco['OPTIONS'] = {'pool': True}
+    return banco
+
+
 DATABASES = {
+    'default': _banco(config('DATABASE_NAME', default='db.sqlite3'), config('DATABASE_HOST', default='')),
+}
+
+REPLICAS_LEITURA = []
+for _numero, _replica in enumerate(config('DATABASE_REPLICAS', default='', cast=Csv()), start=1):
+    if DATABASE_ENGINE.endswith('sqlite3'):
+        DATABASES[f'replica{_numero}'] = _banco(_replica)
+    else:
+        DATABASES[f'replica{_numero}'] = _banco(DATABASES['default']['NAME'], _replica)
+    # Nos testes a réplica é o próprio banco principal
+    DATABASES[f'replica{_numero}']['TEST'] = {'MIRROR': 'default'}
+    REPLICAS_LEITURA.append(f'replica{_numero}')
+
+DATABASE_ROUTERS = ['core.replicas.RoteadorReplicas']
+
+# Depois de um POST/PUT/DELETE o navegador lê do principal por este tempo
+# (segundos), para enxergar a própria gravação mesmo com atraso na réplica
+REPLICA_ATRASO_MAXIMO = config('REPLICA_ATRASO_MAXIMO', default=5, cast=int)
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+# locmem: por processo (padrão) | file: compartilhado entre workers do mesmo nó
+# redis: compartilhado entre nós (Redis ou compatível, ex.: Valkey/KeyDB local;
+#        requer o pacote redis)
+
+CACHE_BACKENDS = {
+    'locmem': ('django.core.cache.backends.locmem.LocMemCache', 'reconhecimentofacial'),
+    'file': ('django.core.cache.backends.filebased.FileBasedCache', str(BASE_DIR / 'cache')),
+    'redis': ('django.core.cache.backends.redis.RedisCache', 'redis://127.0.0.1:6379/1'),
+}
+_cache_backend_nome = config('CACHE_BACKEND', default='locmem')
+_cache_backend, _cache_location = CACHE_BACKENDS[_cache_backend_nome]
+
+CACHES = {
     'default': {
-        'ENGINE': config('DATABASE_ENGINE', default='django.db.backends.sqlite3'),
-        'NAME': BASE_DIR / config('DATABASE_NAME', default='db.sqlite3'),
+        'BACKEND': _cache_backend,
+        'LOCATION': config('CACHE_LOCATION', default=_cache_location),
+        'TIMEOUT': config('CACHE_TIMEOUT', default=300, cast=int),
     }
 }
 
+# O cache padrão é visto por todos os processos que atendem o site? Com o
+# locmem cada worker tem o seu, e uma invalidação feita em um deles não chega
+# aos outros: permissões na sessão, usuários em cache, páginas de
+# propriedades, versão da galeria e tokens de uso único passam então a
+# depender só do banco. O file só é
+# compartilhado entre os workers de um mesmo nó (use redis com vários nós)
+CACHE_COMPARTILHADO = config('CACHE_COMPARTILHADO', default=_cache_backend_nome != 'locmem', cast=bool)
+
+# Tempo de vida das páginas e consultas de propriedades em cache (segundos;
+# só com CACHE_COMPARTILHADO)
+CACHE_TIMEOUT_PROPRIEDADES = config('CACHE_TIMEOUT_PROPRIEDADES', default=300, cast=int)
+
+# Guarda o contexto de permissões (core.permissoes) na sessão, evitando
+# carregar o perfil do usuário a cada requisição (só com CACHE_COMPARTILHADO,
+# onde fica a versão que descarta o contexto quando o perfil muda)
+PERMISSOES_NA_SESSAO = config('PERMISSOES_NA_SESSAO', default=True, cast=bool)
+
+
+# Sessões
+# https://docs.djangoproject.com/en/5.0/topics/http/sessions/
+# db: tabela django_session (uma leitura por requisição)
+# cached_db: lê do cache do nó e grava no cache e no banco
+# cookies: dados assinados no próprio cookie (nós sem estado; até ~4 KB)
+
+SESSION_ENGINES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'cookies': 'django.contrib.sessions.backends.signed_cookies',
+}
+SESSION_ENGINE = SESSION_ENGINES[config('SESSION_BACKEND', default='db')]
+
+# Cache do nó, compartilhado pelos workers da mesma máquina. Sem afinidade de
+# sessão no balanceador, use SESSION_CACHE_ALIAS=default com um Redis
+# compartilhado: um logout em um nó não apaga a cópia guardada nos outros
+CACHES['local'] = {
+    'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+    'LOCATION': config('CACHE_LOCAL_LOCATION', default=str(BASE_DIR / 'cache_local')),
+    'TIMEOUT': config('SESSION_CACHE_TIMEOUT', default=3600, cast=int),
+}
+SESSION_CACHE_ALIAS = config('SESSION_CACHE_ALIAS', default='local')
+
+
+# Autenticação: usuário e perfil lidos do cache em vez de auth_user a cada
+# requisição (core/autenticacao.py; invalidados ao salvar usuário ou perfil,
+# só com CACHE_COMPARTILHADO). Os novos logins usam o primeiro backend; o
+# ModelBackend atende as sessões criadas antes dele
+
+AUTHENTICATION_BACKENDS = [
+    'core.autenticacao.BackendUsuarioEmCache',
+    'django.contrib.auth.backends.ModelBackend',
+]
+USUARIO_CACHE_TIMEOUT = config('USUARIO_CACHE_TIMEOUT', default=300, cast=int)
+
+
+# API REST
+# https://www.django-rest-framework.org/api-guide/settings/
+
+REST_FRAMEWORK = {
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'rest_framework.authentication.SessionAuthentication',
+        'rest_framework.authentication.BasicAuthentication',
+    ],
+    'DEFAULT_PERMISSION_CLASSES': [
+        'rest_framework.permissions.IsAuthenticated',
+    ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'rest_framework.renderers.JSONRenderer',
+    ] + (['rest_framework.renderers.BrowsableAPIRenderer'] if DEBUG else []),
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
@@ -164,6 +305,35 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Fotos de perfil: reduzidas a este lado máximo e regravadas em JPEG no envio
+FOTO_LADO_MAXIMO = config('FOTO_LADO_MAXIMO', default=1024, cast=int)
+FOTO_QUALIDADE_JPEG = config('FOTO_QUALIDADE_JPEG', default=85, cast=int)
+# Lado máximo em que as imagens são decodificadas para o reconhecimento facial
+RECONHECIMENTO_LADO_MAXIMO = config('RECONHECIMENTO_LADO_MAXIMO', default=640, cast=int)
+# Pré-filtro do login: cascata do OpenCV que recusa quadros sem rosto antes do
+# dlib. Com vizinhos 0 basta uma janela aceita pela cascata (o mais
+# permissivo); meça outras combinações com python manage.py avaliar_prefiltro
+PREFILTRO_ROSTO = config('PREFILTRO_ROSTO', default=True, cast=bool)
+PREFILTRO_CASCATA = config('PREFILTRO_CASCATA', default='haarcascade_frontalface_alt2.xml')
+PREFILTRO_LADO = config('PREFILTRO_LADO', default=160, cast=int)
+PREFILTRO_VIZINHOS = config('PREFILTRO_VIZINHOS', default=0, cast=int)
+# Identificação de vários rostos (portarias): rostos menores pedem mais resolução
+IDENTIFICACAO_LADO_MAXIMO = config('IDENTIFICACAO_LADO_MAXIMO', default=1280, cast=int)
+IDENTIFICACAO_TOLERANCIA = config('IDENTIFICACAO_TOLERANCIA', default=0.6, cast=float)
+# Login facial ao vivo (WebSocket, ver core/ao_vivo.py). A distância máxima
+# de 0.45 equivale à confiança mínima de 55% do login por foto
+AO_VIVO_LADO_MAXIMO = config('AO_VIVO_LADO_MAXIMO', default=320, cast=int)
+AO_VIVO_DISTANCIA_MAXIMA = config('AO_VIVO_DISTANCIA_MAXIMA', default=0.45, cast=float)
+AO_VIVO_TENTATIVAS = config('AO_VIVO_TENTATIVAS', default=5, cast=int)
+AO_VIVO_DURACAO_MAXIMA = config('AO_VIVO_DURACAO_MAXIMA', default=60, cast=int)
+# Motores do reconhecimento (core/motores.py): nome registrado ou caminho de
+# uma classe. Trocar o codificador exige python manage.py codificar_galeria --todas
+MOTOR_DETECTOR = config('MOTOR_DETECTOR', default='hog')
+MOTOR_CODIFICADOR = config('MOTOR_CODIFICADOR', default='dlib')
+MOTOR_COMPARADOR = config('MOTOR_COMPARADOR', default='exato')
+# Codificações exatas (float32) das galerias compactas ('float16' e 'int8')
+GALERIA_DIRETORIO = config('GALERIA_DIRETORIO', default=str(BASE_DIR / 'galeria_local'))
+
 # Login URLs
 LOGIN_URL = 'login'
 LOGIN_REDIRECT_URL = 'index'